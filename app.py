@@ -4,7 +4,8 @@ import os
 import socket
 from app.models.database import DB_PATH
 
-app = create_app()
+# Rodando como script o servidor usa o reloader (ver app.run abaixo)
+app = create_app(sob_reloader=__name__ == '__main__')
 
 def get_local_ip():
     """Obtém o IP local da máquina na rede"""
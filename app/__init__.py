@@ -1,7 +1,7 @@
 from flask import Flask, send_from_directory
 from app.models.database import init_db
 from app.routes.entregadores_routes import init_entregadores_routes
-from app.routes.upload_routes import init_upload_routes
+from app.routes.upload_routes import init_upload_routes, iniciar_processamento_uploads
 from app.routes.adiantamento_routes import init_adiantamento_routes
 from config import Config
 from app.jobs.form_scheduler import iniciar_scheduler
@@ -13,7 +13,14 @@ import os
 
 
 
-def create_app():
+def create_app(sob_reloader=False):
+    """
+    Cria o app
+
+    Args:
+        sob_reloader: True quando o app roda com o reloader do Werkzeug (app.py); o
+                      processo que só vigia os arquivos não inicia a fila de processamento
+    """
     app = Flask(
         __name__,
         static_folder="assets/static",
@@ -34,6 +41,13 @@ def create_app():
     # Inicializa banco
     init_db()
 
+    # Aquece o cache CPF -> entregador usado pelos formulários públicos
+    try:
+        from app.services.cpf_cache_service import CpfCacheService
+        print(f"🪪 Cache de CPFs aquecido: {len(CpfCacheService.aquecer())} CPFs")
+    except Exception as e:
+        print(f"⚠️  Erro ao aquecer cache de CPFs (será carregado na primeira busca): {e}")
+
     # Registra blueprints / rotas
     init_auth_routes(app)  # Autenticação primeiro
     init_entregadores_routes(app)
@@ -42,6 +56,15 @@ def create_app():
     init_pix_routes(app)
     init_pix_admin_routes(app)
 
+    # Uploads são processados em segundo plano (jobs em processamento_jobs); com o
+    # reloader, só o processo filho (WERKZEUG_RUN_MAIN) atende requisições
+    if not Config.PROCESSAMENTO_JOBS_ENABLED:
+        print("ℹ️ Fila de processamento desativada (PROCESSAMENTO_JOBS_ENABLED=False).")
+    elif sob_reloader and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        print("ℹ️ Processo do reloader: fila de processamento iniciada no processo do servidor.")
+    else:
+        iniciar_processamento_uploads()
+
     iniciar_scheduler()
 
     return app
@@ -34,59 +34,156 @@ function fecharAside() {
 // ========================
 // === CLIQUE NO NOME =====
 // ========================
-document.querySelectorAll("#tabelaResultados tbody tr .abrirDetalhes")
-  .forEach(el => {
-    el.addEventListener("click", function () {
-        let id = this.closest("tr").dataset.id;
-        abrirPainel(id);
+// Delegado no tbody: vale também para as linhas montadas a partir da API
+const tbodyResultados = document.querySelector("#tabelaResultados tbody");
+if (tbodyResultados) {
+    tbodyResultados.addEventListener("click", function (e) {
+        const celula = e.target.closest(".abrirDetalhes");
+        if (!celula || e.target.closest("a")) return;
+        abrirPainel(celula.closest("tr").dataset.id);
     });
-});
+}
 
 // ========================
-// === BUSCA GLOBAL =======
+// === BUSCA / ORDENAÇÃO ==
 // ========================
+// Busca, ordenação e paginação são feitas no servidor (/processar-csv/consolidado):
+// o navegador só recebe a página exibida.
 const searchInput = document.getElementById("searchInput");
 const tabelaResultados = document.getElementById("tabelaResultados");
-const tabelaCompleta = document.getElementById("tabelaCompleta");
 
-// === FILTRO GLOBAL ===
-if (searchInput) {
-    searchInput.addEventListener("keyup", function () {
-        let termo = this.value.toLowerCase().trim();
+const estadoTabela = {
+    page: 1,
+    ordenar: "posicao",
+    direcao: "asc",
+    busca: ""
+};
 
-        let tabelaAtual = document.querySelector("#tabelaResultados tbody");
-        let tabelaCompleta = document.querySelectorAll("#tabelaCompleta tbody tr");
+function escaparHtml(texto) {
+    const div = document.createElement("div");
+    div.textContent = texto == null ? "" : String(texto);
+    return div.innerHTML;
+}
 
-        // Se o campo estiver vazio → restaura a paginação normal
-        if (termo === "") {
-            const pagination = document.querySelector(".pagination");
-            if (pagination) {
-                pagination.style.display = "flex";
-            }
-            window.location.reload(); // volta à página original paginada
-            return;
-        }
+function formatarValor(valor) {
+    return "R$ " + Number(valor || 0).toFixed(2);
+}
 
-        // Oculta a paginação enquanto filtra
-        const pagination = document.querySelector(".pagination");
-        if (pagination) {
-            pagination.style.display = "none";
-        }
+function montarLinha(row) {
+    const nome = escaparHtml(row.recebedor || row.id_da_pessoa_entregadora);
+    const nomeHtml = row.cadastrado
+        ? `<span class="nome-entregador">${nome}</span>`
+        : `<a href="${escaparHtml(row.url_cadastro)}" class="nome-entregador nao-cadastrado link-cadastro">
+               ${nome} <i class="fa-solid fa-triangle-exclamation icon-alerta"></i>
+           </a>`;
+    return `
+        <tr data-id="${escaparHtml(row.id_da_pessoa_entregadora)}">
+            <td class="abrirDetalhes">${nomeHtml}</td>
+            <td>${row.subpracas ? escaparHtml(row.subpracas) : "-"}</td>
+            <td class="text-right">${formatarValor(row.valor_total)}</td>
+            <td class="text-right">${formatarValor(row.valor_60_percent)}</td>
+            <td class="text-right">${formatarValor(row.valor_final)}</td>
+        </tr>`;
+}
 
-        // Limpa a tabela atual
-        if (tabelaAtual) {
-            tabelaAtual.innerHTML = "";
+function montarPaginacao(data) {
+    const pagination = document.querySelector(".pagination");
+    if (!pagination) return;
 
-            // Insere apenas linhas filtradas
-            tabelaCompleta.forEach(linha => {
-                if (linha.innerText.toLowerCase().includes(termo)) {
-                    tabelaAtual.appendChild(linha.cloneNode(true));
-                }
-            });
+    const anterior = data.page > 1
+        ? `<a href="#" class="btn-pag" data-page="${data.page - 1}">« Anterior</a>` : "";
+    const proxima = data.page < data.total_pages
+        ? `<a href="#" class="btn-pag" data-page="${data.page + 1}">Próxima »</a>` : "";
+    pagination.innerHTML = `${anterior}<span>Página ${data.total_pages ? data.page : 0} de ${data.total_pages} (${data.total_registros} entregadores)</span>${proxima}`;
+}
+
+function atualizarCabecalhos() {
+    document.querySelectorAll("#tabelaResultados th.ordenavel").forEach(th => {
+        if (th.dataset.ordenar === estadoTabela.ordenar) {
+            th.dataset.direcao = estadoTabela.direcao;
+        } else {
+            delete th.dataset.direcao;
         }
     });
 }
 
+function carregarConsolidado() {
+    if (!tabelaResultados) return;
+
+    const params = new URLSearchParams({
+        tipo: tabelaResultados.dataset.tipo,
+        page: estadoTabela.page,
+        ordenar: estadoTabela.ordenar,
+        direcao: estadoTabela.direcao
+    });
+    if (estadoTabela.busca) params.set("busca", estadoTabela.busca);
+
+    fetch(`${tabelaResultados.dataset.url}?${params}`, { headers: { "Accept": "application/json" } })
+        .then(res => res.json())
+        .then(data => {
+            if (!data.success) {
+                tbodyResultados.innerHTML =
+                    `<tr><td colspan="5">${escaparHtml(data.message || "Erro ao carregar dados.")}</td></tr>`;
+                return;
+            }
+            tbodyResultados.innerHTML = data.registros.length
+                ? data.registros.map(montarLinha).join("")
+                : `<tr><td colspan="5">Nenhum entregador encontrado.</td></tr>`;
+            estadoTabela.page = data.page;
+            montarPaginacao(data);
+            atualizarCabecalhos();
+        })
+        .catch(() => {
+            tbodyResultados.innerHTML = `<tr><td colspan="5">Erro ao carregar dados.</td></tr>`;
+        });
+}
+
+if (tabelaResultados) {
+    estadoTabela.page = parseInt(tabelaResultados.dataset.page, 10) || 1;
+
+    // Cabeçalhos ordenáveis: primeiro clique crescente, o seguinte inverte
+    document.querySelectorAll("#tabelaResultados th.ordenavel").forEach(th => {
+        th.addEventListener("click", function () {
+            if (estadoTabela.ordenar === this.dataset.ordenar) {
+                estadoTabela.direcao = estadoTabela.direcao === "asc" ? "desc" : "asc";
+            } else {
+                estadoTabela.ordenar = this.dataset.ordenar;
+                estadoTabela.direcao = "asc";
+            }
+            estadoTabela.page = 1;
+            carregarConsolidado();
+        });
+    });
+
+    // Paginação via API depois de buscar/ordenar (a inicial continua com links normais)
+    const pagination = document.querySelector(".pagination");
+    if (pagination) {
+        pagination.addEventListener("click", function (e) {
+            const link = e.target.closest("a[data-page]");
+            if (!link) return;
+            e.preventDefault();
+            estadoTabela.page = parseInt(link.dataset.page, 10);
+            carregarConsolidado();
+        });
+    }
+}
+
+// === FILTRO GLOBAL ===
+if (searchInput && tabelaResultados) {
+    let buscaTimeout = null;
+    searchInput.addEventListener("keyup", function () {
+        const termo = this.value.trim();
+        if (termo === estadoTabela.busca) return;
+
+        clearTimeout(buscaTimeout);
+        buscaTimeout = setTimeout(() => {
+            estadoTabela.busca = termo;
+            estadoTabela.page = 1;
+            carregarConsolidado();
+        }, 300);
+    });
+}
+
 // ========================
 // === MODAL DE UPLOAD ====
 // ========================
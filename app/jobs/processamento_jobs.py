@@ -0,0 +1,235 @@
+"""
+Fila de processamento de CSV em segundo plano
+
+O POST de /processar-csv só salva os arquivos e enfileira um job; o processamento
+roda num pool local de threads e o andamento (etapa e percentual) fica na tabela
+processamento_jobs, consultada pela rota de status.
+
+Ao iniciar, jobs que ficaram 'executando' num processo que não existe mais voltam
+para a fila (se os arquivos ainda existem e restam tentativas) ou são marcados como erro.
+"""
+import os
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from app.services.storage_service import StorageService
+from config import Config
+
+STATUS_PENDENTE = 'pendente'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+STATUS_FINAIS = (STATUS_CONCLUIDO, STATUS_ERRO)
+
+# Faixa de percentual de cada etapa (na agregação o percentual avança arquivo a arquivo)
+FAIXAS_ETAPAS = {
+    'na_fila': (0, 0),
+    'iniciando': (0, 5),
+    'agregacao': (5, 80),
+    'consolidacao': (80, 85),
+    'consolidado_diario': (85, 90),
+    'persistencia': (90, 99),
+    'concluido': (100, 100),
+}
+
+DESCRICAO_ETAPAS = {
+    'na_fila': 'Na fila',
+    'iniciando': 'Iniciando',
+    'agregacao': 'Lendo e agregando os arquivos',
+    'consolidacao': 'Consolidando entregadores',
+    'consolidado_diario': 'Montando o consolidado diário',
+    'persistencia': 'Salvando o resultado',
+    'concluido': 'Concluído',
+}
+
+_executor = None
+_executar = None
+
+
+def _agora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _processo_atual():
+    """Identifica este processo nos jobs que ele assume (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _como_datetime(valor):
+    if isinstance(valor, datetime) or not valor:
+        return valor
+    return datetime.strptime(str(valor)[:19], '%Y-%m-%d %H:%M:%S')
+
+
+def _job_abandonado(job):
+    """
+    Indica se um job 'executando' ficou sem processo (servidor reiniciado)
+
+    No mesmo host, verifica só se o pid ainda existe (um job longo e vivo nunca é
+    dado como abandonado); este mesmo pid ao iniciar a fila é de uma execução
+    anterior (pid reaproveitado). Para outros hosts vale o tempo sem atualização
+    (PROCESSAMENTO_JOBS_TIMEOUT_MIN).
+    """
+    host, _, pid = (job.get('processo') or '').rpartition(':')
+    if host != socket.gethostname():
+        atualizado_em = _como_datetime(job.get('atualizado_em'))
+        limite = timedelta(minutes=Config.PROCESSAMENTO_JOBS_TIMEOUT_MIN)
+        return bool(atualizado_em) and datetime.now() - atualizado_em > limite
+    if not pid.isdigit() or os.name == 'nt':
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def progresso_job(job_id):
+    """Callback progresso(etapa, concluidos, total) que grava etapa e percentual no job"""
+    def informar(etapa, concluidos=0, total=0):
+        inicio, fim = FAIXAS_ETAPAS.get(etapa, (0, 99))
+        percentual = inicio + (fim - inicio) * concluidos // total if total else inicio
+        StorageService.atualizar_job_processamento(job_id, etapa=etapa, percentual=percentual)
+    return informar
+
+
+def _rodar_job(job_id):
+    """Executa um job da fila (thread do pool)"""
+    if not StorageService.assumir_job_processamento(job_id, _processo_atual()):
+        # Já assumido por outro worker/processo, ou outro job da mesma pasta está
+        # executando (este continua pendente e é submetido quando aquele terminar)
+        return
+
+    job = StorageService.carregar_job_processamento(job_id)
+    print(f"⏳ Job {job_id} iniciado ({len(job['arquivos_json'])} arquivo(s), tentativa {job['tentativas']})")
+    try:
+        resultado = _executar(job, progresso_job(job_id))
+    except Exception as e:
+        print(f"❌ Job {job_id} falhou: {e}")
+        StorageService.atualizar_job_processamento(
+            job_id, status=STATUS_ERRO, erro=str(e), finalizado_em=_agora()
+        )
+    else:
+        StorageService.atualizar_job_processamento(
+            job_id,
+            status=STATUS_CONCLUIDO,
+            etapa='concluido',
+            percentual=100,
+            resultado_json=resultado,
+            finalizado_em=_agora()
+        )
+        print(f"✅ Job {job_id} concluído")
+    _submeter_pendentes_da_pasta(job['pasta_uploads'])
+
+
+def _submeter(job_id):
+    if _executor is None:
+        # Fila desativada neste processo: o job continua pendente e é recuperado
+        # quando um processo com a fila ativa iniciar
+        print(f"⚠️ Fila de processamento não iniciada neste processo: job {job_id} continua pendente")
+        return
+    _executor.submit(_rodar_job, job_id)
+
+
+def _submeter_pendentes_da_pasta(pasta_uploads):
+    """Submete de novo os jobs da pasta recusados enquanto outro executava"""
+    for job in StorageService.listar_jobs_processamento([STATUS_PENDENTE]):
+        if job['pasta_uploads'] == pasta_uploads:
+            _submeter(job['id'])
+
+
+def enfileirar_processamento(pasta_uploads, arquivos, usuario=None):
+    """
+    Registra e enfileira o processamento de um lote
+
+    Args:
+        pasta_uploads: Pasta da semana onde os arquivos foram salvos
+        arquivos: [{'caminho': arquivo salvo, 'nome': nome original}]
+        usuario: Quem enviou o lote
+
+    Returns:
+        str: id do job
+    """
+    job_id = uuid.uuid4().hex
+    if not StorageService.criar_job_processamento(job_id, pasta_uploads, arquivos, usuario):
+        raise Exception("Não foi possível registrar o processamento na fila")
+    _submeter(job_id)
+    return job_id
+
+
+def status_job(job_id):
+    """Estado do job para a rota de status (None se não existir)"""
+    job = StorageService.carregar_job_processamento(job_id)
+    if not job:
+        return None
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'etapa': job['etapa'],
+        'etapa_descricao': DESCRICAO_ETAPAS.get(job['etapa'], job['etapa']),
+        'percentual': job['percentual'] or 0,
+        'finalizado': job['status'] in STATUS_FINAIS,
+        'erro': job['erro'],
+        'tentativas': job['tentativas'],
+        'arquivos': [a.get('nome') for a in job['arquivos_json'] or []],
+        'resultado': job['resultado_json'],
+        'criado_em': str(job['created_at']) if job.get('created_at') else None,
+        'iniciado_em': str(job['iniciado_em']) if job.get('iniciado_em') else None,
+        'finalizado_em': str(job['finalizado_em']) if job.get('finalizado_em') else None,
+    }
+
+
+def _recuperar_jobs():
+    """Reenfileira jobs pendentes e trata os que ficaram 'executando' num processo encerrado"""
+    for job in StorageService.listar_jobs_processamento([STATUS_PENDENTE, STATUS_EXECUTANDO]):
+        if job['status'] == STATUS_EXECUTANDO:
+            if not _job_abandonado(job):
+                continue
+            arquivos_existem = all(os.path.exists(a['caminho']) for a in job['arquivos_json'] or [])
+            if arquivos_existem and (job['tentativas'] or 0) < Config.PROCESSAMENTO_JOBS_MAX_TENTATIVAS:
+                # Reprocessar é seguro: a consolidação semanal substitui a contribuição de cada arquivo
+                if not StorageService.reenfileirar_job_processamento(job['id'], job['processo']):
+                    continue
+                print(f"🔁 Job {job['id']} interrompido na etapa '{job['etapa']}': voltando para a fila")
+            else:
+                motivo = "arquivos não encontrados" if not arquivos_existem else "tentativas esgotadas"
+                StorageService.atualizar_job_processamento(
+                    job['id'],
+                    status=STATUS_ERRO,
+                    erro=f"Processamento interrompido por reinício do servidor ({motivo}). Envie os arquivos novamente.",
+                    finalizado_em=_agora()
+                )
+                print(f"⚠️ Job {job['id']} interrompido e marcado como erro ({motivo})")
+                continue
+        _submeter(job['id'])
+
+
+def iniciar_fila_processamento(executar):
+    """
+    Inicia o pool de workers e recupera os jobs deixados por execuções anteriores
+
+    Args:
+        executar: função executar(job, progresso) que processa o job e devolve o
+                  resultado (serializável em JSON) guardado em resultado_json
+    """
+    global _executor, _executar
+
+    if _executor is not None:
+        print("⚠️ Fila de processamento já iniciada.")
+        return
+
+    _executar = executar
+    _executor = ThreadPoolExecutor(
+        max_workers=Config.PROCESSAMENTO_JOBS_WORKERS,
+        thread_name_prefix='processamento-csv'
+    )
+    try:
+        _recuperar_jobs()
+    except Exception as e:
+        print(f"⚠️ Erro ao recuperar jobs de processamento: {e}")
+    print(f"🟢 Fila de processamento iniciada ({Config.PROCESSAMENTO_JOBS_WORKERS} worker(s)).")
@@ -1,6 +1,7 @@
 import os
 import json
 import sqlite3  # Sempre importar para fallback
+from contextlib import contextmanager
 from config import Config
 
 # ====================================================
@@ -96,6 +97,27 @@ def get_db_placeholder(conn):
 # ====================================================
 # 🧱 CRIAÇÃO AUTOMÁTICA DE TABELAS
 # ====================================================
+@contextmanager
+def _passo_opcional(cursor, is_postgresql, aviso):
+    """
+    Passo de migração do init_db que pode falhar sem interromper os seguintes
+
+    No PostgreSQL um erro aborta a transação inteira; o SAVEPOINT desfaz só o
+    passo que falhou (como na migração de upload_history).
+    """
+    if is_postgresql:
+        cursor.execute("SAVEPOINT passo_opcional")
+    try:
+        yield
+    except Exception as e:
+        if is_postgresql:
+            cursor.execute("ROLLBACK TO SAVEPOINT passo_opcional")
+        print(f"⚠️ {aviso}: {e}")
+    else:
+        if is_postgresql:
+            cursor.execute("RELEASE SAVEPOINT passo_opcional")
+
+
 def init_db():
     """Inicializa o banco de dados criando todas as tabelas necessárias"""
     conn = get_db_connection()
@@ -281,6 +303,75 @@ def init_db():
             );
             """)
 
+        # === 📑 ÍNDICES DA LISTA DE SOLICITAÇÕES (filtro por dia + paginação por data_envio, id; subpraças) ===
+        with _passo_opcional(cursor, is_postgresql, "Aviso ao criar índices de solicitacoes_adiantamento"):
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_data_envio ON solicitacoes_adiantamento(data_envio, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_praca ON solicitacoes_adiantamento(praca)")
+
+        # === 🔎 CPF NORMALIZADO (joins e buscas por índice, sem REPLACE aninhado no cpf) ===
+        for tabela, chave in (('entregadores', 'id_da_pessoa_entregadora'), ('solicitacoes_adiantamento', 'id')):
+            with _passo_opcional(cursor, is_postgresql, f"Aviso ao preparar cpf_norm em {tabela}"):
+                if is_postgresql:
+                    cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS cpf_norm VARCHAR(14)")
+                else:
+                    cursor.execute(f"PRAGMA table_info({tabela})")
+                    if 'cpf_norm' not in [row[1] for row in cursor.fetchall()]:
+                        cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN cpf_norm TEXT")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_cpf_norm ON {tabela}(cpf_norm)")
+
+                # Preenche linhas gravadas antes da coluna existir
+                cursor.execute(f"SELECT {chave}, cpf FROM {tabela} WHERE cpf_norm IS NULL AND cpf IS NOT NULL")
+                pendentes = [
+                    (normalizar_cpf(row[1]), row[0]) for row in cursor.fetchall()
+                    if normalizar_cpf(row[1])
+                ]
+                if pendentes:
+                    placeholder = "%s" if is_postgresql else "?"
+                    cursor.executemany(
+                        f"UPDATE {tabela} SET cpf_norm = {placeholder} WHERE {chave} = {placeholder}",
+                        pendentes
+                    )
+                    print(f"🔎 cpf_norm preenchido em {len(pendentes)} linha(s) de {tabela}")
+
+        # === 🔒 1 SOLICITAÇÃO POR CPF POR DIA (índice único parcial em cpf_norm + data_solicitacao) ===
+        # Obrigatório: os INSERT ... ON CONFLICT do formulário dependem do índice, então uma falha aqui interrompe o init_db
+        if is_postgresql:
+            cursor.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = 'solicitacoes_adiantamento'
+            """)
+            colunas = [row[0] for row in cursor.fetchall()]
+        else:
+            cursor.execute("PRAGMA table_info(solicitacoes_adiantamento)")
+            colunas = [row[1] for row in cursor.fetchall()]
+
+        if 'dados_json' not in colunas:
+            cursor.execute(
+                f"ALTER TABLE solicitacoes_adiantamento ADD COLUMN dados_json {'JSONB' if is_postgresql else 'TEXT'}"
+            )
+        if 'data_solicitacao' not in colunas:
+            cursor.execute(
+                f"ALTER TABLE solicitacoes_adiantamento ADD COLUMN data_solicitacao {'DATE' if is_postgresql else 'TEXT'}"
+            )
+            # Solicitações antigas: só a primeira de cada CPF no dia recebe a data;
+            # repetições gravadas antes da regra ficam fora do índice (data_solicitacao NULL)
+            cursor.execute("""
+                UPDATE solicitacoes_adiantamento
+                SET data_solicitacao = DATE(data_envio)
+                WHERE id IN (
+                    SELECT MIN(id) FROM solicitacoes_adiantamento
+                    WHERE cpf_norm IS NOT NULL AND data_envio IS NOT NULL
+                    GROUP BY cpf_norm, DATE(data_envio)
+                )
+            """)
+            print(f"🔒 data_solicitacao preenchida em {cursor.rowcount} solicitação(ões)")
+
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_solicitacoes_cpf_dia
+            ON solicitacoes_adiantamento(cpf_norm, data_solicitacao)
+            WHERE cpf_norm IS NOT NULL AND data_solicitacao IS NOT NULL
+        """)
+
         # === ⚠️ FORM CONFIG (FUNDAMENTAL) ===
         if is_postgresql:
             # Verificar se a tabela existe e tem as colunas corretas
@@ -644,6 +735,15 @@ def init_db():
             );
             """)
 
+        # Medições por etapa do processamento (tabelas criadas antes da coluna existir)
+        with _passo_opcional(cursor, is_postgresql, "Aviso ao adicionar coluna instrumentacao_json"):
+            if is_postgresql:
+                cursor.execute("ALTER TABLE processamento_resultados ADD COLUMN IF NOT EXISTS instrumentacao_json JSONB")
+            else:
+                cursor.execute("PRAGMA table_info(processamento_resultados)")
+                if 'instrumentacao_json' not in [row[1] for row in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE processamento_resultados ADD COLUMN instrumentacao_json TEXT")
+
         # === 📁 ARQUIVOS TEMPORÁRIOS DE PROCESSAMENTO ===
         if is_postgresql:
             cursor.execute("""
@@ -670,6 +770,161 @@ def init_db():
             );
             """)
 
+        # === 📋 CONSOLIDADO POR ENTREGADOR (substitui ultimo_consolidado.csv / consolidado_diario.csv) ===
+        # Valores em centavos inteiros; tipo = 'geral' ou 'diario'; posicao = ordem do consolidado
+        colunas_centavos = ",\n".join(
+            f"                {coluna}_centavos BIGINT DEFAULT 0" for coluna in (
+                'corridas', 'gorjeta', 'online_time', 'outros', 'promo', 'rotas_com_ocorrencia',
+                'tempo_espera', 'valor_total', 'valor_60_percent', 'valor_final'
+            )
+        )
+        if is_postgresql:
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS processamento_consolidado (
+                id SERIAL PRIMARY KEY,
+                pasta_uploads VARCHAR(500) NOT NULL,
+                tipo VARCHAR(20) NOT NULL,
+                posicao INTEGER NOT NULL,
+                id_da_pessoa_entregadora VARCHAR(255),
+                recebedor VARCHAR(255),
+                subpracas TEXT,
+                pracas TEXT,
+                qtd_subpracas INTEGER DEFAULT 0,
+                qtd_pracas INTEGER DEFAULT 0,
+                periodos TEXT,
+{colunas_centavos},
+                UNIQUE(pasta_uploads, tipo, posicao)
+            );
+            CREATE INDEX IF NOT EXISTS idx_consolidado_entregador ON processamento_consolidado(pasta_uploads, tipo, id_da_pessoa_entregadora);
+            CREATE INDEX IF NOT EXISTS idx_consolidado_recebedor ON processamento_consolidado(pasta_uploads, tipo, recebedor);
+            CREATE INDEX IF NOT EXISTS idx_consolidado_valor_total ON processamento_consolidado(pasta_uploads, tipo, valor_total_centavos);
+            """)
+        else:
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS processamento_consolidado (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pasta_uploads TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                posicao INTEGER NOT NULL,
+                id_da_pessoa_entregadora TEXT,
+                recebedor TEXT,
+                subpracas TEXT,
+                pracas TEXT,
+                qtd_subpracas INTEGER DEFAULT 0,
+                qtd_pracas INTEGER DEFAULT 0,
+                periodos TEXT,
+{colunas_centavos},
+                UNIQUE(pasta_uploads, tipo, posicao)
+            );
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_consolidado_entregador ON processamento_consolidado(pasta_uploads, tipo, id_da_pessoa_entregadora)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_consolidado_recebedor ON processamento_consolidado(pasta_uploads, tipo, recebedor)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_consolidado_valor_total ON processamento_consolidado(pasta_uploads, tipo, valor_total_centavos)")
+
+        # Períodos trabalhados por entregador (detalhes sem reler os CSVs; tabelas criadas antes da coluna existir)
+        with _passo_opcional(cursor, is_postgresql, "Aviso ao adicionar coluna periodos"):
+            if is_postgresql:
+                cursor.execute("ALTER TABLE processamento_consolidado ADD COLUMN IF NOT EXISTS periodos TEXT")
+            else:
+                cursor.execute("PRAGMA table_info(processamento_consolidado)")
+                if 'periodos' not in [row[1] for row in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE processamento_consolidado ADD COLUMN periodos TEXT")
+
+        # === 📆 GANHOS DIÁRIOS POR ENTREGADOR (gravados no upload; valores do dia na lista de solicitações) ===
+        # Uma linha por (entregador, dia do período de referência); valores em centavos inteiros
+        colunas_ganhos = ",\n".join(
+            f"                {coluna}_centavos BIGINT DEFAULT 0" for coluna in (
+                'corridas', 'gorjeta', 'online_time', 'outros', 'promo', 'rotas_com_ocorrencia',
+                'tempo_espera', 'valor_total', 'valor_60_percent', 'valor_final'
+            )
+        )
+        if is_postgresql:
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS ganhos_diarios (
+                id_da_pessoa_entregadora VARCHAR(255) NOT NULL,
+                data_referencia DATE NOT NULL,
+                pasta_uploads VARCHAR(500) NOT NULL,
+{colunas_ganhos},
+                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id_da_pessoa_entregadora, data_referencia)
+            );
+            CREATE INDEX IF NOT EXISTS idx_ganhos_diarios_data ON ganhos_diarios(data_referencia);
+            CREATE INDEX IF NOT EXISTS idx_ganhos_diarios_pasta ON ganhos_diarios(pasta_uploads);
+            """)
+        else:
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS ganhos_diarios (
+                id_da_pessoa_entregadora TEXT NOT NULL,
+                data_referencia TEXT NOT NULL,
+                pasta_uploads TEXT NOT NULL,
+{colunas_ganhos},
+                atualizado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id_da_pessoa_entregadora, data_referencia)
+            );
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ganhos_diarios_data ON ganhos_diarios(data_referencia)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ganhos_diarios_pasta ON ganhos_diarios(pasta_uploads)")
+
+        # === ⏳ FILA DE PROCESSAMENTO DE CSV (jobs em segundo plano) ===
+        if is_postgresql:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS processamento_jobs (
+                id VARCHAR(64) PRIMARY KEY,
+                pasta_uploads VARCHAR(500) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+                etapa VARCHAR(50),
+                percentual INTEGER DEFAULT 0,
+                arquivos_json JSONB NOT NULL,
+                resultado_json JSONB,
+                erro TEXT,
+                tentativas INTEGER DEFAULT 0,
+                processo VARCHAR(255),
+                usuario VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                iniciado_em TIMESTAMP,
+                finalizado_em TIMESTAMP,
+                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON processamento_jobs(status);
+            """)
+        else:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS processamento_jobs (
+                id TEXT PRIMARY KEY,
+                pasta_uploads TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                etapa TEXT,
+                percentual INTEGER DEFAULT 0,
+                arquivos_json TEXT NOT NULL,
+                resultado_json TEXT,
+                erro TEXT,
+                tentativas INTEGER DEFAULT 0,
+                processo TEXT,
+                usuario TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                iniciado_em TEXT,
+                finalizado_em TEXT,
+                atualizado_em TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON processamento_jobs(status)")
+
+        # === 🪪 GERAÇÃO DOS CACHES EM MEMÓRIA (compartilhada entre processos) ===
+        if is_postgresql:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_geracoes (
+                nome VARCHAR(100) PRIMARY KEY,
+                geracao BIGINT NOT NULL DEFAULT 0
+            );
+            """)
+        else:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_geracoes (
+                nome TEXT PRIMARY KEY,
+                geracao INTEGER NOT NULL DEFAULT 0
+            );
+            """)
+
         conn.commit()
         db_type = "PostgreSQL" if is_postgresql else "SQLite"
         print(f"✅ Banco inicializado com todas as tabelas ({db_type}).")
@@ -699,6 +954,12 @@ def limpar_cnpj(valor: str) -> str:
     return valor if len(valor) == 14 else ""
 
 
+def normalizar_cpf(valor):
+    """CPF só com dígitos, como gravado em cpf_norm (None se não houver dígitos)"""
+    from app.utils.route_helpers import normalize_cpf
+    return normalize_cpf(valor) or None
+
+
 # ====================================================
 # EXECUÇÃO DIRETA
 # ====================================================
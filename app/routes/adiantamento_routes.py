@@ -2,18 +2,24 @@
 Rotas para gerenciamento de adiantamentos
 """
 import os
-import json
 import csv
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import pandas as pd
 from flask import render_template, request, redirect, url_for, flash, send_file, jsonify, make_response
 from app.utils.auth_decorators import login_required, master_required
 from app.models.database import get_db_connection
+from app.utils.db_helpers import registrar_lower_unicode, condicao_contem
 from app.utils.path_manager import get_week_folder
 from config import Config
-from app.services.processador_csv_service import ProcessadorCSVService
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from app.services.processador_csv_service import ProcessadorCSVService, VERSAO_PROCESSAMENTO
+from app.services.cache_csv_service import CacheCSVService
+from app.services.relatorio_excel_service import RelatorioExcelService
+from app.services.relatorio_cache_service import RelatorioCacheService
+from app.services.consolidado_service import ConsolidadoService, TIPO_GERAL, TIPO_DIARIO
+from app.services.cpf_cache_service import CpfCacheService
+from app.services.ganhos_diarios_service import GanhosDiariosService
+from app.services.solicitacao_adiantamento_service import SolicitacaoAdiantamentoService
+from app.utils.dinheiro import reais_para_centavos, centavos_para_reais, calcular_pagamento
 from app.utils.form_control import (
     get_form_config,
     abrir_formulario,
@@ -28,7 +34,6 @@ from app.utils.constants import (
     MESSAGES,
     ARQUIVO_SOLICITACOES,
     ARQUIVO_ULTIMO_CONSOLIDADO,
-    ARQUIVO_CONSOLIDADO_DIARIO,
     FORMATO_DATA_SQL,
     FORMATO_DATA_ISO,
     FORMATO_DATA_DATETIME_LOCAL,
@@ -44,6 +49,8 @@ from app.utils.route_helpers import (
     get_flash_message
 )
 
+# Solicitações por página na lista do admin (paginação por cursor em data_envio, id)
+SOLICITACOES_POR_PAGINA = 100
 
 def _salvar_resposta_json(resposta):
     """Salva as respostas no banco de dados (JSON removido - usando apenas PostgreSQL)"""
@@ -53,147 +60,56 @@ def _salvar_resposta_json(resposta):
     pass
 
 
-def _aplicar_filtros_solicitacoes(solicitacoes, busca, filtro_dia, filtro_mes, filtro_cpf_status, filtro_sub):
-    """Aplica filtros em memória às solicitações"""
+def _filtros_solicitacoes_sql(placeholder, is_postgresql, busca, filtro_dia, filtro_mes, filtro_cpf_status, filtro_sub):
+    """
+    Monta o WHERE parametrizado dos filtros da lista de solicitações
+
+    O dia vira um intervalo em data_envio (usa o índice); busca, mês, status do CPF
+    e subpraça são as mesmas regras que antes eram aplicadas em memória.
+
+    Returns:
+        tuple: (lista de condições, lista de parâmetros)
+    """
+    condicoes = []
+    params = []
+
     if busca:
-        termo = busca.lower()
-        solicitacoes = [
-            s for s in solicitacoes
-            if termo in (s.get('nome') or '').lower()
-            or termo in (s.get('email') or '').lower()
-            or termo in (s.get('cpf') or '').lower()
-        ]
-    
+        # Curingas digitados pelo usuário são literais, como no filtro em memória
+        condicao, params_busca = condicao_contem(('s.nome', 's.email', 's.cpf'), busca, placeholder, is_postgresql)
+        condicoes.append(condicao)
+        params.extend(params_busca)
+
     if filtro_dia:
-        solicitacoes = [
-            s for s in solicitacoes
-            if (s.get('data_envio') or '')[:10] == filtro_dia
-        ]
-    
+        dia = datetime.strptime(filtro_dia, FORMATO_DATA_ISO).date()
+        condicoes.append(f"s.data_envio >= {placeholder} AND s.data_envio < {placeholder}")
+        params.extend([dia.strftime(FORMATO_DATA_ISO), (dia + timedelta(days=1)).strftime(FORMATO_DATA_ISO)])
+
     if filtro_mes:
-        solicitacoes = [
-            s for s in solicitacoes
-            if (s.get('data_envio') or '')[5:7] == f"{int(filtro_mes):02d}"
-        ]
-    
-    if filtro_cpf_status in ('0', '1'):
-        flag = int(filtro_cpf_status)
-        solicitacoes = [
-            s for s in solicitacoes
-            if int(s.get('cpf_bate', 0)) == flag
-        ]
-    
+        if is_postgresql:
+            condicoes.append(f"EXTRACT(MONTH FROM s.data_envio) = {placeholder}")
+            params.append(int(filtro_mes))
+        else:
+            condicoes.append(f"SUBSTR(s.data_envio, 6, 2) = {placeholder}")
+            params.append(f"{int(filtro_mes):02d}")
+
+    if filtro_cpf_status == '1':
+        condicoes.append("e.id_da_pessoa_entregadora IS NOT NULL")
+    elif filtro_cpf_status == '0':
+        condicoes.append("e.id_da_pessoa_entregadora IS NULL")
+
     if filtro_sub:
-        solicitacoes = [
-            s for s in solicitacoes
-            if (s.get('praca') or '') == filtro_sub
-        ]
-    
-    return solicitacoes
+        condicoes.append(f"s.praca = {placeholder}")
+        params.append(filtro_sub)
 
+    return condicoes, params
 
-def _calcular_valores_dia_solicitacoes(solicitacoes, data_ref):
-    """
-    Calcula os valores do dia específico para cada solicitação de adiantamento
-    IMPORTANTE: data_ref deve ser a data do período de referência (quando o entregador trabalhou),
-    não a data de envio da solicitação!
-    
-    OTIMIZAÇÃO: Processa apenas o ÚLTIMO arquivo CSV enviado para melhor performance
-    """
-    from app.services.processador_csv_service import ProcessadorCSVService
-    from app.utils.path_manager import get_week_folder
-    from config import Config
-    import pandas as pd
-    
-    # Coletar IDs dos entregadores que solicitaram
-    ids_entregadores = set()
-    
-    for s in solicitacoes:
-        if s.get('id_da_pessoa_entregadora'):
-            ids_entregadores.add(str(s['id_da_pessoa_entregadora']))
-    
-    if not ids_entregadores:
-        return solicitacoes
-    
-    # Buscar apenas o ÚLTIMO arquivo CSV (mais recente)
-    pasta_uploads = get_week_folder(Config.UPLOAD_FOLDER)
-    todos_arquivos = [
-        os.path.join(pasta_uploads, f)
-        for f in os.listdir(pasta_uploads)
-        if f.endswith('.csv') and f != ARQUIVO_ULTIMO_CONSOLIDADO
-    ]
-    
-    if not todos_arquivos:
-        return solicitacoes
-    
-    # Pegar apenas o último arquivo (mais recente por data de modificação)
-    ultimo_arquivo = max(todos_arquivos, key=os.path.getmtime)
-    nome_ultimo = os.path.basename(ultimo_arquivo)
-    
-    print(f"📄 Calculando valores usando apenas o último arquivo: {nome_ultimo}")
-    
-    try:
-        # Processar apenas o último arquivo CSV, filtrando pela data do período de referência
-        # e apenas para os entregadores que solicitaram
-        processador = ProcessadorCSVService()
-        resultado = processador.processar_multiplos_csv(
-            [ultimo_arquivo],  # Apenas o último arquivo
-            data_filtro=data_ref,  # Esta data será usada para filtrar dentro do CSV
-            ids_entregadores=list(ids_entregadores)  # Filtrar apenas entregadores que solicitaram
-        )
-        
-        df_consolidado = resultado['consolidado_geral']
-        
-        if df_consolidado is None or df_consolidado.empty:
-            print(f"⚠️  Nenhum dado encontrado para a data {data_ref} e entregadores {ids_entregadores}")
-            return solicitacoes
-        
-        # Criar dicionário de valores por ID do entregador
-        valores_por_id = {}
-        for _, row in df_consolidado.iterrows():
-            id_ent = str(row.get('id_da_pessoa_entregadora', ''))
-            if id_ent:
-                valores_por_id[id_ent] = {
-                    'valor_total': float(row.get('valor_total', 0)),
-                    'valor_60_percent': float(row.get('valor_60_percent', 0)),
-                    'valor_final': float(row.get('valor_final', 0)),
-                    'gorjeta': float(row.get('gorjeta', 0)),
-                    'corridas': float(row.get('corridas', 0)),
-                    'promo': float(row.get('promo', 0)),
-                    'online_time': float(row.get('online_time', 0))
-                }
-                print(f"✅ Valores encontrados para entregador {id_ent}: Total={valores_por_id[id_ent]['valor_total']}, Final={valores_por_id[id_ent]['valor_final']}")
-        
-        # Atualizar solicitações com valores calculados do dia
-        for s in solicitacoes:
-            id_ent = s.get('id_da_pessoa_entregadora')
-            if id_ent and str(id_ent) in valores_por_id:
-                valores = valores_por_id[str(id_ent)]
-                s['valor_total_dia'] = valores['valor_total']
-                s['valor_60_percent_dia'] = valores['valor_60_percent']
-                s['valor_final_dia'] = valores['valor_final']
-                s['gorjeta_dia'] = valores['gorjeta']
-                s['corridas_dia'] = valores['corridas']
-                s['promo_dia'] = valores['promo']
-                s['online_time_dia'] = valores['online_time']
-            else:
-                # Se não encontrou valores, definir como 0
-                s['valor_total_dia'] = 0.0
-                s['valor_60_percent_dia'] = 0.0
-                s['valor_final_dia'] = 0.0
-                s['gorjeta_dia'] = 0.0
-                s['corridas_dia'] = 0.0
-                s['promo_dia'] = 0.0
-                s['online_time_dia'] = 0.0
-                print(f"⚠️  Nenhum valor encontrado para entregador {id_ent} na data {data_ref}")
-        
-    except Exception as e:
-        print(f"❌ Erro ao calcular valores do dia: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        # Em caso de erro, retornar solicitações sem valores calculados
-    
-    return solicitacoes
+
+def _ler_cursor_pagina(valor):
+    """Cursor 'data_envio|id' da última linha da página anterior (None se ausente ou inválido)"""
+    data_envio, _, id_solicitacao = (valor or '').rpartition('|')
+    if not data_envio or not id_solicitacao.isdigit():
+        return None
+    return data_envio, int(id_solicitacao)
 
 
 def init_adiantamento_routes(app):
@@ -202,15 +118,20 @@ def init_adiantamento_routes(app):
     @app.route('/adiantamento/admin', methods=['GET'])
     @login_required
     def lista_solicitacoes():
-        """Lista todas as solicitações de adiantamento, com filtros"""
+        """Lista as solicitações de adiantamento, com filtros e paginação por cursor"""
         busca = (request.args.get('busca') or '').strip()
-        # Se não houver filtro de dia, usar o dia atual como padrão
+        # Se não houver filtro de dia (ou for inválido), usar o dia atual como padrão
         filtro_dia = (request.args.get('dia') or '').strip()
-        if not filtro_dia:
+        try:
+            datetime.strptime(filtro_dia, FORMATO_DATA_ISO)
+        except ValueError:
             filtro_dia = date.today().strftime(FORMATO_DATA_ISO)
         filtro_mes = (request.args.get('mes') or '').strip()
+        if not (filtro_mes.isdigit() and 1 <= int(filtro_mes) <= 12):
+            filtro_mes = ''
         filtro_cpf_status = (request.args.get('cpf_status') or '').strip()
         filtro_sub = (request.args.get('sub') or '').strip()
+        cursor_pagina = _ler_cursor_pagina(request.args.get('apos'))
         
         conn = get_db_connection()
         from app.models.database import is_postgresql_connection
@@ -221,6 +142,7 @@ def init_adiantamento_routes(app):
             cursor = conn.cursor(cursor_factory=RealDictCursor)
         else:
             cursor = conn.cursor()
+            registrar_lower_unicode(conn)
         
         # Buscar arquivos CSV enviados (com nome e data de upload)
         pasta_uploads = get_week_folder(Config.UPLOAD_FOLDER)
@@ -285,72 +207,68 @@ def init_adiantamento_routes(app):
             # Se a coluna não existir, usar lista vazia
             dias_disponiveis = []
         
-        # Buscar todas as solicitações
-        # Normalização mais robusta de CPF: remove todos os caracteres não numéricos
+        # Buscar uma página de solicitações, com os filtros aplicados no banco
+        # Cruzamento pelo cpf_norm (CPF só com dígitos, indexado nas duas tabelas)
+        placeholder = "%s" if is_postgresql else "?"
+        condicoes, params = _filtros_solicitacoes_sql(
+            placeholder, is_postgresql, busca, filtro_dia, filtro_mes, filtro_cpf_status, filtro_sub
+        )
+        if cursor_pagina:
+            # Keyset: linhas depois da última da página anterior em (data_envio, id) decrescente
+            condicoes.append(
+                f"(s.data_envio < {placeholder} OR (s.data_envio = {placeholder} AND s.id < {placeholder}))"
+            )
+            params.extend([cursor_pagina[0], cursor_pagina[0], cursor_pagina[1]])
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        
+        proximo_cursor = None
         try:
-            if is_postgresql:
-                cursor.execute("""
-                    SELECT 
-                        s.id, s.email, s.nome, s.cpf,
-                        CASE 
-                            WHEN e.id_da_pessoa_entregadora IS NOT NULL THEN 1 ELSE 0
-                        END AS cpf_bate,
-                        s.praca, s.valor_informado, s.concorda, s.data_envio,
-                        e.recebedor AS recebedor_base,
-                        e.id_da_pessoa_entregadora
-                    FROM solicitacoes_adiantamento s
-                    LEFT JOIN entregadores e 
-                        ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(s.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
-                        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(e.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
-                    ORDER BY s.data_envio DESC NULLS LAST
-                """)
-            else:
-                cursor.execute("""
-                    SELECT 
-                        s.id, s.email, s.nome, s.cpf,
-                        CASE 
-                            WHEN e.id_da_pessoa_entregadora IS NOT NULL THEN 1 ELSE 0
-                        END AS cpf_bate,
-                        s.praca, s.valor_informado, s.concorda, s.data_envio,
-                        e.recebedor AS recebedor_base,
-                        e.id_da_pessoa_entregadora
-                    FROM solicitacoes_adiantamento s
-                    LEFT JOIN entregadores e 
-                        ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(s.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
-                        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(e.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
-                    ORDER BY s.data_envio DESC
-                """)
-            solicitacoes = [dict(r) for r in cursor.fetchall()]
+            # Valores do dia (período de referência = dia filtrado) gravados no upload em ganhos_diarios
+            cursor.execute(f"""
+                SELECT 
+                    s.id, s.email, s.nome, s.cpf,
+                    CASE 
+                        WHEN e.id_da_pessoa_entregadora IS NOT NULL THEN 1 ELSE 0
+                    END AS cpf_bate,
+                    s.praca, s.valor_informado, s.concorda, s.data_envio,
+                    e.recebedor AS recebedor_base,
+                    e.id_da_pessoa_entregadora,
+                    {GanhosDiariosService.colunas_select('g')}
+                FROM solicitacoes_adiantamento s
+                LEFT JOIN entregadores e 
+                    ON s.cpf_norm = e.cpf_norm
+                LEFT JOIN ganhos_diarios g
+                    ON g.id_da_pessoa_entregadora = e.id_da_pessoa_entregadora
+                    AND g.data_referencia = {placeholder}
+                {where}
+                ORDER BY s.data_envio DESC, s.id DESC
+                LIMIT {SOLICITACOES_POR_PAGINA + 1}
+            """, [filtro_dia] + params)
+            solicitacoes = [GanhosDiariosService.aplicar_valores_dia(dict(r)) for r in cursor.fetchall()]
+            if len(solicitacoes) > SOLICITACOES_POR_PAGINA:
+                solicitacoes = solicitacoes[:SOLICITACOES_POR_PAGINA]
+                ultima = solicitacoes[-1]
+                proximo_cursor = f"{ultima['data_envio']}|{ultima['id']}"
         except Exception as e:
             # Se houver erro (coluna não existe), buscar sem data_envio
             print(f"⚠️ Aviso ao buscar solicitações: {e}")
             solicitacoes = []
         
-        conn.close()
-        
-        subpracas = sorted({s.get('praca') for s in solicitacoes if s.get('praca')})
-        
-        # Aplicar filtros
-        solicitacoes = _aplicar_filtros_solicitacoes(
-            solicitacoes, busca, filtro_dia, filtro_mes, filtro_cpf_status, filtro_sub
-        )
+        # Subpraças do filtro: agregação no banco (índice de praca), sem carregar as solicitações
+        try:
+            cursor.execute("""
+                SELECT praca
+                FROM solicitacoes_adiantamento
+                WHERE praca IS NOT NULL AND praca <> ''
+                GROUP BY praca
+                ORDER BY praca
+            """)
+            subpracas = [r["praca"] for r in cursor.fetchall()]
+        except Exception as e:
+            print(f"⚠️ Aviso ao buscar subpraças: {e}")
+            subpracas = []
         
-        # Calcular valores do dia para cada solicitação APENAS se houver filtro de dia
-        # Se não houver filtro, não calcular (evita processar muitos arquivos desnecessariamente)
-        if filtro_dia:
-            try:
-                data_para_calculo = datetime.strptime(filtro_dia, FORMATO_DATA_ISO).date()
-                solicitacoes = _calcular_valores_dia_solicitacoes(solicitacoes, data_para_calculo)
-            except (ValueError, Exception) as e:
-                print(f"Erro ao calcular valores do dia: {str(e)}")
+        conn.close()
         
         return render_template(
             TEMPLATES_ADIANTAMENTO['lista'],
@@ -363,6 +281,8 @@ def init_adiantamento_routes(app):
             filtro_mes=filtro_mes,
             filtro_cpf_status=filtro_cpf_status,
             filtro_sub=filtro_sub,
+            paginado=cursor_pagina is not None,
+            proximo_cursor=proximo_cursor,
             current_date=date.today().isoformat()
         )
     
@@ -390,51 +310,19 @@ def init_adiantamento_routes(app):
         cpf_limpo = normalize_cpf(cpf)
         email_limpo = email.strip().lower()
         
-        conn = get_db_connection()
-        from app.models.database import is_postgresql_connection
-        is_postgresql = is_postgresql_connection(conn)
-        placeholder = "%s" if is_postgresql else "?"
-        
-        if is_postgresql:
-            from psycopg2.extras import RealDictCursor
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-        else:
-            cursor = conn.cursor()
-        
-        # Validar se o entregador está cadastrado com CPF e email
-        # Buscar todos os entregadores e normalizar CPF em Python
-        # No PostgreSQL, usar LENGTH para strings vazias
-        if is_postgresql:
-            cursor.execute("SELECT id_da_pessoa_entregadora, recebedor, cpf, email FROM entregadores WHERE cpf IS NOT NULL AND LENGTH(TRIM(cpf)) > 0")
-        else:
-            cursor.execute("SELECT id_da_pessoa_entregadora, recebedor, cpf, email FROM entregadores WHERE cpf IS NOT NULL AND cpf != ''")
-        todos_entregadores = cursor.fetchall()
-        
-        entregador = None
-        for e in todos_entregadores:
-            if isinstance(e, dict):
-                cpf_entregador_limpo = normalize_cpf(e.get('cpf') or '')
-            else:
-                cpf_entregador_limpo = normalize_cpf(e[2] or '')  # cpf está na posição 2
-            if cpf_entregador_limpo == cpf_limpo:
-                entregador = e
-                break
+        # Validar se o entregador está cadastrado com CPF e email (cache CPF -> entregador)
+        entregador = CpfCacheService.buscar(cpf_limpo)
         
         if not entregador:
-            conn.close()
             return render_template(
                 TEMPLATES_ADIANTAMENTO['form_public'],
                 erro="CPF não encontrado no sistema. Entre em contato com o suporte."
             )
         
         # Verificar se o email informado corresponde ao email cadastrado
-        if isinstance(entregador, dict):
-            email_cadastrado = (entregador.get('email') or '').strip().lower()
-        else:
-            email_cadastrado = (entregador[3] or '').strip().lower()  # email está na posição 3
+        email_cadastrado = (entregador.get('email') or '').strip().lower()
         
         if email_cadastrado and email_cadastrado != email_limpo:
-            conn.close()
             return render_template(
                 TEMPLATES_ADIANTAMENTO['form_public'],
                 erro=f"Email não corresponde ao cadastrado."
@@ -442,87 +330,28 @@ def init_adiantamento_routes(app):
         
         # Verificar se o entregador tem email cadastrado
         if not email_cadastrado:
-            conn.close()
             return render_template(
                 TEMPLATES_ADIANTAMENTO['form_public'],
                 erro="Email não cadastrado no sistema. Entre em contato com o suporte para cadastrar seu email."
             )
         
-        # Regra: apenas 1 solicitação por CPF por dia
-        hoje = date.today().strftime(FORMATO_DATA_ISO)
-        try:
-            cursor.execute(f"""
-                SELECT COUNT(*) FROM solicitacoes_adiantamento
-                WHERE cpf = {placeholder} AND DATE(data_envio) = {placeholder}
-            """, (cpf, hoje))
-            resultado = cursor.fetchone()
-            ja_existe = resultado[0] if resultado else 0
-        except Exception:
-            # Se a coluna data_envio não existir, permitir múltiplas solicitações
-            ja_existe = 0
-        
-        if ja_existe > 0:
-            conn.close()
+        # Regra: apenas 1 solicitação por CPF por dia (garantida pelo índice único em cpf_norm + data_solicitacao)
+        gravada = SolicitacaoAdiantamentoService.registrar({
+            'email': email,
+            'nome': nome,
+            'cpf': cpf,
+            'praca': praca,
+            'valor': valor,
+            'concorda': concorda,
+        })
+        # None: ainda na fila de gravação (recebida, confirmada depois)
+        if gravada is False:
             return render_template(
                 TEMPLATES_ADIANTAMENTO['bloqueado'],
                 nome=nome,
                 cpf=cpf
             )
         
-        # Preparar dados JSON completos
-        resposta_json = {
-            "email": email,
-            "nome": nome,
-            "cpf": cpf,
-            "praca": praca,
-            "valor": valor,
-            "concorda": concorda,
-            "data_envio": datetime.now().strftime(FORMATO_DATA_SQL)
-        }
-        
-        # Salvar no banco (com JSON completo)
-        data_envio = resposta_json["data_envio"]
-        dados_json_str = json.dumps(resposta_json, ensure_ascii=False)
-        
-        # Verificar se é PostgreSQL ou SQLite
-        from app.models.database import is_postgresql_connection
-        is_postgresql = is_postgresql_connection(conn)
-        
-        try:
-            if is_postgresql:
-                cursor.execute("""
-                    INSERT INTO solicitacoes_adiantamento 
-                    (email, nome, cpf, praca, valor_informado, concorda, data_envio, dados_json)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb)
-                """, (email, nome, cpf, praca, valor, concorda, data_envio, dados_json_str))
-            else:
-                cursor.execute("""
-                    INSERT INTO solicitacoes_adiantamento 
-                    (email, nome, cpf, praca, valor_informado, concorda, data_envio, dados_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (email, nome, cpf, praca, valor, concorda, data_envio, dados_json_str))
-        except Exception as e:
-            # Se falhar (ex: coluna dados_json não existe), tentar sem dados_json
-            print(f"Erro ao inserir com dados_json, tentando sem: {e}")
-            if is_postgresql:
-                cursor.execute("""
-                    INSERT INTO solicitacoes_adiantamento 
-                    (email, nome, cpf, praca, valor_informado, concorda, data_envio)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (email, nome, cpf, praca, valor, concorda, data_envio))
-            else:
-                cursor.execute("""
-                    INSERT INTO solicitacoes_adiantamento 
-                    (email, nome, cpf, praca, valor_informado, concorda, data_envio)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (email, nome, cpf, praca, valor, concorda, data_envio))
-        
-        conn.commit()
-        conn.close()
-        
-        # Dados já salvos no banco (tabela solicitacoes_adiantamento)
-        # JSON removido - usando apenas PostgreSQL para segurança e consultas
-        
         return render_template(TEMPLATES_ADIANTAMENTO['sucesso'], nome=nome)
     
     @app.route('/adiantamento/gerar-diario', methods=['GET'])
@@ -576,12 +405,7 @@ def init_adiantamento_routes(app):
                            e.id_da_pessoa_entregadora, e.recebedor AS recebedor_base
                     FROM solicitacoes_adiantamento s
                     LEFT JOIN entregadores e 
-                        ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(s.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
-                        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(e.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
+                        ON s.cpf_norm = e.cpf_norm
                     ORDER BY s.data_envio ASC NULLS LAST
                 """)
             except Exception:
@@ -591,12 +415,7 @@ def init_adiantamento_routes(app):
                            e.id_da_pessoa_entregadora, e.recebedor AS recebedor_base
                     FROM solicitacoes_adiantamento s
                     LEFT JOIN entregadores e 
-                        ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(s.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
-                        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(e.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
+                        ON s.cpf_norm = e.cpf_norm
                 """)
         else:
             try:
@@ -605,12 +424,7 @@ def init_adiantamento_routes(app):
                            e.id_da_pessoa_entregadora, e.recebedor AS recebedor_base
                     FROM solicitacoes_adiantamento s
                     LEFT JOIN entregadores e 
-                        ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(s.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
-                        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(e.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
+                        ON s.cpf_norm = e.cpf_norm
                     WHERE DATE(s.data_envio) = {placeholder}
                     ORDER BY s.data_envio ASC
                 """, (data_ref.strftime(FORMATO_DATA_ISO),))
@@ -621,12 +435,7 @@ def init_adiantamento_routes(app):
                            e.id_da_pessoa_entregadora, e.recebedor AS recebedor_base
                     FROM solicitacoes_adiantamento s
                     LEFT JOIN entregadores e 
-                        ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(s.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
-                        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                            LTRIM(RTRIM(COALESCE(e.cpf, ''))), 
-                            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
+                        ON s.cpf_norm = e.cpf_norm
                 """)
         
         linhas = cursor.fetchall()
@@ -676,13 +485,33 @@ def init_adiantamento_routes(app):
             nome_arquivo = os.path.basename(arquivo_para_processar)
             print(f"📄 Gerando relatório usando o último arquivo: {nome_arquivo}")
         
+        # Mesmo CSV + mesmas solicitações (já com o cruzamento de cadastro) => mesmo relatório
+        nome_saida = f"diario_adiantamento_{data_ref.strftime(FORMATO_DATA_DIARIO)}.xlsx"
+        cache = RelatorioCacheService()
+        chave = RelatorioCacheService.chave(
+            'diario_adiantamento',
+            arquivo=nome_arquivo,
+            hash_csv=CacheCSVService.hash_arquivo(arquivo_para_processar),
+            data=data_ref,
+            solicitacoes=RelatorioCacheService.impressao_linhas(linhas),
+            versao_processamento=VERSAO_PROCESSAMENTO
+        )
+        caminho_cache = cache.obter('diario_adiantamento', chave)
+        if caminho_cache is not None:
+            flash(
+                get_flash_message('adiantamento', 'diario_gerado', filename=nome_saida),
+                "success"
+            )
+            return RelatorioCacheService.resposta(caminho_cache, chave, nome_saida)
+        
         # Processar o arquivo CSV (sem filtrar por data do período, processar tudo)
         processador = ProcessadorCSVService()
         try:
             resultado = processador.processar_multiplos_csv(
                 [arquivo_para_processar],  # Arquivo específico ou último
                 data_filtro=None,  # Não filtrar por data do período, processar tudo do arquivo
-                ids_entregadores=list(ids_solicitantes) if ids_solicitantes else None
+                ids_entregadores=list(ids_solicitantes) if ids_solicitantes else None,
+                streaming=True
             )
             df_consolidado = resultado['consolidado_geral']
         except Exception as e:
@@ -724,20 +553,17 @@ def init_adiantamento_routes(app):
             )
             return redirect(url_for('lista_solicitacoes'))
         
-        # Salvar XLSX
-        pasta_relatorios = get_week_folder(Config.RELATORIOS_FOLDER)
-        os.makedirs(pasta_relatorios, exist_ok=True)
-        
-        nome_arquivo = f"diario_adiantamento_{data_ref.strftime(FORMATO_DATA_DIARIO)}.xlsx"
-        caminho_saida = os.path.join(pasta_relatorios, nome_arquivo)
-        
-        df_diario.to_excel(caminho_saida, index=False, engine='openpyxl')
+        # Salvar XLSX (no cache de relatórios)
+        caminho_saida, _ = cache.obter_ou_gerar(
+            'diario_adiantamento', chave,
+            lambda caminho: df_diario.to_excel(caminho, index=False, engine='openpyxl')
+        )
         
         flash(
-            get_flash_message('adiantamento', 'diario_gerado', filename=nome_arquivo),
+            get_flash_message('adiantamento', 'diario_gerado', filename=nome_saida),
             "success"
         )
-        return send_file(caminho_saida, as_attachment=True)
+        return RelatorioCacheService.resposta(caminho_saida, chave, nome_saida)
     
     @app.route("/adiantamento/admin/forms", methods=["GET"])
     @login_required
@@ -909,26 +735,23 @@ def init_adiantamento_routes(app):
         try:
             tipo = request.args.get('tipo', 'normal')  # 'normal' ou 'forms'
             
-            pasta_relatorios = get_week_folder(Config.RELATORIOS_FOLDER)
-            os.makedirs(pasta_relatorios, exist_ok=True)
-            
             pasta_uploads = get_week_folder(Config.UPLOAD_FOLDER)
             
-            # Carregar consolidado
+            # Carregar consolidado (gravado no banco pelo processamento)
             if tipo == 'forms':
-                consolidado_path = os.path.join(pasta_uploads, ARQUIVO_CONSOLIDADO_DIARIO)
+                tipo_consolidado = TIPO_DIARIO
+                tipo_relatorio = 'consolidado_forms'
                 nome_arquivo = f"consolidado_forms_{datetime.now().strftime(FORMATO_DATA_ARQUIVO)}.xlsx"
             else:
-                consolidado_path = os.path.join(pasta_uploads, ARQUIVO_ULTIMO_CONSOLIDADO)
+                tipo_consolidado = TIPO_GERAL
+                tipo_relatorio = 'consolidado_normal'
                 nome_arquivo = f"consolidado_normal_{datetime.now().strftime(FORMATO_DATA_ARQUIVO)}.xlsx"
             
-            if not os.path.exists(consolidado_path):
+            versao_consolidado = ConsolidadoService.versao(pasta_uploads, tipo_consolidado)
+            if versao_consolidado is None:
                 flash('Nenhum consolidado encontrado. Processe um CSV primeiro.', 'adiantamento_error')
                 return redirect(url_for('lista_solicitacoes'))
             
-            # Ler consolidado CSV
-            df_consolidado = pd.read_csv(consolidado_path, encoding='utf-8')
-            
             # Buscar dados dos entregadores do banco
             conn = get_db_connection()
             cursor = conn.cursor()
@@ -959,8 +782,27 @@ def init_adiantamento_routes(app):
             entregadores_data = cursor.fetchall()
             conn.close()
             
-            # Criar DataFrame de entregadores
-            df_entregadores = pd.DataFrame([dict(row) for row in entregadores_data])
+            # Mesmo consolidado gravado + mesmos cadastros/PIX => mesmo Excel
+            cache = RelatorioCacheService()
+            chave = RelatorioCacheService.chave(
+                tipo_relatorio,
+                pasta=pasta_uploads,
+                consolidado=versao_consolidado,
+                entregadores=RelatorioCacheService.impressao_linhas(entregadores_data)
+            )
+            caminho_cache = cache.obter(tipo_relatorio, chave)
+            if caminho_cache is not None:
+                flash(f'Excel exportado com sucesso! ({tipo})', 'adiantamento_success')
+                return RelatorioCacheService.resposta(caminho_cache, chave, nome_arquivo)
+            
+            df_consolidado = ConsolidadoService.carregar_dataframe(pasta_uploads, tipo_consolidado, centavos=True)
+            
+            # Criar DataFrame de entregadores (colunas explícitas: sem cadastros o merge ainda funciona)
+            df_entregadores = pd.DataFrame(
+                [dict(row) for row in entregadores_data],
+                columns=['id_da_pessoa_entregadora', 'recebedor', 'email', 'cnpj', 'emissor',
+                         'subpraca', 'chave_pix', 'tipo_de_chave_pix']
+            )
             
             # Renomear colunas do banco para evitar conflito no merge
             df_entregadores = df_entregadores.rename(columns={
@@ -982,10 +824,14 @@ def init_adiantamento_routes(app):
             )
             
             # Calcular adiantamento como 60% do valor_total (excluindo gorjeta)
-            # Adiantamento = (valor_total - gorjeta) * 0.6
-            valor_total_col = df_final.get('valor_total', 0).fillna(0)
-            gorjeta_col = df_final.get('gorjeta', 0).fillna(0)
-            df_final['adiantamento_total'] = ((valor_total_col - gorjeta_col) * 0.6).round(2)
+            # Mesma conta em centavos da consolidação, direto nos centavos gravados: (valor_total - gorjeta) * 0.6
+            valor_total_centavos = df_final['valor_total_centavos']
+            gorjeta_centavos = df_final['gorjeta_centavos']
+            adiantamento_centavos, _ = calcular_pagamento(
+                valor_total_centavos, gorjeta_centavos, ProcessadorCSVService.PERCENTUAL_PAGAMENTO,
+                reais_para_centavos(ProcessadorCSVService.DESCONTO_FIXO)
+            )
+            df_final['adiantamento_total'] = centavos_para_reais(adiantamento_centavos)
             
             # Usar recebedor do consolidado se existir, senão usar do banco
             if 'recebedor' in df_final.columns:
@@ -1005,7 +851,7 @@ def init_adiantamento_routes(app):
             
             # Valores monetários
             df_excel['Total'] = df_final.get('valor_total', 0).fillna(0)
-            df_excel['Nota Fiscal'] = (df_excel['Total'] - df_final.get('gorjeta', 0).fillna(0)).round(2)
+            df_excel['Nota Fiscal'] = centavos_para_reais(valor_total_centavos - gorjeta_centavos)
             df_excel['Gorjeta'] = df_final.get('gorjeta', 0).fillna(0)
             df_excel['Valor Promocao'] = df_final.get('promo', 0).fillna(0)
             df_excel['Valor Hora Online'] = df_final.get('online_time', 0).fillna(0)
@@ -1027,44 +873,15 @@ def init_adiantamento_routes(app):
             df_excel['CNPJ'] = df_final.get('cnpj_db', '').fillna('')
             df_excel['Status'] = ''
             
-            # Salvar Excel
-            caminho_excel = os.path.join(pasta_relatorios, nome_arquivo)
-            df_excel.to_excel(caminho_excel, index=False, engine='openpyxl')
-            
-            # Formatar Excel
-            wb = load_workbook(caminho_excel)
-            ws = wb.active
-            azul_abjp = "0B5CFF"
-            
-            # Formatar cabeçalho
-            for cell in ws[1]:
-                cell.fill = PatternFill(start_color=azul_abjp, end_color=azul_abjp, fill_type="solid")
-                cell.font = Font(color="FFFFFF", bold=True, italic=True)
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Ajustar largura das colunas
-            for col in ws.columns:
-                max_length = 0
-                column = col[0].column_letter
-                for cell in col:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column].width = adjusted_width
-            
-            # Formatar células de dados
-            for row in ws.iter_rows(min_row=2):
-                for cell in row:
-                    cell.font = Font(italic=True)
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
+            # Salvar Excel (cabeçalho, larguras e fonte aplicados na escrita)
+            def gerar(caminho):
+                with RelatorioExcelService(caminho) as relatorio:
+                    relatorio.adicionar_planilha(df_excel, 'Sheet1', italico=True, centralizar=True)
             
-            wb.save(caminho_excel)
+            caminho_excel, _ = cache.obter_ou_gerar(tipo_relatorio, chave, gerar)
             
             flash(f'Excel exportado com sucesso! ({tipo})', 'adiantamento_success')
-            return send_file(caminho_excel, as_attachment=True, download_name=nome_arquivo)
+            return RelatorioCacheService.resposta(caminho_excel, chave, nome_arquivo)
             
         except Exception as e:
             flash(f'Erro ao exportar Excel: {str(e)}', 'adiantamento_error')
@@ -2,8 +2,9 @@
 Rotas para formulário público de PIX
 """
 from flask import render_template, request
-from app.models.database import get_db_connection, get_db_cursor, get_db_placeholder, is_postgresql_connection
+from app.models.database import get_db_connection, get_db_cursor, get_db_placeholder
 from app.utils.pix_logs import registrar_erro_pix
+from app.services.cpf_cache_service import CpfCacheService
 from datetime import datetime
 from app.utils.constants import (
     TEMPLATES_PIX,
@@ -73,28 +74,8 @@ def init_pix_routes(app):
                     "mensagem": "Esta chave PIX já foi cadastrada. Não é possível cadastrar a mesma chave duas vezes."
                 })
             
-            # Validar entregador (normalizar CPF em Python para compatibilidade)
-            is_postgresql = is_postgresql_connection(conn)
-            if is_postgresql:
-                # PostgreSQL: buscar todos e normalizar em Python
-                cursor.execute("SELECT id_da_pessoa_entregadora, recebedor, cnpj, cpf FROM entregadores WHERE cpf IS NOT NULL")
-            else:
-                # SQLite: usar REPLACE
-                cursor.execute("""
-                    SELECT id_da_pessoa_entregadora, recebedor, cnpj, cpf
-                    FROM entregadores
-                    WHERE REPLACE(REPLACE(REPLACE(cpf,'.',''),'-',''),' ','') = ?
-                """, (cpf_limpo,))
-            
-            entregadores = cursor.fetchall()
-            entregador = None
-            
-            # Normalizar CPF em Python para encontrar match
-            for e in entregadores:
-                cpf_entregador = e.get('cpf') if isinstance(e, dict) else e[3]
-                if normalize_cpf(cpf_entregador or '') == cpf_limpo:
-                    entregador = e
-                    break
+            # Validar entregador (cache CPF -> entregador)
+            entregador = CpfCacheService.buscar(cpf_limpo)
             
             # Usar tipo informado pelo usuário, ou detectar automaticamente se não informado
             if not tipo_chave or tipo_chave == "":
@@ -139,11 +120,11 @@ def init_pix_routes(app):
                     "nome": nome
                 })
             
-            id_ent = entregador.get("id_da_pessoa_entregadora") if isinstance(entregador, dict) else entregador[0]
+            id_ent = entregador["id_da_pessoa_entregadora"]
             
             # Gravar chave pendente para entregador cadastrado
             # Se não informou CNPJ no formulário, usa o CNPJ cadastrado do entregador
-            cnpj_final = cnpj_limpo if cnpj_limpo else (entregador.get("cnpj") if isinstance(entregador, dict) else entregador[2])
+            cnpj_final = cnpj_limpo if cnpj_limpo else entregador.get("cnpj")
             
             placeholders = ", ".join([placeholder] * 10)
             cursor.execute(f"""
@@ -167,7 +148,7 @@ def init_pix_routes(app):
             
             return render_template(TEMPLATES_PIX['form_public'], modal={
                 "type": "sucesso",
-                "nome": nome or (entregador.get("recebedor") if isinstance(entregador, dict) else entregador[1])
+                "nome": nome or entregador.get("recebedor")
             })
         except Exception as e:
             conn.rollback()
@@ -5,7 +5,8 @@ from flask import render_template, request, redirect, url_for, flash, send_file,
 import os
 from app.utils.auth_decorators import login_required, master_required, adm_or_master_required
 from datetime import datetime, timedelta
-from app.services.processador_csv_service import ProcessadorCSVService
+from app.services.processador_csv_service import ProcessadorCSVService, VERSAO_PROCESSAMENTO
+from app.services.consolidacao_semanal_service import ConsolidacaoSemanalService
 from config import Config
 from app.models.database import formatar_nome
 from app.services.upload_service import UploadService
@@ -20,21 +21,25 @@ from app.utils.constants import (
     PAGINATION_PER_PAGE_UPLOAD,
     ARQUIVO_ULTIMO_RESULTADO,
     ARQUIVO_ULTIMO_CONSOLIDADO,
-    ARQUIVO_CONSOLIDADO_DIARIO,
     FORMATO_DATA_ARQUIVO
 )
 from app.utils.route_helpers import (
-    paginate_items,
     get_page_from_request,
     get_flash_message
 )
 from app.utils.form_control import form_is_open
 from app.services.storage_service import StorageService
+from app.services.cache_csv_service import CacheCSVService
+from app.services.relatorio_cache_service import RelatorioCacheService
+from app.services.consolidado_service import ConsolidadoService, TIPO_GERAL, TIPO_DIARIO, ORDENACOES
+from app.services.ganhos_diarios_service import GanhosDiariosService
+from app.jobs.processamento_jobs import iniciar_fila_processamento, enfileirar_processamento, status_job, STATUS_CONCLUIDO, STATUS_ERRO
 
 
 UPLOAD_HISTORY_FILE = "uploads_history.json"
 UPLOAD_RETENTION_HOURS = 8
 HISTORICO_MAX_REGISTROS = 75
+CONSOLIDADO_MAX_POR_PAGINA = 200
 
 
 def _normalizar_nomes_consolidado(consolidado_dict):
@@ -231,10 +236,13 @@ def _resultado_dentro_do_prazo(resultado_json, limite_horas=UPLOAD_RETENTION_HOU
     return datetime.utcnow() - data_proc <= timedelta(hours=limite_horas)
 
 
-def _processar_consolidado_diario(df_completo, data_hoje):
+def _processar_consolidado_diario(resultado, data_hoje):
     """
     Processa consolidado diário baseado nas solicitações do formulário do dia
-    Retorna DataFrame com apenas os entregadores que solicitaram no dia
+    Retorna o consolidado apenas dos entregadores que solicitaram no dia
+    
+    A consolidação é independente por entregador, então basta filtrar as linhas
+    do consolidado geral (não é preciso reconsolidar a partir das linhas do CSV).
     """
     from app.models.database import get_db_connection
     from app.utils.route_helpers import normalize_cpf
@@ -246,12 +254,7 @@ def _processar_consolidado_diario(df_completo, data_hoje):
     cursor.execute("""
         SELECT DISTINCT s.cpf, s.nome, e.id_da_pessoa_entregadora
         FROM solicitacoes_adiantamento s
-        LEFT JOIN entregadores e ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-            LTRIM(RTRIM(COALESCE(s.cpf, ''))), 
-            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
-            REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                LTRIM(RTRIM(COALESCE(e.cpf, ''))), 
-                '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
+        LEFT JOIN entregadores e ON s.cpf_norm = e.cpf_norm
         WHERE DATE(s.data_envio) = ?
     """, (data_hoje,))
     
@@ -278,29 +281,30 @@ def _processar_consolidado_diario(df_completo, data_hoje):
     if not ids_entregadores and not cpfs_solicitantes:
         return pd.DataFrame()
     
-    # Filtrar DataFrame pelos entregadores que solicitaram
-    if 'id_da_pessoa_entregadora' in df_completo.columns:
-        df_completo['id_da_pessoa_entregadora'] = df_completo['id_da_pessoa_entregadora'].astype(str)
-        mask_id = df_completo['id_da_pessoa_entregadora'].isin(ids_entregadores)
-    else:
-        mask_id = pd.Series([False] * len(df_completo))
+    consolidado_geral = resultado.get('consolidado_geral')
+    if consolidado_geral is None or consolidado_geral.empty:
+        return pd.DataFrame()
     
-    # Filtrar por CPF se disponível
-    if 'cpf' in df_completo.columns:
-        df_completo['cpf_norm'] = df_completo['cpf'].apply(normalize_cpf)
-        mask_cpf = df_completo['cpf_norm'].isin(cpfs_solicitantes)
-    else:
-        mask_cpf = pd.Series([False] * len(df_completo))
+    # CPFs que aparecem no CSV também identificam o entregador (pares id/cpf do agregado)
+    agregado = resultado.get('agregado')
+    if cpfs_solicitantes and agregado is not None:
+        ids_entregadores |= agregado.ids_por_valor('cpf', cpfs_solicitantes, normalize_cpf)
     
-    # Combinar máscaras
-    mask = mask_id | mask_cpf
-    df_diario = df_completo[mask].copy()
+    # Filtrar consolidado pelos entregadores que solicitaram
+    consolidado = consolidado_geral.copy()
+    consolidado['id_da_pessoa_entregadora'] = consolidado['id_da_pessoa_entregadora'].astype(str)
+    consolidado_diario = consolidado[consolidado['id_da_pessoa_entregadora'].isin(ids_entregadores)]
     
-    return df_diario
+    return consolidado_diario.reset_index(drop=True)
 
 
 def _salvar_resultado_processamento(pasta_uploads, resultado, arquivos_salvos, consolidado_diario=None):
-    """Salva resultado do processamento no banco e CSV (geral e diário)"""
+    """
+    Salva resultado do processamento e o consolidado (geral e diário) no banco
+
+    Roda no worker da fila, fora da requisição: a sessão é atualizada pela rota de
+    status quando o job termina (_guardar_job_na_sessao).
+    """
     resultado_serializavel = {
         'total_entregadores': resultado['total_entregadores'],
         'valor_total_geral': float(resultado['valor_total_geral']),
@@ -328,84 +332,158 @@ def _salvar_resultado_processamento(pasta_uploads, resultado, arquivos_salvos, c
     
     # JSON removido - usando apenas PostgreSQL para segurança e consultas
     
-    # Salvar CSV consolidado geral
-    consolidado_path = None
-    if resultado.get('consolidado_geral') is not None:
-        consolidado_path = os.path.join(pasta_uploads, ARQUIVO_ULTIMO_CONSOLIDADO)
-        resultado['consolidado_geral'].to_csv(consolidado_path, index=False, encoding='utf-8')
-    
-    # Salvar CSV consolidado diário (se fornecido)
-    consolidado_diario_path = None
-    if consolidado_diario is not None and not consolidado_diario.empty:
-        consolidado_diario_path = os.path.join(pasta_uploads, ARQUIVO_CONSOLIDADO_DIARIO)
-        consolidado_diario.to_csv(consolidado_diario_path, index=False, encoding='utf-8')
-    else:
-        diario_existente = os.path.join(pasta_uploads, ARQUIVO_CONSOLIDADO_DIARIO)
-        if os.path.exists(diario_existente):
-            os.remove(diario_existente)
-    
-    # Guardar na sessão
-    session['ultimo_resultado_path'] = resultado_json_path
-    session['ultimo_consolidado_path'] = consolidado_path
-    session['ultimo_consolidado_diario_path'] = consolidado_diario_path
-    session['arquivos_processados'] = [os.path.basename(a) for a in arquivos_salvos]
+    # Consolidado geral e diário em processamento_consolidado (diário vazio apaga o anterior)
+    periodos = {
+        id_entregador: detalhes.get('periodos_trabalhados', [])
+        for id_entregador, detalhes in (resultado.get('detalhes_por_entregador') or {}).items()
+    }
+    ConsolidadoService.salvar(pasta_uploads, TIPO_GERAL, resultado.get('consolidado_geral'), periodos)
+    ConsolidadoService.salvar(pasta_uploads, TIPO_DIARIO, consolidado_diario)
     
-    return resultado_serializavel, consolidado_path, consolidado_diario_path
+    return resultado_serializavel
+
+
+def _limpar_resultado_processamento(pasta_uploads):
+    """Zera o resultado da pasta quando o último lote da semana é excluído"""
+    resultado_serializavel = {
+        'total_entregadores': 0,
+        'valor_total_geral': 0.0,
+        'data_processamento': datetime.now().strftime('%d/%m/%Y %H:%M'),
+        'erros': [],
+        'total_arquivos': 0,
+        'arquivos_sucesso': 0,
+        'arquivos_com_erro': 0,
+        'total_entregadores_cadastrados': 0,
+        'entregadores_com_dados': 0,
+    }
+    StorageService.salvar_processamento_resultado(
+        pasta_uploads=pasta_uploads,
+        resultado=resultado_serializavel,
+        dados_json=resultado_serializavel
+    )
+    ConsolidadoService.salvar(pasta_uploads, TIPO_GERAL, None)
+    ConsolidadoService.salvar(pasta_uploads, TIPO_DIARIO, None)
+    GanhosDiariosService.salvar(pasta_uploads, None)
+    print("🧹 Nenhum lote restante na semana: resultado zerado")
+    return resultado_serializavel
+
+
+def _caminho_upload_disponivel(pasta_uploads, filename):
+    """Caminho para salvar o upload sem sobrescrever outro (mesmo nome no lote ou no mesmo segundo)"""
+    base, extensao = os.path.splitext(filename)
+    caminho = os.path.join(pasta_uploads, filename)
+    sufixo = 1
+    while os.path.exists(caminho):
+        caminho = os.path.join(pasta_uploads, f"{base}_{sufixo}{extensao}")
+        sufixo += 1
+    return caminho
+
+
+def _executar_job_processamento(job, progresso):
+    """
+    Processa o lote de um job da fila (thread do pool, sem contexto de requisição)
+
+    Returns:
+        dict: resumo e arquivos processados, guardados em processamento_jobs.resultado_json
+    """
+    pasta_uploads = job['pasta_uploads']
+    arquivos_salvos = [a['caminho'] for a in job['arquivos_json']]
+    nomes_originais = [a['nome'] for a in job['arquivos_json']]
+    consolidacao = ConsolidacaoSemanalService(pasta_uploads)
+    processador = ProcessadorCSVService(progresso=progresso)
+
+    # Job sem arquivos (recálculo após excluir um lote) e nenhuma contribuição restante
+    if not arquivos_salvos and not consolidacao.contribuicoes():
+        return {
+            'resumo': _limpar_resultado_processamento(pasta_uploads),
+            'arquivos_processados': [],
+        }
+
+    # Medições por etapa de todo o lote (processamento + gravação), guardadas com o resultado
+    with processador.instrumentacao.execucao('upload'):
+        # Processar CSV sem filtrar por entregadores cadastrados - mostrar todos do CSV
+        # Incremental: só os arquivos novos são lidos e somados à consolidação da semana
+        # (reenviar um arquivo com o mesmo nome substitui a contribuição anterior;
+        # um conteúdo que já está na consolidação não é somado de novo)
+        resultado = processador.atualizar_consolidacao_semanal(arquivos_salvos, consolidacao, nomes_originais)
+
+        # Processar consolidado diário baseado nas solicitações do dia
+        progresso('consolidado_diario')
+        from datetime import date
+        data_hoje = date.today().strftime('%Y-%m-%d')
+        consolidado_diario = None
+        try:
+            consolidado_diario = _processar_consolidado_diario(resultado, data_hoje)
+            if consolidado_diario is None or consolidado_diario.empty:
+                consolidado_diario = None
+        except Exception as e:
+            print(f"⚠️ Erro ao consolidar diário: {str(e)}")
+            consolidado_diario = None
+
+        progresso('persistencia')
+        with processador.instrumentacao.etapa('persistencia', resultado['total_entregadores']):
+            resultado_serializavel = _salvar_resultado_processamento(
+                pasta_uploads, resultado, arquivos_salvos, consolidado_diario
+            )
+            # Ganhos por entregador e dia (valores do dia da lista de solicitações, sem reler CSVs)
+            GanhosDiariosService.salvar(pasta_uploads, processador.consolidar_por_dia(resultado['agregado']))
+    StorageService.salvar_instrumentacao_processamento(pasta_uploads, processador.instrumentacao.resumo())
+    if arquivos_salvos:
+        _registrar_historico_upload(pasta_uploads, arquivos_salvos, resultado_serializavel)
+
+    return {
+        'resumo': resultado_serializavel,
+        'arquivos_processados': [os.path.basename(a) for a in arquivos_salvos],
+    }
+
+
+def _remover_lote_da_consolidacao(pasta_uploads, lote):
+    """Tira os arquivos do lote da consolidação da semana e enfileira o recálculo"""
+    if not lote:
+        return
+    consolidacao = ConsolidacaoSemanalService(pasta_uploads)
+    removidos = [nome for nome in lote.get('arquivos', []) if consolidacao.remover(nome)]
+    if removidos:
+        enfileirar_processamento(pasta_uploads, [], usuario=session.get('username'))
+
+
+def _guardar_job_na_sessao(job):
+    """Leva o resultado de um job concluído para a sessão de quem acompanha o processamento"""
+    resultado = job.get('resultado') or {}
+    session['arquivos_processados'] = resultado.get('arquivos_processados', [])
 
 
 def _carregar_resultado_anterior(pasta_uploads):
-    """Carrega resultado anterior do banco ou arquivo (geral e diário)"""
-    # Tentar carregar do banco primeiro
-    resultado_json = None
+    """Carrega o resumo do último processamento da pasta (o consolidado é consultado por página)"""
     try:
         resultado_db = StorageService.carregar_processamento_resultado(pasta_uploads)
-        if resultado_db:
-            resultado_json = {
-                'total_entregadores': resultado_db.get('total_entregadores', 0),
-                'valor_total_geral': float(resultado_db.get('valor_total_geral', 0)),
-                'data_processamento': resultado_db.get('data_processamento', ''),
-                'erros': resultado_db.get('erros', []),
-                'total_arquivos': resultado_db.get('total_arquivos', 0),
-                'arquivos_sucesso': resultado_db.get('arquivos_sucesso', 0),
-                'arquivos_com_erro': resultado_db.get('arquivos_com_erro', 0),
-                'total_entregadores_cadastrados': resultado_db.get('total_entregadores_cadastrados', 0),
-                'entregadores_com_dados': resultado_db.get('entregadores_com_dados', 0),
-            }
     except Exception as e:
         print(f"❌ Erro ao carregar resultado do banco: {e}")
-        # Não usar fallback JSON - retornar None
-        return None, None, None, None
+        return None
     
-    # Se não encontrou no banco, retornar None
-    if not resultado_json:
-        return None, None, None, None
+    if not resultado_db:
+        return None
     
-    consolidado_path = session.get('ultimo_consolidado_path') or os.path.join(
-        pasta_uploads, ARQUIVO_ULTIMO_CONSOLIDADO
-    )
-    consolidado_diario_path = session.get('ultimo_consolidado_diario_path') or os.path.join(
-        pasta_uploads, ARQUIVO_CONSOLIDADO_DIARIO
-    )
-    
-    # Carregar consolidado geral
-    consolidado_dict_completo = []
-    if os.path.exists(consolidado_path):
-        df = pd.read_csv(consolidado_path, encoding='utf-8')
-        consolidado_dict_completo = df.to_dict('records')
-        consolidado_dict_completo = _normalizar_nomes_consolidado(consolidado_dict_completo)
-    
-    # Carregar consolidado diário
-    consolidado_diario_dict = []
-    if os.path.exists(consolidado_diario_path):
-        df_diario = pd.read_csv(consolidado_diario_path, encoding='utf-8')
-        consolidado_diario_dict = df_diario.to_dict('records')
-        consolidado_diario_dict = _normalizar_nomes_consolidado(consolidado_diario_dict)
-    
-    return resultado_json, consolidado_dict_completo, consolidado_path, consolidado_diario_dict
+    return {
+        'total_entregadores': resultado_db.get('total_entregadores', 0),
+        'valor_total_geral': float(resultado_db.get('valor_total_geral', 0)),
+        'data_processamento': resultado_db.get('data_processamento', ''),
+        'erros': resultado_db.get('erros', []),
+        'total_arquivos': resultado_db.get('total_arquivos', 0),
+        'arquivos_sucesso': resultado_db.get('arquivos_sucesso', 0),
+        'arquivos_com_erro': resultado_db.get('arquivos_com_erro', 0),
+        'total_entregadores_cadastrados': resultado_db.get('total_entregadores_cadastrados', 0),
+        'entregadores_com_dados': resultado_db.get('entregadores_com_dados', 0),
+    }
+
+
+def iniciar_processamento_uploads():
+    """Inicia a fila que processa os uploads em segundo plano (chamada por create_app)"""
+    iniciar_fila_processamento(_executar_job_processamento)
 
 
 def init_upload_routes(app):
-    """Inicializa as rotas de upload e processamento de CSV"""
+    """Inicializa as rotas de upload e processamento de CSV (a fila de jobs é iniciada em create_app)"""
     
     @app.route('/upload-csv')
     def upload_csv_page():
@@ -421,11 +499,12 @@ def init_upload_routes(app):
         pasta_uploads = get_week_folder(base_uploads)
         os.makedirs(pasta_uploads, exist_ok=True)
         
-        processador = ProcessadorCSVService()
         historico_uploads = _obter_historico_para_template(pasta_uploads)
+        job_em_andamento = None
 
         def render_dashboard(**kwargs):
             kwargs.setdefault('historico_uploads', historico_uploads)
+            kwargs.setdefault('job_processamento', job_em_andamento)
             kwargs.setdefault('historico_limite_horas', UPLOAD_RETENTION_HOURS)
             return render_template(TEMPLATES_UPLOAD['resultado'], **kwargs)
 
@@ -439,7 +518,6 @@ def init_upload_routes(app):
                 return render_dashboard(
                     resultado=None,
                     consolidado_dict=None,
-                    consolidado_todos=None,
                     page=1,
                     total_pages=0,
                     arquivos_processados=[],
@@ -449,15 +527,17 @@ def init_upload_routes(app):
             
             arquivos = request.files.getlist('arquivos')
             arquivos_salvos = []
+            nomes_originais = []
             
             # Salvar arquivos CSV
             for arquivo in arquivos:
                 if not arquivo.filename.endswith('.csv'):
                     continue
                 filename = f"{datetime.now().strftime(FORMATO_DATA_ARQUIVO)}_{arquivo.filename}"
-                caminho_arquivo = os.path.join(pasta_uploads, filename)
+                caminho_arquivo = _caminho_upload_disponivel(pasta_uploads, filename)
                 arquivo.save(caminho_arquivo)
                 arquivos_salvos.append(caminho_arquivo)
+                nomes_originais.append(arquivo.filename)
             
             if not arquivos_salvos:
                 flash(
@@ -468,7 +548,6 @@ def init_upload_routes(app):
                 return render_dashboard(
                     resultado=None,
                     consolidado_dict=None,
-                    consolidado_todos=None,
                     page=1,
                     total_pages=0,
                     arquivos_processados=[],
@@ -476,52 +555,13 @@ def init_upload_routes(app):
                     tipo_consolidado=tipo_consolidado
                 )
             
+            # Processamento em segundo plano: a resposta volta assim que o lote entra na fila
             try:
-                # Processar CSV sem filtrar por entregadores cadastrados - mostrar todos do CSV
-                resultado = processador.processar_multiplos_csv(
-                    arquivos_salvos,
-                    data_filtro=None,
-                    ids_entregadores=None,
-                    filtrar_por_cadastrados=False  # Processar todos do CSV, não apenas cadastrados
-                )
-                
-                # Processar consolidado diário baseado nas solicitações do dia
-                from datetime import date
-                data_hoje = date.today().strftime('%Y-%m-%d')
-                df_diario = _processar_consolidado_diario(resultado['df_completo'], data_hoje)
-                
-                # Se houver dados diários, consolidar
-                consolidado_diario = None
-                if not df_diario.empty:
-                    try:
-                        consolidado_diario = processador.consolidar_entregadores(df_diario, data_filtro=None)
-                        if consolidado_diario is None or consolidado_diario.empty:
-                            consolidado_diario = None
-                    except Exception as e:
-                        print(f"⚠️ Erro ao consolidar diário: {str(e)}")
-                        consolidado_diario = None
-                
-                resultado_serializavel, consolidado_path, consolidado_diario_path = _salvar_resultado_processamento(
-                    pasta_uploads, resultado, arquivos_salvos, consolidado_diario
-                )
-                _registrar_historico_upload(pasta_uploads, arquivos_salvos, resultado_serializavel)
-                
-                # Normalizar nomes
-                consolidado_dict_completo = resultado['consolidado_geral'].to_dict('records')
-                consolidado_dict_completo = _normalizar_nomes_consolidado(consolidado_dict_completo)
-                
-                # Paginação
-                page = get_page_from_request()
-                consolidado_pag, total_pages = paginate_items(
-                    consolidado_dict_completo, page, PAGINATION_PER_PAGE_UPLOAD
-                )
-                
-                # Redirecionar para GET após sucesso para evitar reenvio
-                flash(
-                    f'Arquivos processados com sucesso! {len(arquivos_salvos)} arquivo(s) processado(s).',
-                    'success'
+                job_id = enfileirar_processamento(
+                    pasta_uploads,
+                    [{'caminho': c, 'nome': n} for c, n in zip(arquivos_salvos, nomes_originais)],
+                    usuario=session.get('username')
                 )
-                return redirect(url_for('processar_csv'))
             except Exception as e:
                 flash(
                     get_flash_message('upload', 'erro_processar', error=str(e)),
@@ -531,24 +571,46 @@ def init_upload_routes(app):
                 return render_dashboard(
                     resultado=None,
                     consolidado_dict=None,
-                    consolidado_todos=None,
                     page=1,
                     total_pages=0,
                     arquivos_processados=[],
                     entregadores_cadastrados_ids=[],
                     tipo_consolidado=tipo_consolidado
                 )
+            
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'job_id': job_id,
+                    'status_url': url_for('status_processamento_csv', job_id=job_id)
+                }), 202
+            
+            # Redirecionar para GET (evita reenvio); a página acompanha o job até terminar
+            flash(
+                f'{len(arquivos_salvos)} arquivo(s) recebido(s). O processamento continua em segundo plano.',
+                'success'
+            )
+            return redirect(url_for('processar_csv', job=job_id))
+        
+        # Job acompanhado pela página: em andamento mostra o progresso, ao terminar vai para a sessão
+        job_id = request.args.get('job')
+        if job_id:
+            job = status_job(job_id)
+            if job and job['status'] == STATUS_CONCLUIDO:
+                _guardar_job_na_sessao(job)
+            elif job and job['status'] == STATUS_ERRO:
+                flash(get_flash_message('upload', 'erro_processar', error=job['erro']), 'error')
+            elif job:
+                job_em_andamento = job
         
         # GET - Carregar resultado anterior (geral e diário)
         try:
-            resultado_json, consolidado_geral_dict, _, consolidado_diario_dict = _carregar_resultado_anterior(pasta_uploads)
+            resultado_json = _carregar_resultado_anterior(pasta_uploads)
             
             if resultado_json is None:
                 # Renderizar tela vazia com botão de upload
                 return render_dashboard(
                     resultado=None,
                     consolidado_dict=None,
-                    consolidado_todos=None,
                     page=1,
                     total_pages=0,
                     arquivos_processados=[],
@@ -560,7 +622,6 @@ def init_upload_routes(app):
                 return render_dashboard(
                     resultado=None,
                     consolidado_dict=None,
-                    consolidado_todos=None,
                     page=1,
                     total_pages=0,
                     arquivos_processados=[],
@@ -577,8 +638,7 @@ def init_upload_routes(app):
                     return render_dashboard(
                         resultado=resultado_json,
                         consolidado_dict=None,
-                        consolidado_todos=None,
-                        page=1,
+                            page=1,
                         total_pages=0,
                         arquivos_processados=session.get('arquivos_processados', []),
                         entregadores_cadastrados_ids=[],
@@ -588,23 +648,23 @@ def init_upload_routes(app):
                     )
                 
                 # Verificar se há consolidado diário
-                if consolidado_diario_dict and len(consolidado_diario_dict) > 0:
+                totais_diario = ConsolidadoService.totais(pasta_uploads, TIPO_DIARIO)
+                if totais_diario['total_entregadores'] > 0:
                     # Usar consolidado diário (quem solicitou no formulário)
-                    consolidado_dict_completo = consolidado_diario_dict
+                    tipo_tabela = TIPO_DIARIO
                     # Ajustar resultado JSON para refletir dados diários
                     resultado_json_diario = resultado_json.copy()
-                    resultado_json_diario['total_entregadores'] = len(consolidado_diario_dict)
-                    resultado_json_diario['entregadores_com_dados'] = len(consolidado_diario_dict)
-                    if consolidado_diario_dict:
-                        resultado_json_diario['valor_total_geral'] = sum(float(row.get('valor_total', 0)) for row in consolidado_diario_dict)
+                    resultado_json_diario['total_entregadores'] = totais_diario['total_entregadores']
+                    resultado_json_diario['entregadores_com_dados'] = totais_diario['total_entregadores']
+                    resultado_json_diario['valor_total_geral'] = totais_diario['valor_total_geral']
                     resultado_json = resultado_json_diario
+                    total_registros = totais_diario['total_entregadores']
                 else:
                     # Não há solicitações no dia
                     return render_dashboard(
                         resultado=resultado_json,
                         consolidado_dict=None,
-                        consolidado_todos=None,
-                        page=1,
+                            page=1,
                         total_pages=0,
                         arquivos_processados=session.get('arquivos_processados', []),
                         entregadores_cadastrados_ids=[],
@@ -614,14 +674,14 @@ def init_upload_routes(app):
                     )
             else:
                 # Usar consolidado padrão (todos do CSV)
-                consolidado_dict_completo = consolidado_geral_dict or []
+                tipo_tabela = TIPO_GERAL
+                total_registros = ConsolidadoService.totais(pasta_uploads, TIPO_GERAL)['total_entregadores']
             
-            if not consolidado_dict_completo or len(consolidado_dict_completo) == 0:
+            if total_registros == 0:
                 # Renderizar tela vazia se não houver dados (apenas para padrão)
                 return render_dashboard(
                     resultado=None,
                     consolidado_dict=None,
-                    consolidado_todos=None,
                     page=1,
                     total_pages=0,
                     arquivos_processados=[],
@@ -633,16 +693,16 @@ def init_upload_routes(app):
             processador_temp = ProcessadorCSVService()
             entregadores_cadastrados_ids = processador_temp._obter_entregadores_cadastrados()
             
-            # Paginação
+            # Paginação no banco: só a página exibida é lida; busca e ordenação vão para /processar-csv/consolidado
             page = get_page_from_request()
-            consolidado_pag, total_pages = paginate_items(
-                consolidado_dict_completo, page, PAGINATION_PER_PAGE_UPLOAD
+            total_pages = (total_registros + PAGINATION_PER_PAGE_UPLOAD - 1) // PAGINATION_PER_PAGE_UPLOAD
+            consolidado_pag = _normalizar_nomes_consolidado(
+                ConsolidadoService.listar(pasta_uploads, tipo_tabela, page, PAGINATION_PER_PAGE_UPLOAD)
             )
             
             return render_dashboard(
                 resultado=resultado_json,
                 consolidado_dict=consolidado_pag,
-                consolidado_todos=consolidado_dict_completo,
                 page=page,
                 total_pages=total_pages,
                 arquivos_processados=session.get('arquivos_processados', []),
@@ -666,6 +726,100 @@ def init_upload_routes(app):
                 tipo_consolidado=tipo_consolidado
             )
     
+    @app.route('/processar-csv/status/<string:job_id>')
+    @adm_or_master_required
+    def status_processamento_csv(job_id):
+        """Etapa e percentual de um processamento em segundo plano (JSON)"""
+        job = status_job(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'message': 'Processamento não encontrado'
+            }), 404
+
+        if job['status'] == STATUS_CONCLUIDO:
+            # O dashboard passa a renderizar o resultado gravado pelo job
+            _guardar_job_na_sessao(job)
+            job['url_resultado'] = url_for('processar_csv')
+        return jsonify({'success': True, **job})
+
+    @app.route('/processar-csv/consolidado')
+    @adm_or_master_required
+    def consolidado_json():
+        """
+        Página do consolidado em JSON, com ordenação, filtros e totais calculados no banco
+
+        Query string: tipo (padrao|diario), page, por_pagina, ordenar, direcao (asc|desc),
+        busca (nome, id ou subpraça), praca, valor_minimo
+        """
+        pasta_uploads = get_week_folder(Config.UPLOAD_FOLDER)
+        tipo_consolidado = request.args.get('tipo', 'padrao')
+
+        resultado_json = _carregar_resultado_anterior(pasta_uploads)
+        if resultado_json is None or not _resultado_dentro_do_prazo(resultado_json):
+            return jsonify({
+                'success': False,
+                'message': 'Nenhum resultado disponível. Envie um novo CSV.'
+            }), 404
+
+        if tipo_consolidado == 'diario':
+            if form_is_open():
+                return jsonify({
+                    'success': False,
+                    'message': 'O formulário ainda está aberto. Feche o formulário antes de visualizar o consolidado diário.'
+                }), 409
+            tipo_tabela = TIPO_DIARIO
+        else:
+            tipo_tabela = TIPO_GERAL
+
+        ordenar = request.args.get('ordenar', 'posicao')
+        if ordenar not in ORDENACOES:
+            return jsonify({
+                'success': False,
+                'message': f'Ordenação não suportada: {ordenar}'
+            }), 400
+        decrescente = request.args.get('direcao', 'asc').lower() == 'desc'
+        page = max(get_page_from_request(), 1)
+        por_pagina = request.args.get('por_pagina', PAGINATION_PER_PAGE_UPLOAD, type=int)
+        por_pagina = min(max(por_pagina, 1), CONSOLIDADO_MAX_POR_PAGINA)
+        filtros = {
+            'busca': request.args.get('busca', '').strip() or None,
+            'praca': request.args.get('praca', '').strip() or None,
+            'valor_minimo': request.args.get('valor_minimo', type=float),
+        }
+
+        totais = ConsolidadoService.totais(pasta_uploads, tipo_tabela, **filtros)
+        registros = _normalizar_nomes_consolidado(
+            ConsolidadoService.listar(
+                pasta_uploads, tipo_tabela, page, por_pagina,
+                ordenar_por=ordenar, decrescente=decrescente, **filtros
+            )
+        )
+
+        # Cadastro verificado só para os entregadores da página
+        cadastrados = set(ProcessadorCSVService()._obter_entregadores_cadastrados())
+        for registro in registros:
+            registro['cadastrado'] = registro['id_da_pessoa_entregadora'] in cadastrados
+            if not registro['cadastrado']:
+                registro['url_cadastro'] = url_for(
+                    'novo_entregador',
+                    id_da_pessoa_entregadora=registro['id_da_pessoa_entregadora'],
+                    recebedor=registro['recebedor'] or ''
+                )
+
+        return jsonify({
+            'success': True,
+            'tipo': tipo_consolidado,
+            'registros': registros,
+            'page': page,
+            'por_pagina': por_pagina,
+            'total_registros': totais['total_entregadores'],
+            'total_pages': (totais['total_entregadores'] + por_pagina - 1) // por_pagina,
+            'ordenar': ordenar,
+            'direcao': 'desc' if decrescente else 'asc',
+            'totais': totais,
+        })
+
     @app.route('/lotes')
     @login_required
     def listar_lotes():
@@ -683,22 +837,30 @@ def init_upload_routes(app):
     @app.route('/lotes/<lote_id>/excluir', methods=['POST'])
     @master_required
     def excluir_lote(lote_id):
-        """Exclui um lote do histórico (apenas Master)"""
+        """
+        Exclui um lote do histórico (apenas Master)
+
+        As contribuições dos arquivos do lote saem da consolidação da semana e um
+        job de recálculo (sem arquivos) é enfileirado, para que os valores do lote
+        não continuem no consolidado nem nos ganhos diários.
+        """
         try:
+            base_uploads = Config.UPLOAD_FOLDER
+            pasta_uploads = get_week_folder(base_uploads)
+            uploads = _carregar_historico_uploads(pasta_uploads)
+            lote = next((u for u in uploads if u.get('id') == lote_id), None)
+
             # Tentar excluir do banco primeiro
             sucesso = StorageService.excluir_upload_history(lote_id)
             
             if sucesso:
+                _remover_lote_da_consolidacao(pasta_uploads, lote)
                 return jsonify({
                     'success': True,
                     'message': 'Lote excluído com sucesso'
                 })
             
             # Fallback: tentar excluir do arquivo JSON
-            base_uploads = Config.UPLOAD_FOLDER
-            pasta_uploads = get_week_folder(base_uploads)
-            
-            uploads = _carregar_historico_uploads(pasta_uploads)
             
             # Encontrar e remover o lote
             uploads_original = len(uploads)
@@ -712,6 +874,7 @@ def init_upload_routes(app):
             
             # Salvar histórico atualizado
             _salvar_historico_uploads(pasta_uploads, uploads)
+            _remover_lote_da_consolidacao(pasta_uploads, lote)
             
             return jsonify({
                 'success': True,
@@ -735,11 +898,6 @@ def init_upload_routes(app):
                 return redirect(url_for('entregadores'))
             
             pasta_uploads = get_week_folder(Config.UPLOAD_FOLDER)
-            arquivos_csv = [
-                os.path.join(pasta_uploads, f)
-                for f in os.listdir(pasta_uploads)
-                if f.endswith('.csv')
-            ]
             
             # Dados padrão se não houver arquivos
             dados_processamento_padrao = {
@@ -748,25 +906,41 @@ def init_upload_routes(app):
                 'valor_final': 0, 'periodos_trabalhados': [], 'subpracas': []
             }
             
-            if not arquivos_csv:
-                flash('⚠️ Usando dados de exemplo - faça upload de CSVs para dados reais', 'info')
-                dados_processamento = dados_processamento_padrao.copy()
-                dados_processamento.update({
-                    'valor_total': 199.74, 'corridas': 150.00, 'gorjeta': 25.00,
-                    'promo': 15.00, 'online_time': 9.74, 'valor_60_percent': 119.84,
-                    'valor_final': 119.49, 'periodos_trabalhados': ['ALMOCO', 'TARDE', 'JANTAR'],
-                    'subpracas': ['RIO - BARRA - FREGUESIA (OL DEDICADO)']
-                })
-            else:
-                resultado_geral = processador.processar_multiplos_csv(arquivos_csv)
-                df_completo = resultado_geral['df_completo']
-                dados_processamento = processador.obter_detalhes_processamento_entregador(
-                    id_entregador, df_completo
-                )
+            # Agregado gravado no último processamento da semana (consulta indexada, sem ler CSVs)
+            dados_processamento = ConsolidadoService.obter_detalhes(pasta_uploads, id_entregador)
+            
+            if dados_processamento is None:
+                arquivos_csv = [
+                    os.path.join(pasta_uploads, f)
+                    for f in (os.listdir(pasta_uploads) if os.path.isdir(pasta_uploads) else [])
+                    if f.endswith('.csv')
+                ]
                 
-                if not dados_processamento:
-                    flash('Nenhum dado de processamento encontrado para este entregador', 'warning')
-                    dados_processamento = dados_processamento_padrao
+                if not arquivos_csv:
+                    flash('⚠️ Usando dados de exemplo - faça upload de CSVs para dados reais', 'info')
+                    dados_processamento = dados_processamento_padrao.copy()
+                    dados_processamento.update({
+                        'valor_total': 199.74, 'corridas': 150.00, 'gorjeta': 25.00,
+                        'promo': 15.00, 'online_time': 9.74, 'valor_60_percent': 119.84,
+                        'valor_final': 119.49, 'periodos_trabalhados': ['ALMOCO', 'TARDE', 'JANTAR'],
+                        'subpracas': ['RIO - BARRA - FREGUESIA (OL DEDICADO)']
+                    })
+                else:
+                    # Sem agregado gravado: relê os arquivos guardando só as linhas deste entregador
+                    try:
+                        resultado_entregador = processador.processar_multiplos_csv(
+                            arquivos_csv, ids_entregadores=[id_entregador], streaming=True
+                        )
+                        dados_processamento = processador.obter_detalhes_processamento_entregador(
+                            id_entregador, detalhes_por_entregador=resultado_entregador['detalhes_por_entregador']
+                        )
+                    except Exception as e:
+                        print(f"⚠️ Entregador {id_entregador} sem dados nos CSVs da semana: {e}")
+                        dados_processamento = None
+                    
+                    if not dados_processamento:
+                        flash('Nenhum dado de processamento encontrado para este entregador', 'warning')
+                        dados_processamento = dados_processamento_padrao
             
             dados_cadastrais['recebedor'] = formatar_nome(dados_cadastrais['recebedor'])
             
@@ -783,19 +957,15 @@ def init_upload_routes(app):
     def gerar_relatorio_excel():
         """Gera relatório Excel completo usando APENAS o último arquivo CSV enviado"""
         try:
-            pasta_relatorios = get_week_folder(Config.RELATORIOS_FOLDER)
-            os.makedirs(pasta_relatorios, exist_ok=True)
-            
-            nome_arquivo = f"relatorio_{datetime.now().strftime(FORMATO_DATA_ARQUIVO)}.xlsx"
-            caminho_relatorio = os.path.join(pasta_relatorios, nome_arquivo)
-            
             processador = ProcessadorCSVService()
+            cache = RelatorioCacheService()
             pasta_uploads = get_week_folder(Config.UPLOAD_FOLDER)
+            nome_download = f"relatorio_{datetime.now().strftime(FORMATO_DATA_ARQUIVO)}.xlsx"
             
             # Buscar todos os arquivos CSV (exceto o consolidado)
             todos_arquivos = [
                 os.path.join(pasta_uploads, f)
-                for f in os.listdir(pasta_uploads)
+                for f in (os.listdir(pasta_uploads) if os.path.isdir(pasta_uploads) else [])
                 if f.endswith('.csv') and f != ARQUIVO_ULTIMO_CONSOLIDADO
             ]
             
@@ -807,33 +977,48 @@ def init_upload_routes(app):
                     'valor_60_percent': 600,
                     'valor_final': 599.65
                 }])
-                processador.gerar_relatorio_excel(dados_exemplo, caminho_relatorio)
+                chave = RelatorioCacheService.chave('relatorio_exemplo')
+                caminho_relatorio, _ = cache.obter_ou_gerar(
+                    'relatorio_exemplo', chave,
+                    lambda caminho: processador.gerar_relatorio_excel(dados_exemplo, caminho)
+                )
                 flash(
                     get_flash_message('upload', 'relatorio_exemplo'),
                     'info'
                 )
-                return send_file(caminho_relatorio, as_attachment=True)
+                return RelatorioCacheService.resposta(caminho_relatorio, chave, nome_download)
             
             # Pegar apenas o último arquivo (mais recente por data de modificação)
             ultimo_arquivo = max(todos_arquivos, key=os.path.getmtime)
             nome_ultimo = os.path.basename(ultimo_arquivo)
             
-            print(f"📄 Processando apenas o último arquivo: {nome_ultimo}")
-            
-            # Processar apenas o último arquivo - sem filtrar por cadastrados
-            resultado = processador.processar_multiplos_csv(
-                [ultimo_arquivo],
-                data_filtro=None,
-                ids_entregadores=None,
-                filtrar_por_cadastrados=False  # Processar todos do CSV
+            # Mesmo conteúdo de CSV => mesmo relatório (reaproveitado do cache)
+            chave = RelatorioCacheService.chave(
+                'relatorio',
+                arquivo=nome_ultimo,
+                hash_csv=CacheCSVService.hash_arquivo(ultimo_arquivo),
+                versao_processamento=VERSAO_PROCESSAMENTO
             )
-            processador.gerar_relatorio_excel(resultado['consolidado_geral'], caminho_relatorio)
+            
+            def gerar(caminho):
+                print(f"📄 Processando apenas o último arquivo: {nome_ultimo}")
+                # Processar apenas o último arquivo - sem filtrar por cadastrados
+                resultado = processador.processar_multiplos_csv(
+                    [ultimo_arquivo],
+                    data_filtro=None,
+                    ids_entregadores=None,
+                    filtrar_por_cadastrados=False,  # Processar todos do CSV
+                    streaming=True
+                )
+                processador.gerar_relatorio_excel(resultado['consolidado_geral'], caminho)
+            
+            caminho_relatorio, _ = cache.obter_ou_gerar('relatorio', chave, gerar)
             flash(
                 f'Relatório gerado com sucesso usando o arquivo: {nome_ultimo}',
                 'success'
             )
             
-            return send_file(caminho_relatorio, as_attachment=True)
+            return RelatorioCacheService.resposta(caminho_relatorio, chave, nome_download)
         except Exception as e:
             flash(
                 get_flash_message('upload', 'erro_relatorio', error=str(e)),
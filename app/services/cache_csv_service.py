@@ -0,0 +1,181 @@
+"""
+Cache em disco dos CSVs já processados (lidos, tipados e classificados)
+Formato colunar Arrow IPC (Feather v2), chaveado pelo hash do conteúdo do arquivo de origem
+"""
+import os
+import hashlib
+import threading
+from config import Config
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    print("⚠️ pyarrow não instalado. Cache de CSV processado desativado.")
+
+
+class CacheCSVService:
+    """
+    Cache de DataFrames processados por conteúdo do arquivo
+
+    - Chave: sha256 do conteúdo do CSV + versão do processamento (um arquivo
+      substituído gera outra chave, então entradas antigas nunca são servidas)
+    - Entrada: um arquivo .arrow com um record batch por bloco de leitura
+      (colunas categóricas são gravadas como valores; quem lê reaplica os tipos)
+    - Limite de tamanho: ao gravar, remove as entradas usadas há mais tempo
+    """
+
+    EXTENSAO = '.arrow'
+    TAMANHO_BLOCO_HASH = 1024 * 1024
+
+    # Hash já calculado por (caminho, tamanho, mtime): evita reler o arquivo a cada acesso
+    _hashes = {}
+    _lock = threading.Lock()
+
+    def __init__(self, versao, pasta=None, limite_bytes=None):
+        self.versao = versao
+        self.pasta = pasta or Config.CSV_CACHE_FOLDER
+        self.limite_bytes = limite_bytes if limite_bytes is not None else Config.CSV_CACHE_MAX_MB * 1024 * 1024
+        os.makedirs(self.pasta, exist_ok=True)
+
+    @staticmethod
+    def disponivel():
+        """Indica se o cache pode ser usado (pyarrow instalado e cache habilitado)"""
+        return PYARROW_AVAILABLE and Config.CSV_CACHE_ENABLED
+
+    @classmethod
+    def hash_arquivo(cls, caminho_arquivo):
+        """Calcula (ou reaproveita) o sha256 do conteúdo do arquivo"""
+        stat = os.stat(caminho_arquivo)
+        assinatura = (os.path.abspath(caminho_arquivo), stat.st_size, stat.st_mtime_ns)
+        with cls._lock:
+            if assinatura in cls._hashes:
+                return cls._hashes[assinatura]
+
+        sha = hashlib.sha256()
+        with open(caminho_arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(cls.TAMANHO_BLOCO_HASH), b''):
+                sha.update(bloco)
+        digest = sha.hexdigest()
+
+        with cls._lock:
+            cls._hashes[assinatura] = digest
+        return digest
+
+    def _caminho_entrada(self, caminho_arquivo):
+        chave = f"{self.hash_arquivo(caminho_arquivo)}_{self.versao}"
+        return os.path.join(self.pasta, chave + self.EXTENSAO)
+
+    def iterar(self, caminho_arquivo):
+        """
+        Retorna um iterador de DataFrames (um por bloco) se o arquivo estiver no cache
+
+        Returns:
+            generator ou None (cache miss)
+        """
+        entrada = self._caminho_entrada(caminho_arquivo)
+        if not os.path.exists(entrada):
+            return None
+
+        try:
+            # Marca a entrada como usada recentemente (critério de remoção)
+            os.utime(entrada)
+        except OSError:
+            return None
+
+        def _blocos():
+            with pa.memory_map(entrada, 'r') as origem:
+                leitor = pa.ipc.open_file(origem)
+                for i in range(leitor.num_record_batches):
+                    yield leitor.get_batch(i).to_pandas()
+
+        return _blocos()
+
+    def gravador(self, caminho_arquivo):
+        """Context manager que grava os blocos processados de um arquivo no cache"""
+        return _GravadorCache(self._caminho_entrada(caminho_arquivo), self.aplicar_limite)
+
+    def aplicar_limite(self):
+        """Remove as entradas menos usadas até o cache caber em limite_bytes"""
+        try:
+            entradas = []
+            for nome in os.listdir(self.pasta):
+                if not nome.endswith(self.EXTENSAO):
+                    continue
+                caminho = os.path.join(self.pasta, nome)
+                stat = os.stat(caminho)
+                entradas.append((stat.st_mtime, stat.st_size, caminho))
+
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            for _, tamanho, caminho in sorted(entradas):
+                if total <= self.limite_bytes:
+                    break
+                os.remove(caminho)
+                total -= tamanho
+                print(f"   🧹 Cache removido: {os.path.basename(caminho)}")
+        except OSError as e:
+            print(f"   ⚠️  Erro ao aplicar limite do cache: {e}")
+
+
+class _GravadorCache:
+    """Grava blocos num arquivo temporário e só publica a entrada se a leitura terminou sem erro"""
+
+    def __init__(self, destino, ao_publicar):
+        self.destino = destino
+        self.temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.ao_publicar = ao_publicar
+        self.schema = None
+        self.sink = None
+        self.writer = None
+        self.falhou = False
+
+    def escrever(self, df):
+        if self.falhou:
+            return
+        try:
+            tabela = _sem_dicionarios(pa.Table.from_pandas(df, preserve_index=False))
+            if self.writer is None:
+                self.schema = tabela.schema
+                self.sink = pa.OSFile(self.temporario, 'wb')
+                self.writer = pa.ipc.new_file(self.sink, self.schema)
+            else:
+                tabela = tabela.cast(self.schema)
+            self.writer.write_table(tabela)
+        except Exception as e:
+            # Blocos com tipos incompatíveis: segue sem cache para este arquivo
+            print(f"   ⚠️  Cache não gravado para este arquivo: {e}")
+            self.falhou = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.writer is not None:
+                self.writer.close()
+            if self.sink is not None:
+                self.sink.close()
+        except Exception:
+            self.falhou = True
+
+        if exc_type is None and not self.falhou and self.writer is not None:
+            os.replace(self.temporario, self.destino)
+            self.ao_publicar()
+        elif os.path.exists(self.temporario):
+            os.remove(self.temporario)
+        return False
+
+
+def _sem_dicionarios(tabela):
+    """
+    Troca colunas dictionary (categóricas do pandas) pelos valores
+
+    Cada bloco traz o próprio dicionário e o formato de arquivo IPC não aceita
+    substituir um dicionário no meio do arquivo; quem lê reaplica os tipos.
+    """
+    colunas = [
+        coluna.cast(coluna.type.value_type) if pa.types.is_dictionary(coluna.type) else coluna
+        for coluna in tabela.columns
+    ]
+    return pa.Table.from_arrays(colunas, names=tabela.column_names)
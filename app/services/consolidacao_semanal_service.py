@@ -0,0 +1,233 @@
+"""
+Consolidação incremental da semana (pasta de get_week_folder)
+Guarda, por arquivo enviado, as somas já reduzidas por entregador/dia/tipo de valor
+"""
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from app.services.cache_csv_service import CacheCSVService
+from app.services.processador_csv_service import AgregadoEntregadores
+
+try:
+    import fcntl
+except ImportError:  # Windows: o bloqueio vale só entre as threads deste processo
+    fcntl = None
+
+
+class ConsolidacaoSemanalService:
+    """
+    Contribuições reduzidas de cada arquivo da semana
+
+    - Chave: nome com que o arquivo foi enviado (reenviar o mesmo nome, por exemplo uma
+      exportação corrigida, substitui a contribuição anterior); 'arquivo' é o nome salvo
+      (com o prefixo de data/hora) que gerou a contribuição
+    - Um conteúdo (hash) já consolidado não entra de novo, mesmo enviado com outro nome:
+      o arquivo salvo repetido fica em 'duplicatas' e assume a contribuição se o lote
+      do original for excluído
+    - Contribuição: somas por (id, recebedor, dia, tipo_valor) e pares distintos (id, praça/subpraça/cpf)
+    - Índice JSON com hash do conteúdo, versão do processamento e linhas de cada arquivo
+    - Gravação e leitura sob bloqueio(), que exclui outras threads e outros processos
+    """
+
+    PASTA = 'consolidacao'
+    ARQUIVO_INDICE = 'contribuicoes.json'
+    ARQUIVO_BLOQUEIO = '.lock'
+
+    _lock = threading.Lock()
+    # Bloqueios já obtidos pela thread atual ({caminho do .lock: profundidade}), para reentrância
+    _locais = threading.local()
+
+    def __init__(self, pasta_semana):
+        self.pasta_semana = pasta_semana
+        self.pasta = os.path.join(pasta_semana, self.PASTA)
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def _caminho_indice(self):
+        return os.path.join(self.pasta, self.ARQUIVO_INDICE)
+
+    def _prefixo(self, nome):
+        return os.path.join(self.pasta, hashlib.sha1(nome.encode('utf-8')).hexdigest()[:16])
+
+    def _carregar_indice(self):
+        try:
+            with open(self._caminho_indice(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _salvar_indice(self, indice):
+        temporario = f"{self._caminho_indice()}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(indice, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self._caminho_indice())
+
+    @staticmethod
+    def _salvar_pickle(df, caminho):
+        """Grava num temporário e troca: um leitor nunca vê o pickle pela metade"""
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_pickle(temporario)
+        os.replace(temporario, caminho)
+
+    @contextmanager
+    def bloqueio(self):
+        """
+        Exclusão mútua da consolidação da pasta entre threads e processos
+
+        flock em consolidacao/.lock (cada abertura do arquivo é um bloqueio
+        independente, então também exclui as threads do mesmo processo).
+        Reentrante na mesma thread: registrar/remover/agregado podem ser
+        chamados dentro de um bloqueio() mais amplo.
+        """
+        caminho = os.path.abspath(os.path.join(self.pasta, self.ARQUIVO_BLOQUEIO))
+        obtidos = getattr(self._locais, 'obtidos', None)
+        if obtidos is None:
+            obtidos = self._locais.obtidos = {}
+
+        if obtidos.get(caminho):
+            obtidos[caminho] += 1
+            try:
+                yield
+            finally:
+                obtidos[caminho] -= 1
+            return
+
+        if fcntl is not None:
+            arquivo = open(caminho, 'a')
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+        else:
+            arquivo = None
+            self._lock.acquire()
+        obtidos[caminho] = 1
+        try:
+            yield
+        finally:
+            del obtidos[caminho]
+            if arquivo is not None:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+                arquivo.close()
+            else:
+                self._lock.release()
+
+    def contribuicoes(self):
+        """Arquivos que compõem a consolidação: {nome enviado: {arquivo, hash, versao, linhas, atualizado_em, duplicatas}}"""
+        return self._carregar_indice()
+
+    def com_conteudo(self, hash_conteudo):
+        """Nome da contribuição já gravada com este conteúdo (qualquer versão), ou None"""
+        for nome, entrada in self._carregar_indice().items():
+            if entrada.get('hash') == hash_conteudo:
+                return nome
+        return None
+
+    def desatualizadas(self, versao):
+        """Contribuições gravadas com outra versão do processamento cujo CSV ainda está na pasta"""
+        pendentes = {}
+        for nome, entrada in self._carregar_indice().items():
+            caminho = os.path.join(self.pasta_semana, entrada.get('arquivo', ''))
+            if entrada.get('versao') != versao and os.path.isfile(caminho):
+                pendentes[nome] = caminho
+        return pendentes
+
+    def registrar_duplicata(self, nome, arquivo_salvo):
+        """Anota um arquivo salvo com o mesmo conteúdo da contribuição `nome` (não somado de novo)"""
+        with self.bloqueio():
+            indice = self._carregar_indice()
+            if nome not in indice:
+                return False
+            duplicatas = indice[nome].setdefault('duplicatas', [])
+            if arquivo_salvo != indice[nome].get('arquivo') and arquivo_salvo not in duplicatas:
+                duplicatas.append(arquivo_salvo)
+                self._salvar_indice(indice)
+        return True
+
+    def registrar(self, nome, caminho_arquivo, agregado, versao, hash_conteudo=None):
+        """
+        Grava (ou substitui) a contribuição reduzida do arquivo enviado como `nome`
+
+        Ao substituir, as duplicatas da contribuição anterior (cópias do conteúdo
+        antigo) deixam de valer.
+        """
+        somas, pares = agregado.exportar()
+        prefixo = self._prefixo(nome)
+
+        with self.bloqueio():
+            self._salvar_pickle(somas, f"{prefixo}_somas.pkl")
+            self._salvar_pickle(pares, f"{prefixo}_pares.pkl")
+            indice = self._carregar_indice()
+            substituiu = nome in indice
+            indice[nome] = {
+                'arquivo': os.path.basename(caminho_arquivo),
+                'hash': hash_conteudo or CacheCSVService.hash_arquivo(caminho_arquivo),
+                'versao': versao,
+                'linhas': agregado.linhas,
+                'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._salvar_indice(indice)
+
+        print(f"   {'🔁 Contribuição substituída' if substituiu else '➕ Contribuição adicionada'}: {nome}")
+        return substituiu
+
+    def remover(self, arquivo_salvo):
+        """
+        Remove da consolidação a contribuição de um arquivo salvo (exclusão do lote)
+
+        Se outro arquivo salvo tem o mesmo conteúdo (duplicata), ele passa a ser
+        a contribuição e os valores não mudam. Um arquivo cuja contribuição já foi
+        substituída por um reenvio não está no índice e não muda nada.
+
+        Returns:
+            bool: True se os valores da consolidação mudaram (é preciso recalcular)
+        """
+        with self.bloqueio():
+            indice = self._carregar_indice()
+            for nome, entrada in indice.items():
+                duplicatas = entrada.get('duplicatas', [])
+                if arquivo_salvo in duplicatas:
+                    duplicatas.remove(arquivo_salvo)
+                    self._salvar_indice(indice)
+                    return False
+                if entrada.get('arquivo') != arquivo_salvo:
+                    continue
+
+                if duplicatas:
+                    entrada['arquivo'] = duplicatas.pop(0)
+                    self._salvar_indice(indice)
+                    print(f"   🔁 Contribuição de {nome} passou para {entrada['arquivo']} (mesmo conteúdo)")
+                    return False
+
+                del indice[nome]
+                self._salvar_indice(indice)
+                prefixo = self._prefixo(nome)
+                for sufixo in ('_somas.pkl', '_pares.pkl'):
+                    if os.path.exists(prefixo + sufixo):
+                        os.remove(prefixo + sufixo)
+                print(f"   ➖ Contribuição removida: {nome} ({arquivo_salvo})")
+                return True
+        return False
+
+    def agregado(self, versao=None):
+        """
+        Agregado (por dia) de todas as contribuições da semana (só as da `versao`, se informada)
+
+        Uma contribuição ilegível levanta exceção: ignorá-la deixaria o valor dos
+        entregadores daquele arquivo de fora do resultado sem ninguém perceber.
+        """
+        total = AgregadoEntregadores(por_dia=True)
+        with self.bloqueio():
+            for nome, entrada in self._carregar_indice().items():
+                if versao is not None and entrada.get('versao') != versao:
+                    print(f"   ⚠️  Contribuição de outra versão do processamento ignorada: {nome}")
+                    continue
+                prefixo = self._prefixo(nome)
+                try:
+                    somas = pd.read_pickle(f"{prefixo}_somas.pkl")
+                    pares = pd.read_pickle(f"{prefixo}_pares.pkl")
+                except Exception as e:
+                    raise Exception(f"Contribuição ilegível na consolidação da semana ({nome}): {e}")
+                total.mesclar(AgregadoEntregadores.importar(somas, pares, entrada.get('linhas', 0), por_dia=True))
+        total.compactar()
+        return total
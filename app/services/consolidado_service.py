@@ -0,0 +1,295 @@
+"""
+Consolidado por entregador de cada processamento, em tabela (processamento_consolidado)
+
+Substitui ultimo_consolidado.csv / consolidado_diario.csv: o processamento grava as
+linhas uma vez, em lote, e as telas consultam só a página, a ordem ou o entregador
+de que precisam (consultas indexadas por pasta da semana + tipo).
+"""
+import pandas as pd
+from app.models.database import get_db_cursor, get_db_placeholder, is_postgresql_connection
+from app.utils.db_helpers import db_connection, registrar_lower_unicode, condicao_contem
+from app.utils.dinheiro import reais_para_centavos, centavos_para_reais
+
+TIPO_GERAL = 'geral'
+TIPO_DIARIO = 'diario'
+
+# Colunas do consolidado, na ordem de ProcessadorCSVService.consolidar_agregado
+COLUNAS_CONSOLIDADO = [
+    'id_da_pessoa_entregadora', 'recebedor', 'corridas', 'gorjeta', 'online_time', 'outros', 'promo',
+    'rotas_com_ocorrencia', 'tempo_espera', 'subpracas', 'qtd_subpracas', 'pracas', 'qtd_pracas',
+    'valor_total', 'valor_60_percent', 'valor_final',
+]
+# Valores em reais no consolidado, gravados em centavos inteiros (coluna <nome>_centavos)
+COLUNAS_VALORES = [
+    'corridas', 'gorjeta', 'online_time', 'outros', 'promo', 'rotas_com_ocorrencia', 'tempo_espera',
+    'valor_total', 'valor_60_percent', 'valor_final',
+]
+COLUNAS_TEXTO = ['id_da_pessoa_entregadora', 'recebedor', 'subpracas', 'pracas']
+COLUNAS_INTEIRAS = ['qtd_subpracas', 'qtd_pracas']
+
+COLUNAS_TABELA = (
+    ['pasta_uploads', 'tipo', 'posicao'] + COLUNAS_TEXTO + COLUNAS_INTEIRAS + ['periodos']
+    + [f"{coluna}_centavos" for coluna in COLUNAS_VALORES]
+)
+
+# Separador das listas guardadas em texto (subpracas, pracas, periodos), como em _resumir_pares
+SEPARADOR_LISTA = " / "
+
+# Ordenações aceitas: coluna do consolidado -> coluna da tabela
+ORDENACOES = {
+    'posicao': 'posicao',
+    'recebedor': 'recebedor',
+    'id_da_pessoa_entregadora': 'id_da_pessoa_entregadora',
+    **{coluna: coluna for coluna in COLUNAS_INTEIRAS},
+    **{coluna: f"{coluna}_centavos" for coluna in COLUNAS_VALORES},
+}
+
+
+class ConsolidadoService:
+    """Grava e consulta o consolidado por entregador de cada pasta de uploads"""
+
+    @staticmethod
+    def _linhas(pasta_uploads, tipo, consolidado, periodos=None):
+        """Tuplas de COLUNAS_TABELA a partir do DataFrame consolidado"""
+        n = len(consolidado)
+        periodos = periodos or {}
+        colunas = {
+            'pasta_uploads': [pasta_uploads] * n,
+            'tipo': [tipo] * n,
+            'posicao': list(range(n)),
+            'periodos': [
+                SEPARADOR_LISTA.join(str(p) for p in periodos.get(id_entregador) or []) or None
+                for id_entregador in consolidado['id_da_pessoa_entregadora']
+            ],
+        }
+        for coluna in COLUNAS_TEXTO:
+            serie = consolidado[coluna] if coluna in consolidado.columns else pd.Series(None, index=consolidado.index)
+            colunas[coluna] = [None if pd.isna(v) else str(v) for v in serie]
+        for coluna in COLUNAS_INTEIRAS:
+            serie = consolidado[coluna] if coluna in consolidado.columns else pd.Series(0, index=consolidado.index)
+            colunas[coluna] = pd.to_numeric(serie, errors='coerce').fillna(0).astype('int64').tolist()
+        for coluna in COLUNAS_VALORES:
+            serie = consolidado[coluna] if coluna in consolidado.columns else pd.Series(0.0, index=consolidado.index)
+            colunas[f"{coluna}_centavos"] = reais_para_centavos(serie).tolist()
+        return list(zip(*(colunas[c] for c in COLUNAS_TABELA)))
+
+    @staticmethod
+    def salvar(pasta_uploads, tipo, consolidado, periodos=None):
+        """
+        Substitui o consolidado `tipo` da pasta (numa única transação)
+
+        Leitores concorrentes veem o consolidado anterior ou o novo, nunca um arquivo pela metade.
+
+        Args:
+            periodos: {id: [períodos trabalhados]} (de indexar_detalhes), usados por obter_detalhes
+
+        Returns:
+            int: linhas gravadas
+        """
+        linhas = (
+            [] if consolidado is None or consolidado.empty
+            else ConsolidadoService._linhas(pasta_uploads, tipo, consolidado, periodos)
+        )
+        with db_connection() as conn:
+            cursor = get_db_cursor(conn)
+            p = get_db_placeholder(conn)
+            cursor.execute(
+                f"DELETE FROM processamento_consolidado WHERE pasta_uploads = {p} AND tipo = {p}",
+                (pasta_uploads, tipo)
+            )
+            if linhas:
+                colunas = ', '.join(COLUNAS_TABELA)
+                if is_postgresql_connection(conn):
+                    from psycopg2.extras import execute_values
+                    execute_values(
+                        cursor,
+                        f"INSERT INTO processamento_consolidado ({colunas}) VALUES %s",
+                        linhas,
+                        page_size=1000
+                    )
+                else:
+                    cursor.executemany(
+                        f"INSERT INTO processamento_consolidado ({colunas}) VALUES ({', '.join([p] * len(COLUNAS_TABELA))})",
+                        linhas
+                    )
+        return len(linhas)
+
+    @staticmethod
+    def _registro(row, centavos=False):
+        """Linha da tabela -> dicionário no formato do consolidado (valores em reais; com centavos, também <valor>_centavos)"""
+        row = dict(row)
+        registro = {}
+        for coluna in COLUNAS_CONSOLIDADO:
+            if coluna in COLUNAS_VALORES:
+                valor_centavos = int(row.get(f"{coluna}_centavos") or 0)
+                registro[coluna] = centavos_para_reais(valor_centavos)
+                if centavos:
+                    registro[f"{coluna}_centavos"] = valor_centavos
+            else:
+                registro[coluna] = row.get(coluna)
+        return registro
+
+    @staticmethod
+    def _filtros(conn, pasta_uploads, tipo, busca=None, praca=None, valor_minimo=None):
+        """Cláusula WHERE e parâmetros dos filtros do consolidado (registra o LOWER Unicode na conexão SQLite)"""
+        p = get_db_placeholder(conn)
+        is_postgresql = is_postgresql_connection(conn)
+        condicoes = [f"pasta_uploads = {p}", f"tipo = {p}"]
+        parametros = [pasta_uploads, tipo]
+        if busca or praca:
+            registrar_lower_unicode(conn)
+        if busca:
+            # Nome, id ou subpraças contendo o termo (sem diferenciar maiúsculas)
+            condicao, params_busca = condicao_contem(
+                ('recebedor', 'id_da_pessoa_entregadora', 'subpracas'), busca, p, is_postgresql
+            )
+            condicoes.append(condicao)
+            parametros += params_busca
+        if praca:
+            condicao, params_praca = condicao_contem(('pracas',), praca, p, is_postgresql)
+            condicoes.append(condicao)
+            parametros += params_praca
+        if valor_minimo is not None:
+            condicoes.append(f"valor_total_centavos >= {p}")
+            parametros.append(reais_para_centavos(valor_minimo))
+        return " AND ".join(condicoes), parametros
+
+    @staticmethod
+    def listar(pasta_uploads, tipo=TIPO_GERAL, pagina=None, por_pagina=None, ordenar_por='posicao', decrescente=False,
+               busca=None, praca=None, valor_minimo=None, centavos=False):
+        """
+        Registros do consolidado (todos, ou só uma página)
+
+        Args:
+            pagina: Página (começa em 1); None devolve todos os registros
+            por_pagina: Registros por página
+            ordenar_por: Uma das chaves de ORDENACOES
+            decrescente: Ordem decrescente
+            busca: Termo procurado no nome, id ou subpraças
+            praca: Trecho do nome da praça
+            valor_minimo: valor_total mínimo, em reais
+            centavos: Inclui os valores gravados em centavos (<valor>_centavos)
+        """
+        if ordenar_por not in ORDENACOES:
+            raise ValueError(f"Ordenação não suportada: {ordenar_por}")
+        direcao = 'DESC' if decrescente else 'ASC'
+
+        with db_connection() as conn:
+            cursor = get_db_cursor(conn)
+            p = get_db_placeholder(conn)
+            where, parametros = ConsolidadoService._filtros(conn, pasta_uploads, tipo, busca, praca, valor_minimo)
+            sql = f"""
+                SELECT * FROM processamento_consolidado
+                WHERE {where}
+                ORDER BY {ORDENACOES[ordenar_por]} {direcao}, posicao {direcao}
+            """
+            if pagina is not None and por_pagina:
+                sql += f" LIMIT {p} OFFSET {p}"
+                parametros += [por_pagina, (max(pagina, 1) - 1) * por_pagina]
+            cursor.execute(sql, tuple(parametros))
+            return [ConsolidadoService._registro(row, centavos) for row in cursor.fetchall()]
+
+    @staticmethod
+    def totais(pasta_uploads, tipo=TIPO_GERAL, busca=None, praca=None, valor_minimo=None):
+        """Quantidade de linhas e somas (em reais) do consolidado, com os mesmos filtros de listar"""
+        with db_connection() as conn:
+            cursor = get_db_cursor(conn)
+            where, parametros = ConsolidadoService._filtros(conn, pasta_uploads, tipo, busca, praca, valor_minimo)
+            cursor.execute(f"""
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(valor_total_centavos), 0) AS valor_total_centavos,
+                       COALESCE(SUM(valor_60_percent_centavos), 0) AS valor_60_percent_centavos,
+                       COALESCE(SUM(valor_final_centavos), 0) AS valor_final_centavos
+                FROM processamento_consolidado
+                WHERE {where}
+            """, tuple(parametros))
+            row = dict(cursor.fetchone())
+        return {
+            'total_entregadores': int(row['total']),
+            'valor_total_geral': centavos_para_reais(int(row['valor_total_centavos'])),
+            'valor_60_percent': centavos_para_reais(int(row['valor_60_percent_centavos'])),
+            'valor_final': centavos_para_reais(int(row['valor_final_centavos'])),
+        }
+
+    @staticmethod
+    def versao(pasta_uploads, tipo=TIPO_GERAL):
+        """
+        Versão do consolidado gravado (muda a cada salvar: as linhas são regravadas com ids novos)
+
+        Returns:
+            str ou None se não houver consolidado
+        """
+        with db_connection() as conn:
+            cursor = get_db_cursor(conn)
+            p = get_db_placeholder(conn)
+            cursor.execute(f"""
+                SELECT COUNT(*) AS total, MAX(id) AS ultimo_id
+                FROM processamento_consolidado
+                WHERE pasta_uploads = {p} AND tipo = {p}
+            """, (pasta_uploads, tipo))
+            row = dict(cursor.fetchone())
+        if not row['total']:
+            return None
+        return f"{row['total']}:{row['ultimo_id']}"
+
+    @staticmethod
+    def obter_entregador(pasta_uploads, id_entregador, tipo=TIPO_GERAL):
+        """Linhas do consolidado de um entregador (uma por nome de recebedor)"""
+        with db_connection() as conn:
+            cursor = get_db_cursor(conn)
+            p = get_db_placeholder(conn)
+            cursor.execute(f"""
+                SELECT * FROM processamento_consolidado
+                WHERE pasta_uploads = {p} AND tipo = {p} AND id_da_pessoa_entregadora = {p}
+                ORDER BY posicao
+            """, (pasta_uploads, tipo, str(id_entregador)))
+            return [ConsolidadoService._registro(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def obter_detalhes(pasta_uploads, id_entregador, tipo=TIPO_GERAL):
+        """
+        Detalhes de processamento de um entregador, no formato de indexar_detalhes
+
+        Lidos do consolidado gravado no processamento (uma consulta indexada, sem reler
+        os CSVs). Entregador com mais de um nome de recebedor: vale a primeira linha.
+
+        Returns:
+            dict ou None se o entregador não está no consolidado da pasta
+        """
+        with db_connection() as conn:
+            cursor = get_db_cursor(conn)
+            p = get_db_placeholder(conn)
+            cursor.execute(f"""
+                SELECT * FROM processamento_consolidado
+                WHERE pasta_uploads = {p} AND tipo = {p} AND id_da_pessoa_entregadora = {p}
+                ORDER BY posicao
+                LIMIT 1
+            """, (pasta_uploads, tipo, str(id_entregador)))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        row = dict(row)
+        registro = ConsolidadoService._registro(row)
+
+        detalhes = {
+            coluna: float(registro[coluna]) for coluna in (
+                'valor_total', 'corridas', 'gorjeta', 'promo', 'online_time', 'rotas_com_ocorrencia',
+                'tempo_espera', 'outros', 'valor_60_percent', 'valor_final'
+            )
+        }
+        detalhes['periodos_trabalhados'] = row['periodos'].split(SEPARADOR_LISTA) if row.get('periodos') else []
+        detalhes['subpracas'] = registro['subpracas'].split(SEPARADOR_LISTA) if registro['subpracas'] else []
+        return detalhes
+
+    @staticmethod
+    def carregar_dataframe(pasta_uploads, tipo=TIPO_GERAL, centavos=False):
+        """
+        Consolidado completo como DataFrame (mesmas colunas de consolidar_agregado)
+
+        Com centavos=True inclui as colunas <valor>_centavos gravadas, para contas em
+        centavos sem converter de volta os valores em reais
+        """
+        colunas = list(COLUNAS_CONSOLIDADO)
+        if centavos:
+            colunas += [f"{coluna}_centavos" for coluna in COLUNAS_VALORES]
+        return pd.DataFrame(ConsolidadoService.listar(pasta_uploads, tipo, centavos=centavos), columns=colunas)
@@ -0,0 +1,186 @@
+"""
+Cache em memória (por processo) de entregadores por CPF normalizado
+Usado pelos formulários públicos de adiantamento e PIX
+"""
+import threading
+import time
+from config import Config
+from app.models.database import get_db_connection, get_db_cursor, get_db_placeholder, normalizar_cpf
+from app.utils.db_helpers import row_to_dict
+
+
+class CpfCacheService:
+    """
+    Mapa cpf_norm -> entregadores, para responder sem ir ao banco a cada envio
+
+    - Aquecido na inicialização do app; depois de invalidar() (cadastro, edição,
+      exclusão e importação de entregadores) ou do TTL o mapa é esvaziado e se
+      refaz CPF a CPF pelo índice de cpf_norm (nenhuma busca recarrega a tabela)
+    - Cada processo tem o seu cache; invalidar() também incrementa a geração
+      compartilhada no banco (cache_geracoes). A geração é conferida no máximo a
+      cada CPF_CACHE_GERACAO_SEGUNDOS: uma alteração feita em outro processo chega
+      a este em até esse intervalo
+    - Um CPF ausente é conferido no banco antes de ser dado como não cadastrado
+    - Validações de integridade (validar_duplicatas) não usam o cache: consultam
+      o banco com buscar_no_banco
+    """
+
+    COLUNAS = ('id_da_pessoa_entregadora', 'recebedor', 'cpf', 'cnpj', 'email')
+    # Linha de cache_geracoes deste cache
+    NOME_GERACAO = 'entregadores_cpf'
+
+    _por_cpf = {}
+    _carregado_em = None
+    # Incrementada a cada invalidar(): uma carga iniciada antes dela é descartada
+    _geracao = 0
+    # Geração do banco (cache_geracoes) do mapa atual e quando ela foi conferida
+    _geracao_banco = None
+    _conferido_em = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _expirado(agora):
+        ttl = Config.CPF_CACHE_TTL_SEGUNDOS
+        return ttl > 0 and agora - CpfCacheService._carregado_em > ttl
+
+    @staticmethod
+    def _ler_geracao_banco(conn):
+        cursor = get_db_cursor(conn)
+        cursor.execute(
+            f"SELECT geracao FROM cache_geracoes WHERE nome = {get_db_placeholder(conn)}",
+            (CpfCacheService.NOME_GERACAO,)
+        )
+        row = cursor.fetchone()
+        return row_to_dict(row)['geracao'] if row else 0
+
+    @staticmethod
+    def _esvaziar(geracao_banco):
+        """Descarta o mapa (chamar com _lock); os CPFs voltam ao cache conforme são buscados"""
+        CpfCacheService._geracao += 1
+        CpfCacheService._por_cpf = {}
+        CpfCacheService._carregado_em = time.monotonic()
+        CpfCacheService._geracao_banco = geracao_banco
+        CpfCacheService._conferido_em = CpfCacheService._carregado_em
+
+    @staticmethod
+    def aquecer():
+        """Carrega todos os entregadores com CPF para o cache (retorna o mapa carregado)"""
+        geracao = CpfCacheService._geracao
+        colunas = ', '.join(CpfCacheService.COLUNAS)
+        conn = get_db_connection()
+        try:
+            # A geração é lida antes dos entregadores: uma alteração no meio da carga
+            # muda a geração e a próxima conferência esvazia o mapa
+            geracao_banco = CpfCacheService._ler_geracao_banco(conn)
+            cursor = get_db_cursor(conn)
+            cursor.execute(f"SELECT {colunas}, cpf_norm FROM entregadores WHERE cpf_norm IS NOT NULL")
+            por_cpf = {}
+            for row in cursor.fetchall():
+                entregador = row_to_dict(row)
+                por_cpf.setdefault(entregador.pop('cpf_norm'), []).append(entregador)
+        finally:
+            conn.close()
+
+        with CpfCacheService._lock:
+            if geracao == CpfCacheService._geracao:
+                CpfCacheService._por_cpf = por_cpf
+                CpfCacheService._carregado_em = time.monotonic()
+                CpfCacheService._geracao_banco = geracao_banco
+                CpfCacheService._conferido_em = CpfCacheService._carregado_em
+        return por_cpf
+
+    @staticmethod
+    def invalidar():
+        """Esvazia o cache deste processo e avisa os demais pela geração no banco"""
+        with CpfCacheService._lock:
+            CpfCacheService._esvaziar(CpfCacheService._geracao_banco)
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            placeholder = get_db_placeholder(conn)
+            cursor.execute(f"""
+                INSERT INTO cache_geracoes (nome, geracao) VALUES ({placeholder}, 1)
+                ON CONFLICT (nome) DO UPDATE SET geracao = cache_geracoes.geracao + 1
+            """, (CpfCacheService.NOME_GERACAO,))
+            conn.commit()
+            geracao_banco = CpfCacheService._ler_geracao_banco(conn)
+        except Exception as e:
+            conn.rollback()
+            # Os outros processos esvaziam o cache pelo TTL
+            print(f"⚠️ Erro ao atualizar a geração do cache de CPFs: {e}")
+            return
+        finally:
+            conn.close()
+
+        with CpfCacheService._lock:
+            CpfCacheService._geracao_banco = geracao_banco
+
+    @staticmethod
+    def _conferir_validade():
+        """Esvazia o mapa após o TTL ou se a geração no banco mudou (conferida a cada CPF_CACHE_GERACAO_SEGUNDOS)"""
+        agora = time.monotonic()
+        if CpfCacheService._carregado_em is None or CpfCacheService._expirado(agora):
+            with CpfCacheService._lock:
+                CpfCacheService._esvaziar(CpfCacheService._geracao_banco)
+            return
+        if agora - CpfCacheService._conferido_em < Config.CPF_CACHE_GERACAO_SEGUNDOS:
+            return
+
+        conn = get_db_connection()
+        try:
+            geracao_banco = CpfCacheService._ler_geracao_banco(conn)
+        finally:
+            conn.close()
+        with CpfCacheService._lock:
+            CpfCacheService._conferido_em = agora
+            if geracao_banco != CpfCacheService._geracao_banco:
+                CpfCacheService._esvaziar(geracao_banco)
+
+    @staticmethod
+    def buscar_no_banco(cpf):
+        """Entregadores com o CPF (com ou sem formatação) direto no banco, pelo índice de cpf_norm"""
+        cpf_norm = normalizar_cpf(cpf)
+        if not cpf_norm:
+            return []
+
+        colunas = ', '.join(CpfCacheService.COLUNAS)
+        conn = get_db_connection()
+        try:
+            cursor = get_db_cursor(conn)
+            cursor.execute(
+                f"SELECT {colunas} FROM entregadores WHERE cpf_norm = {get_db_placeholder(conn)}",
+                (cpf_norm,)
+            )
+            return [row_to_dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def buscar_todos(cpf):
+        """
+        Todos os entregadores cadastrados com o CPF (com ou sem formatação)
+
+        Returns:
+            list[dict]: cópias com id_da_pessoa_entregadora, recebedor, cpf, cnpj e email
+        """
+        cpf_norm = normalizar_cpf(cpf)
+        if not cpf_norm:
+            return []
+
+        CpfCacheService._conferir_validade()
+        entregadores = CpfCacheService._por_cpf.get(cpf_norm)
+        if entregadores is None:
+            geracao = CpfCacheService._geracao
+            entregadores = CpfCacheService.buscar_no_banco(cpf_norm)
+            if entregadores:
+                with CpfCacheService._lock:
+                    if geracao == CpfCacheService._geracao:
+                        CpfCacheService._por_cpf[cpf_norm] = entregadores
+        return [dict(e) for e in entregadores]
+
+    @staticmethod
+    def buscar(cpf):
+        """Primeiro entregador cadastrado com o CPF, ou None"""
+        entregadores = CpfCacheService.buscar_todos(cpf)
+        return entregadores[0] if entregadores else None
@@ -1,5 +1,6 @@
-from app.models.database import get_db_connection, formatar_nome, get_db_cursor, get_db_placeholder, is_postgresql_connection
+from app.models.database import get_db_connection, formatar_nome, get_db_cursor, get_db_placeholder, is_postgresql_connection, normalizar_cpf
 from app.utils.db_helpers import row_to_dict
+from app.services.cpf_cache_service import CpfCacheService
 
 class EntregadoresService:
     """
@@ -192,12 +193,10 @@ class EntregadoresService:
             cursor = EntregadoresService._get_cursor(conn)
             placeholder = EntregadoresService._get_placeholder(conn)
             
-            # Buscar por CPF normalizado (removendo pontos, traços, espaços)
+            # Buscar pela coluna indexada de CPF normalizado
             cursor.execute(f'''
                 SELECT * FROM entregadores
-                WHERE REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
-                    LTRIM(RTRIM(COALESCE(cpf, ''))), 
-                    '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') = {placeholder}
+                WHERE cpf_norm = {placeholder}
             ''', (cpf_limpo,))
             
             resultado = cursor.fetchone()
@@ -280,23 +279,9 @@ class EntregadoresService:
             if cpf:
                 cpf_limpo = normalize_cpf(cpf)
                 if cpf_limpo:
-                    # Buscar todos os entregadores e normalizar CPF em Python
-                    placeholder = EntregadoresService._get_placeholder(conn)
-                    # No PostgreSQL, usar aspas simples ou LENGTH para strings vazias
-                    if is_postgresql:
-                        query = f'SELECT id_da_pessoa_entregadora, recebedor, cpf FROM entregadores WHERE cpf IS NOT NULL AND LENGTH(TRIM(cpf)) > 0'
-                    else:
-                        query = 'SELECT id_da_pessoa_entregadora, recebedor, cpf FROM entregadores WHERE cpf IS NOT NULL AND cpf != ""'
-                    
-                    if id_entregador_excluir:
-                        query += f' AND id_da_pessoa_entregadora != {placeholder}'
-                        cursor.execute(query, (id_entregador_excluir,))
-                    else:
-                        cursor.execute(query)
-                    
-                    for row in cursor.fetchall():
-                        cpf_existente_limpo = normalize_cpf(row['cpf'] or '')
-                        if cpf_existente_limpo == cpf_limpo:
+                    # Checagem de integridade: direto no banco (índice de cpf_norm), nunca pelo cache
+                    for row in CpfCacheService.buscar_no_banco(cpf_limpo):
+                        if row['id_da_pessoa_entregadora'] != id_entregador_excluir:
                             erros.append(f'CPF já cadastrado para o entregador: {row["recebedor"]}')
                             break
             
@@ -398,20 +383,21 @@ class EntregadoresService:
         conn = get_db_connection()
         is_postgresql = is_postgresql_connection(conn)
         placeholder = EntregadoresService._get_placeholder(conn)
-        placeholders = ", ".join([placeholder] * 9)
+        placeholders = ", ".join([placeholder] * 10)
         
         try:
             cursor = conn.cursor()
             # Insere entregador
             cursor.execute(f'''
                 INSERT INTO entregadores 
-                (id_da_pessoa_entregadora, recebedor, email, cpf, cnpj, praca, subpraca, emissor, status)
+                (id_da_pessoa_entregadora, recebedor, email, cpf, cpf_norm, cnpj, praca, subpraca, emissor, status)
                 VALUES ({placeholders})
             ''', (
                 dados['id_da_pessoa_entregadora'],
                 dados['recebedor'],
                 dados.get('email', ''),
                 dados.get('cpf', ''),
+                normalizar_cpf(dados.get('cpf')),
                 dados.get('cnpj', ''),
                 dados.get('praca', ''),
                 dados.get('subpraca', ''),
@@ -425,6 +411,7 @@ class EntregadoresService:
 
             # Fazer commit da inserção do entregador antes de atualizar PIX
             conn.commit()
+            CpfCacheService.invalidar()
 
             # Atualizar registros PIX pendentes que correspondem a este entregador
             # (usa conexão separada para evitar lock)
@@ -486,7 +473,7 @@ class EntregadoresService:
             cursor = conn.cursor()
 
             placeholders_update = ", ".join([f"{col} = {placeholder}" for col in [
-                "recebedor", "email", "cpf", "cnpj", "praca", "subpraca", "emissor", "status"
+                "recebedor", "email", "cpf", "cpf_norm", "cnpj", "praca", "subpraca", "emissor", "status"
             ]])
             
             cursor.execute(f'''
@@ -497,6 +484,7 @@ class EntregadoresService:
                 dados.get('recebedor', ''),
                 dados.get('email', ''),
                 dados.get('cpf', ''),
+                normalizar_cpf(dados.get('cpf')),
                 dados.get('cnpj', ''),
                 dados.get('praca', ''),
                 dados.get('subpraca', ''),
@@ -518,6 +506,7 @@ class EntregadoresService:
                 ))
 
             conn.commit()
+            CpfCacheService.invalidar()
             return True
 
         except sqlite3.Error as e:
@@ -540,6 +529,7 @@ class EntregadoresService:
             cursor.execute(f'DELETE FROM historico_pix WHERE id_da_pessoa_entregadora = {placeholder}', (id_entregador,))
             cursor.execute(f'DELETE FROM entregadores WHERE id_da_pessoa_entregadora = {placeholder}', (id_entregador,))
             conn.commit()
+            CpfCacheService.invalidar()
             return True
         except Exception as e:
             raise Exception(f'Erro ao excluir entregador: {str(e)}')
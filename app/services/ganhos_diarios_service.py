@@ -0,0 +1,95 @@
+"""
+Ganhos de cada entregador por dia do período de referência, em tabela (ganhos_diarios)
+
+Gravados no processamento do upload a partir da consolidação da semana (já separada
+por dia); a lista de solicitações de adiantamento obtém os valores do dia com um join
+pela chave (entregador, dia), sem ler nenhum CSV.
+"""
+from app.models.database import get_db_cursor, get_db_placeholder, is_postgresql_connection
+from app.utils.db_helpers import db_connection
+from app.utils.dinheiro import centavos_para_reais
+from app.services.consolidado_service import COLUNAS_VALORES
+
+COLUNAS_TABELA = (
+    ['id_da_pessoa_entregadora', 'data_referencia', 'pasta_uploads']
+    + [f"{coluna}_centavos" for coluna in COLUNAS_VALORES]
+)
+
+# Valores do dia exibidos na lista de solicitações (chave <nome>_dia, em reais)
+COLUNAS_DIA = ['valor_total', 'valor_60_percent', 'valor_final', 'gorjeta', 'corridas', 'promo', 'online_time']
+
+
+class GanhosDiariosService:
+    """Grava e consulta os ganhos por (entregador, dia do período de referência)"""
+
+    @staticmethod
+    def _linhas(pasta_uploads, ganhos):
+        """Tuplas de COLUNAS_TABELA a partir do DataFrame de consolidar_por_dia"""
+        colunas = {
+            'id_da_pessoa_entregadora': ganhos['id_da_pessoa_entregadora'].astype(str).tolist(),
+            'data_referencia': ganhos['dia'].dt.strftime('%Y-%m-%d').tolist(),
+            'pasta_uploads': [pasta_uploads] * len(ganhos),
+        }
+        for coluna in COLUNAS_VALORES:
+            colunas[f"{coluna}_centavos"] = ganhos[coluna].astype('int64').tolist()
+        return list(zip(*(colunas[c] for c in COLUNAS_TABELA)))
+
+    @staticmethod
+    def salvar(pasta_uploads, ganhos):
+        """
+        Substitui os ganhos diários da pasta da semana (numa única transação)
+
+        Os dias presentes em `ganhos` também são removidos de outras pastas: o
+        upload mais recente de um dia é o que vale, como no consolidado.
+
+        Returns:
+            int: linhas gravadas
+        """
+        linhas = [] if ganhos is None or ganhos.empty else GanhosDiariosService._linhas(pasta_uploads, ganhos)
+        dias = sorted({linha[1] for linha in linhas})
+        with db_connection() as conn:
+            cursor = get_db_cursor(conn)
+            p = get_db_placeholder(conn)
+            cursor.execute(f"DELETE FROM ganhos_diarios WHERE pasta_uploads = {p}", (pasta_uploads,))
+            if dias:
+                cursor.execute(
+                    f"DELETE FROM ganhos_diarios WHERE data_referencia IN ({', '.join([p] * len(dias))})",
+                    dias
+                )
+            if linhas:
+                colunas = ', '.join(COLUNAS_TABELA)
+                if is_postgresql_connection(conn):
+                    from psycopg2.extras import execute_values
+                    execute_values(
+                        cursor,
+                        f"INSERT INTO ganhos_diarios ({colunas}) VALUES %s",
+                        linhas,
+                        page_size=1000
+                    )
+                else:
+                    cursor.executemany(
+                        f"INSERT INTO ganhos_diarios ({colunas}) VALUES ({', '.join([p] * len(COLUNAS_TABELA))})",
+                        linhas
+                    )
+        print(f"📆 Ganhos diários gravados: {len(linhas)} linha(s) em {len(dias)} dia(s)")
+        return len(linhas)
+
+    @staticmethod
+    def colunas_select(alias='g'):
+        """Colunas do SELECT com os valores do dia em centavos (<nome>_dia_centavos), para o join em ganhos_diarios"""
+        return ', '.join(f"{alias}.{coluna}_centavos AS {coluna}_dia_centavos" for coluna in COLUNAS_DIA)
+
+    @staticmethod
+    def aplicar_valores_dia(registro):
+        """
+        Converte as colunas de colunas_select() de uma linha em <nome>_dia (reais)
+
+        Entregador encontrado (id_da_pessoa_entregadora na linha) sem ganhos no dia
+        fica com os valores zerados; sem entregador as chaves ficam ausentes.
+        """
+        centavos = {coluna: registro.pop(f"{coluna}_dia_centavos", None) for coluna in COLUNAS_DIA}
+        if centavos['valor_total'] is None and registro.get('id_da_pessoa_entregadora') is None:
+            return registro
+        for coluna, valor in centavos.items():
+            registro[f"{coluna}_dia"] = centavos_para_reais(int(valor or 0))
+        return registro
@@ -0,0 +1,217 @@
+"""
+Motor Arrow do processamento de CSV (opcional, CSV_MOTOR=arrow)
+Leitura, classificação e somas por entregador com pyarrow, usando todos os núcleos num único processo
+"""
+import csv
+import codecs
+import numpy as np
+import pandas as pd
+from app.services.processador_csv_service import (
+    AgregadoEntregadores, CHAVE_ENTREGADOR, CHAVES_PIVOT, CHAVE_DIA, COLUNAS_LIDAS,
+    COLUNAS_DISTINTAS, COLUNA_CENTAVOS, FORMATO_DATA, TIPO_PADRAO,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Bytes de CSV convertidos por bloco (cada bloco é reduzido antes de ler o próximo)
+TAMANHO_BLOCO = 64 * 1024 * 1024
+# Mesmos marcadores de nulo que o pandas.read_csv reconhece por padrão
+VALORES_NULOS = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+
+class MotorArrowCSV:
+    """
+    Agrega um CSV com pyarrow, produzindo o mesmo AgregadoEntregadores do motor pandas
+
+    - Leitura em blocos com o leitor multi-thread do Arrow (só as colunas de COLUNAS_LIDAS, como texto)
+    - Valor convertido para centavos com a mesma regra de arredondamento de app.utils.dinheiro
+    - Classificação uma vez por descrição distinta (dicionário do bloco), com as regras do processador
+    - Somas e pares distintos reduzidos com group_by do Arrow; a consolidação final continua
+      sendo ProcessadorCSVService.consolidar_agregado
+
+    O motor pandas continua sendo a referência: benchmarks/paridade_motores.py compara os dois.
+    """
+
+    def __init__(self, processador):
+        self.processador = processador
+
+    @staticmethod
+    def disponivel():
+        """Indica se o motor pode ser usado (pyarrow instalado)"""
+        return PYARROW_AVAILABLE
+
+    def _colunas(self, caminho_arquivo, encoding, separador):
+        """Colunas do cabeçalho, lidas da primeira linha do arquivo"""
+        with open(caminho_arquivo, 'r', encoding=encoding, newline='') as f:
+            return next(csv.reader(f, delimiter=separador), [])
+
+    def _ler_blocos(self, caminho_arquivo, encoding, separador):
+        """Leitor em blocos com todas as colunas lidas como texto"""
+        colunas = [c for c in self._colunas(caminho_arquivo, encoding, separador) if c in COLUNAS_LIDAS]
+        self.processador._validar_colunas(pd.DataFrame(columns=colunas))
+        print(f"   📊 Colunas encontradas: {colunas}")
+        return pacsv.open_csv(
+            caminho_arquivo,
+            read_options=pacsv.ReadOptions(
+                encoding='utf8' if codecs.lookup(encoding).name in ('utf-8', 'utf-8-sig') else encoding,
+                block_size=TAMANHO_BLOCO,
+                use_threads=True,
+            ),
+            parse_options=pacsv.ParseOptions(delimiter=separador),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=colunas,
+                column_types={c: pa.string() for c in colunas},
+                null_values=VALORES_NULOS,
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=True,
+            ),
+        )
+
+    def _centavos(self, valores):
+        """Texto "1.234,56" -> centavos int64 (nulo vira 0; meio centavo para longe de zero)"""
+        texto = pc.utf8_trim_whitespace(valores)
+        texto = pc.replace_substring(pc.replace_substring(texto, ".", ""), ",", ".")
+        reais = pc.multiply(pc.cast(texto, pa.float64()), 100.0)
+        arredondado = pc.multiply(pc.sign(reais), pc.floor(pc.add(pc.abs(reais), 0.5)))
+        return pc.fill_null(pc.cast(arredondado, pa.int64()), 0)
+
+    def _datas(self, texto):
+        """Data do período de referência: FORMATO_DATA no Arrow, o resto pela inferência do processador"""
+        datas = pc.strptime(texto, format=FORMATO_DATA, unit='us', error_is_null=True)
+        if pc.sum(pc.and_(pc.is_null(datas), pc.is_valid(texto))).as_py():
+            convertidas = self.processador._converter_datas(pd.Series(texto.to_pandas(), dtype=object))
+            return pa.array(convertidas.astype("datetime64[us]"), type=pa.timestamp('us'))
+        return datas
+
+    def _tipos(self, descricoes):
+        """tipo_valor (texto) de cada linha, classificando cada descrição distinta uma vez"""
+        dicionario = pc.dictionary_encode(descricoes)
+        tipos = pa.array([self.processador.classificar_tipo(d) for d in dicionario.dictionary.to_pylist()],
+                         type=pa.string())
+        return pc.fill_null(pc.take(tipos, dicionario.indices), TIPO_PADRAO)
+
+    def _reduzir(self, bloco, data_filtro, ids_filtro, por_dia, coluna_data, inicio_ordem=0):
+        """Filtra e reduz um bloco: (somas, {coluna: pares distintos}, linhas após data, linhas agregadas)"""
+        instrumentacao = self.processador.instrumentacao
+        with instrumentacao.etapa('filtro', bloco.num_rows) as medida:
+            if coluna_data:
+                datas = self._datas(bloco.column(coluna_data).combine_chunks())
+                bloco = bloco.set_column(bloco.schema.get_field_index(coluna_data), coluna_data, datas)
+                if data_filtro:
+                    inicio = pd.Timestamp(data_filtro).normalize()
+                    fim = inicio + pd.Timedelta(days=1)
+                    datas = bloco.column(coluna_data)
+                    bloco = bloco.filter(pc.and_(pc.greater_equal(datas, pa.scalar(inicio, pa.timestamp('us'))),
+                                                 pc.less(datas, pa.scalar(fim, pa.timestamp('us')))))
+            linhas_data = bloco.num_rows
+            if ids_filtro is not None:
+                bloco = bloco.filter(pc.is_in(bloco.column(CHAVE_ENTREGADOR), value_set=pa.array(list(ids_filtro), pa.string())))
+            medida.linhas_saida = bloco.num_rows
+        if bloco.num_rows == 0:
+            return None, {}, linhas_data, 0
+
+        with instrumentacao.etapa('classificacao', bloco.num_rows):
+            colunas = {
+                **{c: bloco.column(c) for c in CHAVES_PIVOT},
+                "tipo_valor": self._tipos(bloco.column("descricao").combine_chunks()),
+                COLUNA_CENTAVOS: self._centavos(bloco.column("valor").combine_chunks()),
+            }
+            if por_dia:
+                colunas[CHAVE_DIA] = (pc.floor_temporal(bloco.column(coluna_data), unit='day') if coluna_data
+                                      else pa.nulls(bloco.num_rows, pa.timestamp('us')))
+            tabela = pa.table(colunas)
+
+        with instrumentacao.etapa('pivot', bloco.num_rows) as medida:
+            medida.linhas_saida = 0
+            # Como no groupby do pandas, linhas sem id ou recebedor não entram nas somas
+            tabela = tabela.filter(pc.and_(pc.is_valid(tabela.column(CHAVES_PIVOT[0])), pc.is_valid(tabela.column(CHAVES_PIVOT[1]))))
+            somas = self._somar(tabela, por_dia)
+
+            ordem = pa.array(np.arange(inicio_ordem, inicio_ordem + bloco.num_rows))
+            pares = {
+                coluna: self._distintos(bloco.select([CHAVE_ENTREGADOR, coluna]).append_column("_ordem", ordem), coluna)
+                for coluna in COLUNAS_DISTINTAS if coluna in bloco.column_names
+            }
+        return somas, pares, linhas_data, bloco.num_rows
+
+    def _distintos(self, tabela, coluna):
+        """Pares (id, coluna) distintos, com a posição da primeira aparição em _ordem"""
+        distintos = tabela.group_by([CHAVE_ENTREGADOR, coluna]).aggregate([("_ordem", "min")])
+        return distintos.select([CHAVE_ENTREGADOR, coluna, "_ordem_min"]).rename_columns([CHAVE_ENTREGADOR, coluna, "_ordem"])
+
+    def _somar(self, tabela, por_dia):
+        chaves = CHAVES_PIVOT + ([CHAVE_DIA] if por_dia else []) + ["tipo_valor"]
+        somas = tabela.group_by(chaves).aggregate([(COLUNA_CENTAVOS, "sum")])
+        return somas.rename_columns([COLUNA_CENTAVOS if c == f"{COLUNA_CENTAVOS}_sum" else c for c in somas.column_names])
+
+    def agregar_csv(self, caminho_arquivo, data_filtro=None, ids_filtro=None, por_dia=False):
+        """
+        Mesmo contrato de ProcessadorCSVService.agregar_csv
+
+        Returns:
+            tuple: (AgregadoEntregadores, linhas após o filtro de data), ou None se o arquivo
+            precisar do motor pandas (amostra em UTF-8 mas restante em outro encoding)
+        """
+        encoding, separador = self.processador.detectar_formato_csv(caminho_arquivo)
+        print(f"   ✅ Formato detectado: encoding={encoding}, separador='{separador}' (motor arrow)")
+
+        somas, pares = [], {}
+        linhas_data = linhas = 0
+        try:
+            leitor = self._ler_blocos(caminho_arquivo, encoding, separador)
+            coluna_data = self.processador._coluna_data(pd.DataFrame(columns=leitor.schema.names))
+            for lote in self.processador._blocos_medidos(leitor):
+                parcial, pares_bloco, linhas_bloco, agregadas = self._reduzir(
+                    pa.Table.from_batches([lote]), data_filtro, ids_filtro, por_dia, coluna_data, linhas
+                )
+                linhas_data += linhas_bloco
+                linhas += agregadas
+                if parcial is not None:
+                    somas.append(parcial)
+                for coluna, tabela in pares_bloco.items():
+                    pares.setdefault(coluna, []).append(tabela)
+        except (pa.ArrowInvalid, UnicodeDecodeError) as e:
+            if encoding != 'latin-1' and ('UTF8' in str(e) or isinstance(e, UnicodeDecodeError)):
+                print(f"   ⚠️  Arquivo não é {encoding} por inteiro, usando o motor pandas")
+                return None
+            raise
+
+        with self.processador.instrumentacao.etapa('pivot'):
+            agregado = self._montar_agregado(somas, pares, linhas, por_dia)
+        return agregado, linhas_data
+
+    def _montar_agregado(self, somas, pares, linhas, por_dia):
+        """Reduz as parciais dos blocos e converte para AgregadoEntregadores (formato de importar())"""
+        agregado = AgregadoEntregadores(por_dia=por_dia)
+        if not somas:
+            return agregado
+        tabela = pa.concat_tables(somas)
+        chaves = agregado.chaves_somas
+        if len(somas) > 1:
+            tabela = self._somar(tabela, por_dia)
+        df_somas = tabela.to_pandas().sort_values(chaves, kind='stable', ignore_index=True)
+
+        df_pares = [
+            pd.DataFrame({
+                CHAVE_ENTREGADOR: distintos.column(CHAVE_ENTREGADOR).to_pandas().to_numpy(dtype=object),
+                "coluna": coluna,
+                "valor": distintos.column(coluna).to_pandas().to_numpy(dtype=object),
+            })
+            for coluna, partes in pares.items()
+            # Na ordem da primeira aparição, como o drop_duplicates do motor pandas
+            for distintos in [self._distintos(pa.concat_tables(partes), coluna).sort_by("_ordem")]
+        ]
+        df_pares = (pd.concat(df_pares, ignore_index=True) if df_pares
+                    else pd.DataFrame(columns=[CHAVE_ENTREGADOR, "coluna", "valor"]))
+        # Nulos como NaN, igual aos pares do motor pandas
+        df_pares = df_pares.where(df_pares.notna(), np.nan)
+        return AgregadoEntregadores.importar(df_somas[chaves + [COLUNA_CENTAVOS]], df_pares, linhas, por_dia=por_dia)
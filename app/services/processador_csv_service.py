@@ -1,82 +1,568 @@
 import pandas as pd
+import numpy as np
 import glob
 import os
+import codecs
+import functools
+import hashlib
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 from app.models.database import get_db_connection, formatar_nome
+from app.services.cache_csv_service import CacheCSVService
+from app.services.relatorio_excel_service import RelatorioExcelService
+from app.utils.dinheiro import reais_para_centavos, centavos_para_reais, calcular_pagamento
+from app.utils.instrumentacao import Instrumentacao
+from config import Config
+
+# Encodings comuns em exportações brasileiras (latin-1 aceita qualquer byte, então é o fallback)
+ENCODINGS_CANDIDATOS = ['utf-8', 'latin-1']
+ENCODING_FALLBACK = 'latin-1'
+SEPARADORES_CANDIDATOS = ';,\t|'
+SEPARADOR_PADRAO = ';'
+
+# Regras de classificação por trecho da descrição, avaliadas em ordem (a primeira que casar vence)
+# Nota: "tempo_espera" é classificado mas NÃO entra no valor_total (seguindo arquivo de referência)
+REGRAS_CLASSIFICACAO = [
+    ("gorjeta", "gorjeta"),
+    ("promocao entregador", "promo"),
+    ("corridas concluidas", "corridas"),
+    ("valor por hora online", "online_time"),
+    ("route_with_occurrence", "rotas_com_ocorrencia"),
+    ("tempo de espera na origem", "tempo_espera"),
+]
+TIPO_PADRAO = "outros"
+# Ordem alfabética: mantém a ordem de colunas do pivot igual à de uma coluna texto
+TIPOS_VALOR = sorted({tipo for _, tipo in REGRAS_CLASSIFICACAO} | {TIPO_PADRAO})
+# Tipos de valor que entram no valor_total (seguindo EXATAMENTE a lógica do arquivo de referência)
+# Nota: "tempo_espera" é classificado mas NÃO entra no valor_total (conforme arquivo de referência)
+TIPOS_VALOR_CALCULO = ["corridas", "gorjeta", "promo", "online_time", "rotas_com_ocorrencia", "outros"]
+TIPOS_VALOR_EXIBICAO = TIPOS_VALOR_CALCULO + ["tempo_espera"]  # tempo_espera só para exibição, não entra no total
+
+# Valor de cada linha já convertido para centavos inteiros (substitui "valor" após a leitura)
+COLUNA_CENTAVOS = "valor_centavos"
+
+COLUNAS_OBRIGATORIAS = [
+    "id_da_pessoa_entregadora", "recebedor", "subpraca", "praca",
+    "valor", "descricao", "periodo"
+]
+
+CHAVE_ENTREGADOR = "id_da_pessoa_entregadora"
+CHAVES_PIVOT = [CHAVE_ENTREGADOR, "recebedor"]
+# Colunas das quais o agregado guarda apenas os pares distintos (id, valor)
+COLUNAS_DISTINTAS = ["subpraca", "praca", "cpf", "periodo"]
+# Nível extra das somas quando o agregado é separado por dia do período de referência
+CHAVE_DIA = "dia"
+COLUNAS_DATA = ['data_do_periodo_de_referencia', 'data_periodo', 'data_referencia', 'periodo_data']
+# Formato da data do período de referência nas exportações (outros formatos caem na inferência)
+FORMATO_DATA = '%Y-%m-%d'
+
+# Esquema de leitura: só estas colunas são materializadas, já com o tipo final.
+# Texto muito repetido vira categórico; o valor ("1.234,56") é convertido pelo próprio parser.
+COLUNAS_CATEGORICAS = ["subpraca", "praca", "periodo"]
+TIPOS_LEITURA = {
+    CHAVE_ENTREGADOR: str,
+    "recebedor": str,
+    "descricao": str,
+    "cpf": str,
+    "valor": "float64",
+    **{coluna: "category" for coluna in COLUNAS_CATEGORICAS},
+}
+COLUNAS_LIDAS = set(COLUNAS_OBRIGATORIAS) | set(TIPOS_LEITURA) | set(COLUNAS_DATA)
+TIPO_VALOR_DTYPE = pd.CategoricalDtype(TIPOS_VALOR)
+
+# Identifica a forma de processar as linhas: qualquer mudança invalida o cache de CSVs processados
+VERSAO_PROCESSAMENTO = hashlib.sha1(
+    repr((4, REGRAS_CLASSIFICACAO, TIPO_PADRAO, COLUNAS_OBRIGATORIAS, TIPOS_LEITURA, FORMATO_DATA, COLUNA_CENTAVOS,
+          COLUNAS_DISTINTAS)).encode()
+).hexdigest()[:12]
+
+
+class AgregadoEntregadores:
+    """
+    Agregado parcial por entregador, alimentado bloco a bloco
+
+    Guarda somente as somas de valor (centavos) por (id, recebedor, tipo_valor) e os pares
+    distintos (id, subpraca) / (id, praca), nunca as linhas originais. Vários
+    agregados (de blocos ou de arquivos diferentes) podem ser mesclados.
+    Com por_dia=True as somas também são separadas pelo dia do período de referência.
+    """
+
+    # Quantidade de parciais acumuladas antes de compactar
+    LIMITE_PARCIAIS = 32
+
+    def __init__(self, por_dia=False):
+        self.por_dia = por_dia
+        self._somas = []
+        self._pares = {}
+        self.linhas = 0
+
+    @property
+    def vazio(self):
+        return self.linhas == 0
+
+    @property
+    def chaves_somas(self):
+        """Níveis do índice das somas"""
+        return CHAVES_PIVOT + ([CHAVE_DIA] if self.por_dia else []) + ["tipo_valor"]
+
+    def _somar(self, df):
+        if not self.por_dia:
+            return df.groupby(CHAVES_PIVOT + ["tipo_valor"], observed=True)[COLUNA_CENTAVOS].sum()
+
+        coluna_data = next((c for c in COLUNAS_DATA if c in df.columns), None)
+        # Linhas sem data entram com dia NaT: só as chaves do entregador descartam linhas nulas
+        df = df.dropna(subset=CHAVES_PIVOT)
+        if coluna_data:
+            dias = pd.to_datetime(df[coluna_data], errors='coerce').dt.normalize()
+        else:
+            dias = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+        chaves = [df[c] for c in CHAVES_PIVOT] + [dias.rename(CHAVE_DIA), df["tipo_valor"]]
+        return df[COLUNA_CENTAVOS].groupby(chaves, observed=True, dropna=False).sum()
+
+    def adicionar(self, df):
+        """Reduz um bloco de linhas já classificado e soma ao agregado"""
+        if df.empty:
+            return
+        self.linhas += len(df)
+        self._somas.append(self._somar(df))
+        for coluna in COLUNAS_DISTINTAS:
+            if coluna in df.columns:
+                self._pares.setdefault(coluna, []).append(
+                    df[[CHAVE_ENTREGADOR, coluna]].drop_duplicates()
+                )
+        if len(self._somas) > self.LIMITE_PARCIAIS:
+            self.compactar()
+
+    def mesclar(self, outro):
+        """Incorpora outro agregado parcial a este (ambos com o mesmo por_dia)"""
+        self.linhas += outro.linhas
+        self._somas.extend(outro._somas)
+        for coluna, partes in outro._pares.items():
+            self._pares.setdefault(coluna, []).extend(partes)
+        if len(self._somas) > self.LIMITE_PARCIAIS:
+            self.compactar()
+
+    def compactar(self):
+        """Reduz as parciais acumuladas a uma única soma e um único conjunto de pares"""
+        if len(self._somas) > 1:
+            somas = pd.concat(self._somas)
+            self._somas = [somas.groupby(level=list(range(somas.index.nlevels)), observed=True).sum()]
+        for coluna, partes in self._pares.items():
+            if len(partes) > 1:
+                self._pares[coluna] = [pd.concat(partes, ignore_index=True).drop_duplicates()]
+
+    def somas_por_tipo(self):
+        """Equivalente ao pivot_table (id, recebedor) x tipo_valor com soma de valor"""
+        self.compactar()
+        if not self._somas:
+            return pd.DataFrame(columns=CHAVES_PIVOT)
+        somas = self._somas[0]
+        if self.por_dia:
+            somas = somas.groupby(level=CHAVES_PIVOT + ["tipo_valor"], observed=True).sum()
+        somas.index = somas.index.remove_unused_levels()
+        return somas.unstack("tipo_valor", fill_value=0).reset_index()
+
+    def somas_por_dia(self):
+        """Somas por (id, dia) x tipo_valor, de todos os recebedores do id (só com por_dia; dias sem data são descartados)"""
+        self.compactar()
+        if not self.por_dia or not self._somas:
+            return pd.DataFrame(columns=[CHAVE_ENTREGADOR, CHAVE_DIA])
+        somas = self._somas[0]
+        somas = somas[somas.index.get_level_values(CHAVE_DIA).notna()]
+        if somas.empty:
+            return pd.DataFrame(columns=[CHAVE_ENTREGADOR, CHAVE_DIA])
+        somas = somas.groupby(level=[CHAVE_ENTREGADOR, CHAVE_DIA, "tipo_valor"], observed=True).sum()
+        somas.index = somas.index.remove_unused_levels()
+        return somas.unstack("tipo_valor", fill_value=0).reset_index()
+
+    def exportar(self):
+        """
+        Somas e pares em formato tabular (para gravar em disco)
+
+        Returns:
+            tuple: (DataFrame de somas com chaves_somas + valor_centavos, DataFrame de pares id/coluna/valor)
+        """
+        self.compactar()
+        if self._somas:
+            somas = self._somas[0].reset_index()
+            somas["tipo_valor"] = somas["tipo_valor"].astype(str)
+        else:
+            somas = pd.DataFrame(columns=self.chaves_somas + [COLUNA_CENTAVOS])
+
+        pares = [
+            pd.DataFrame({
+                CHAVE_ENTREGADOR: partes[0][CHAVE_ENTREGADOR].to_numpy(dtype=object),
+                "coluna": coluna,
+                "valor": partes[0][coluna].astype(object).to_numpy(),
+            })
+            for coluna, partes in self._pares.items() if partes
+        ]
+        pares = pd.concat(pares, ignore_index=True) if pares else pd.DataFrame(columns=[CHAVE_ENTREGADOR, "coluna", "valor"])
+        return somas, pares
+
+    @classmethod
+    def importar(cls, somas, pares, linhas, por_dia=False):
+        """Reconstrói um agregado a partir do formato de exportar()"""
+        agregado = cls(por_dia=por_dia)
+        agregado.linhas = linhas
+        if not somas.empty:
+            somas = somas.copy()
+            somas["tipo_valor"] = somas["tipo_valor"].astype(TIPO_VALOR_DTYPE)
+            if por_dia:
+                somas[CHAVE_DIA] = pd.to_datetime(somas[CHAVE_DIA], errors='coerce')
+            agregado._somas = [somas.set_index(agregado.chaves_somas)[COLUNA_CENTAVOS]]
+        for coluna, grupo in pares.groupby("coluna", sort=False):
+            agregado._pares[coluna] = [
+                grupo[[CHAVE_ENTREGADOR, "valor"]].rename(columns={"valor": coluna}).reset_index(drop=True)
+            ]
+        return agregado
+
+    def pares(self, coluna):
+        """Pares distintos (id, coluna) vistos até agora"""
+        self.compactar()
+        partes = self._pares.get(coluna)
+        if not partes:
+            return pd.DataFrame(columns=[CHAVE_ENTREGADOR, coluna])
+        return partes[0]
+
+    def valores_por_entregador(self, coluna):
+        """Valores distintos de `coluna` por entregador, na ordem em que apareceram: {id: [valores]}"""
+        pares = self.pares(coluna)
+        codigos, ids = pd.factorize(pares[CHAVE_ENTREGADOR])
+        validos = codigos >= 0
+        if not validos.any():
+            return {}
+        codigos = codigos[validos]
+        valores = pares[coluna].astype(object).to_numpy()[validos]
+        # Ordenação estável por entregador: cada grupo mantém a ordem de aparição dos valores
+        ordem = np.argsort(codigos, kind='stable')
+        grupos = np.split(valores[ordem], np.flatnonzero(np.diff(codigos[ordem])) + 1)
+        return {ids[i]: list(grupo) for i, grupo in enumerate(grupos)}
+
+    def ids_por_valor(self, coluna, valores, normalizar=None):
+        """IDs de entregadores cujo valor em `coluna` está em `valores`"""
+        pares = self.pares(coluna).dropna()
+        if pares.empty:
+            return set()
+        serie = pares[coluna].map(normalizar) if normalizar else pares[coluna]
+        return set(pares.loc[serie.isin(valores), CHAVE_ENTREGADOR].astype(str))
+
+
+def _agregar_arquivo_em_processo(caminho_arquivo, data_filtro, ids_filtro, tamanho_chunk, por_dia=False):
+    """
+    Ponto de entrada dos processos do pool: agrega um arquivo e devolve o agregado parcial
+
+    As medições das etapas voltam junto (sem publicar no processo filho) para o processo
+    principal incorporar à execução dele.
+    """
+    processador = ProcessadorCSVService(tamanho_chunk=tamanho_chunk, instrumentacao=Instrumentacao(destinos=[]))
+    with processador.instrumentacao.execucao('agregar_csv'):
+        agregado, linhas_data = processador.agregar_csv(caminho_arquivo, data_filtro, ids_filtro, por_dia)
+    return agregado, linhas_data, processador.instrumentacao.medicoes
+
+
+def _instrumentado(nome):
+    """Executa o método dentro de uma execução da instrumentação (aninhadas fazem parte da externa)"""
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envolvido(self, *args, **kwargs):
+            with self.instrumentacao.execucao(nome):
+                return metodo(self, *args, **kwargs)
+        return envolvido
+    return decorador
+
 
 class ProcessadorCSVService:
+
+    # Regra do pagamento: percentual de (total - gorjeta), menos o desconto fixo em reais
+    PERCENTUAL_PAGAMENTO = 0.6
+    DESCONTO_FIXO = 0.35
     
-    def __init__(self):
-        self.PERCENTUAL_PAGAMENTO = 0.6
-        self.DESCONTO_FIXO = 0.35
+    def __init__(self, tamanho_chunk=None, max_workers=None, usar_cache=True, motor=None, instrumentacao=None,
+                 progresso=None):
+        self.TAMANHO_CHUNK = tamanho_chunk or Config.CSV_CHUNK_SIZE
+        self.TAMANHO_AMOSTRA = Config.CSV_SAMPLE_BYTES
+        # Processos para agregar arquivos em paralelo no modo streaming (1 = sequencial)
+        self.MAX_WORKERS = max_workers if max_workers is not None else Config.CSV_MAX_WORKERS
+        # Cache colunar dos CSVs já processados (None se pyarrow não estiver disponível)
+        self.cache = CacheCSVService(VERSAO_PROCESSAMENTO) if usar_cache and CacheCSVService.disponivel() else None
+        # Motor alternativo da agregação (None = pandas, a implementação de referência)
+        self.motor = self._criar_motor(motor or Config.CSV_MOTOR)
+        # Tempo, linhas e memória por etapa (publicados ao fim de cada execução)
+        self.instrumentacao = instrumentacao or Instrumentacao()
+        # Callback opcional progresso(etapa, concluidos, total), usado pela fila de processamento
+        self.progresso = progresso
+
+    def _informar_progresso(self, etapa, concluidos, total):
+        """Repassa o andamento ao callback de progresso (falhas no callback não interrompem o processamento)"""
+        if self.progresso is None:
+            return
+        try:
+            self.progresso(etapa, concluidos, total)
+        except Exception as e:
+            print(f"⚠️ Erro ao informar progresso: {e}")
+
+    def _criar_motor(self, nome):
+        """Instancia o motor de agregação configurado ('pandas' ou 'arrow')"""
+        nome = nome.lower()
+        if nome == 'pandas':
+            return None
+        if nome != 'arrow':
+            raise ValueError(f"Motor de processamento desconhecido: {nome}")
+        from app.services.motor_arrow_service import MotorArrowCSV
+        if not MotorArrowCSV.disponivel():
+            print("⚠️ pyarrow não instalado. Usando o motor pandas.")
+            return None
+        return MotorArrowCSV(self)
     
     def classificar_tipo(self, desc):
         """Classifica o tipo de valor pela descrição (seguindo a lógica do arquivo de referência)."""
         desc = str(desc).lower()
-        if "gorjeta" in desc:
-            return "gorjeta"
-        elif "promocao entregador" in desc:
-            return "promo"
-        elif "corridas concluidas" in desc:
-            return "corridas"
-        elif "valor por hora online" in desc:
-            return "online_time"
-        elif "route_with_occurrence" in desc:
-            return "rotas_com_ocorrencia"
-        elif "tempo de espera na origem" in desc:
-            # tempo_espera é classificado mas NÃO entra no valor_total (seguindo arquivo de referência)
-            return "tempo_espera"
-        else:
-            return "outros"
+        for trecho, tipo in REGRAS_CLASSIFICACAO:
+            if trecho in desc:
+                return tipo
+        return TIPO_PADRAO
+
+    def classificar_serie(self, descricoes):
+        """
+        Classifica uma coluna inteira de descrições
+
+        As regras rodam uma vez por descrição distinta (poucas dezenas por arquivo)
+        e o resultado é mapeado de volta para todas as linhas como categórico.
+
+        Returns:
+            Series: categórica com categorias TIPOS_VALOR
+        """
+        codigos, unicos = pd.factorize(descricoes)
+        posicoes = [TIPOS_VALOR.index(self.classificar_tipo(d)) for d in unicos]
+        # Código -1 (valor nulo) aponta para o último item: TIPO_PADRAO, como str(nan) faria
+        posicoes.append(TIPOS_VALOR.index(TIPO_PADRAO))
+        codigos_tipo = np.asarray(posicoes, dtype=np.int8)[codigos]
+        return pd.Series(
+            pd.Categorical.from_codes(codigos_tipo, categories=TIPOS_VALOR),
+            index=descricoes.index
+        )
     
-    def processar_csv(self, caminho_arquivo):
-        """Processa um arquivo CSV individual"""
-        try:
-            print(f"📂 Processando arquivo: {os.path.basename(caminho_arquivo)}")
-            
-            # Tentar diferentes encodings comuns para arquivos brasileiros
-            encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252', 'windows-1252']
-            df = None
-            encoding_usado = None
-            
-            for encoding in encodings:
+    def detectar_formato_csv(self, caminho_arquivo):
+        """
+        Detecta encoding e separador a partir de uma amostra limitada do arquivo
+
+        Lê apenas os primeiros CSV_SAMPLE_BYTES bytes, evitando ler o arquivo
+        inteiro uma vez para cada encoding candidato.
+
+        Returns:
+            tuple: (encoding, separador)
+        """
+        with open(caminho_arquivo, 'rb') as f:
+            amostra = f.read(self.TAMANHO_AMOSTRA)
+
+        if amostra.startswith(codecs.BOM_UTF8):
+            encoding = 'utf-8-sig'
+            texto = amostra[len(codecs.BOM_UTF8):].decode('utf-8', errors='ignore')
+        else:
+            encoding = None
+            texto = None
+            for candidato in ENCODINGS_CANDIDATOS:
                 try:
-                    df = pd.read_csv(caminho_arquivo, sep=";", encoding=encoding)
-                    encoding_usado = encoding
-                    print(f"   ✅ Arquivo lido com encoding: {encoding}")
+                    # Decoder incremental: um caractere multibyte cortado no fim da amostra não é erro
+                    texto = codecs.getincrementaldecoder(candidato)().decode(amostra, final=False)
+                    encoding = candidato
                     break
-                except (UnicodeDecodeError, UnicodeError):
+                except (UnicodeDecodeError, UnicodeError, LookupError):
                     continue
-            
-            if df is None:
+
+            if encoding is None:
                 raise Exception("Não foi possível determinar a codificação do arquivo. Tente converter para UTF-8.")
-            
-            print(f"   📊 Colunas encontradas: {list(df.columns)}")
-            print(f"   📈 Linhas: {len(df)}")
-            
-            # Validar colunas necessárias
-            colunas_necessarias = [
-                "id_da_pessoa_entregadora", "recebedor", "subpraca", "praca", 
-                "valor", "descricao", "periodo"
-            ]
-            
-            for coluna in colunas_necessarias:
-                if coluna not in df.columns:
-                    raise ValueError(f"Coluna obrigatória ausente: {coluna}")
-            
-            # Processar dados
+
+        # Separador: o mais frequente na linha de cabeçalho (valores como "12,50" enganariam um sniffer)
+        cabecalho = texto.splitlines()[0] if texto else ''
+        contagens = {sep: cabecalho.count(sep) for sep in SEPARADORES_CANDIDATOS}
+        separador = max(contagens, key=contagens.get)
+        if contagens[separador] == 0:
+            separador = SEPARADOR_PADRAO
+
+        return encoding, separador
+
+    def ler_csv_em_chunks(self, caminho_arquivo, tamanho_chunk=None):
+        """
+        Lê o CSV em blocos de linhas (streaming), com encoding e separador detectados uma única vez
+
+        Se a amostra parecia UTF-8 mas o restante do arquivo não for, o arquivo é
+        reaberto com o encoding de fallback e a leitura continua da linha onde parou
+        (skiprows inteiro, com o cabeçalho já lido passado em names).
+
+        Yields:
+            DataFrame: bloco com até tamanho_chunk linhas
+        """
+        encoding, separador = self.detectar_formato_csv(caminho_arquivo)
+        tamanho_chunk = tamanho_chunk or self.TAMANHO_CHUNK
+        print(f"   ✅ Formato detectado: encoding={encoding}, separador='{separador}'")
+
+        # Com vírgula como separador o valor não pode usar vírgula decimal: vem como texto
+        # e é convertido em _preparar_chunk
+        if separador == ',':
+            numeros = {'dtype': {**TIPOS_LEITURA, 'valor': str}}
+        else:
+            numeros = {'dtype': TIPOS_LEITURA, 'decimal': ',', 'thousands': '.'}
+
+        linhas_lidas = 0
+        cabecalho = {}
+        while True:
+            try:
+                with pd.read_csv(
+                    caminho_arquivo,
+                    sep=separador,
+                    encoding=encoding,
+                    chunksize=tamanho_chunk,
+                    usecols=lambda coluna: coluna in COLUNAS_LIDAS,
+                    **cabecalho,
+                    **numeros
+                ) as leitor:
+                    for chunk in leitor:
+                        linhas_lidas += len(chunk)
+                        yield chunk
+                return
+            except (UnicodeDecodeError, UnicodeError):
+                if encoding == ENCODING_FALLBACK:
+                    raise
+                print(f"   ⚠️  Arquivo não é {encoding} após {linhas_lidas} linhas, continuando com {ENCODING_FALLBACK}")
+                if linhas_lidas:
+                    # O cabeçalho já foi lido no encoding original: pula ele e as linhas entregues
+                    colunas = pd.read_csv(caminho_arquivo, sep=separador, encoding=encoding, nrows=0).columns
+                    cabecalho = {'header': None, 'names': list(colunas), 'skiprows': linhas_lidas + 1}
+                encoding = ENCODING_FALLBACK
+
+    def _validar_colunas(self, df):
+        """Valida se as colunas obrigatórias estão presentes"""
+        for coluna in COLUNAS_OBRIGATORIAS:
+            if coluna not in df.columns:
+                raise ValueError(f"Coluna obrigatória ausente: {coluna}")
+
+    def _converter_datas(self, serie):
+        """Converte a coluna de data com FORMATO_DATA; só os valores fora do formato passam pela inferência"""
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        datas = pd.to_datetime(serie, format=FORMATO_DATA, errors='coerce')
+        falhas = datas.isna() & serie.notna()
+        if falhas.any():
+            datas[falhas] = pd.to_datetime(serie[falhas], errors='coerce')
+        return datas
+
+    def _preparar_chunk(self, df, data_filtro=None):
+        """
+        Converte data e valor, normaliza a descrição e classifica o tipo de um bloco de linhas
+
+        Com data_filtro, as linhas de outras datas são descartadas logo após a
+        conversão da data, antes de qualquer outro trabalho sobre o bloco.
+        """
+        coluna_data = self._coluna_data(df)
+        if coluna_data:
+            with self.instrumentacao.etapa('filtro', len(df)) as medida:
+                df[coluna_data] = self._converter_datas(df[coluna_data])
+                if data_filtro:
+                    df = df[self._mascara_data(df[coluna_data], data_filtro)].copy()
+                medida.linhas_saida = len(df)
+
+        with self.instrumentacao.etapa('classificacao', len(df)):
             df["descricao"] = df["descricao"].astype(str).str.lower().fillna("")
-            df["valor"] = (
-                df["valor"].astype(str)
-                .str.replace(".", "")
-                .str.replace(",", ".")
-                .astype(float)
-            )
-            
-            df["tipo_valor"] = df["descricao"].apply(self.classificar_tipo)
-            
+            if not pd.api.types.is_numeric_dtype(df["valor"]):
+                df["valor"] = (
+                    df["valor"].astype(str)
+                    .str.replace(".", "")
+                    .str.replace(",", ".")
+                    .astype(float)
+                )
+            df[COLUNA_CENTAVOS] = reais_para_centavos(df.pop("valor"))
+
+            df["tipo_valor"] = self.classificar_serie(df["descricao"])
+        return df
+
+    def _restaurar_categoricos(self, df):
+        """Reaplica os tipos categóricos a um bloco lido do cache (gravado sem dicionários)"""
+        for coluna in COLUNAS_CATEGORICAS:
+            if coluna in df.columns:
+                df[coluna] = df[coluna].astype("category")
+        df["tipo_valor"] = df["tipo_valor"].astype(TIPO_VALOR_DTYPE)
+        return df
+
+    def _concatenar_blocos(self, blocos):
+        """Concatena blocos mantendo categóricas as colunas cujas categorias variam entre blocos"""
+        if len(blocos) == 1:
+            return blocos[0]
+        df = pd.concat(blocos, ignore_index=True)
+        for coluna in COLUNAS_CATEGORICAS:
+            if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+                df[coluna] = df[coluna].astype("category")
+        return df
+
+    def _blocos_medidos(self, blocos, etapa='leitura'):
+        """Repassa os blocos de um iterador medindo o tempo de obter cada um"""
+        blocos = iter(blocos)
+        while True:
+            with self.instrumentacao.etapa(etapa) as medida:
+                bloco = next(blocos, None)
+                medida.linhas_saida = 0 if bloco is None else len(bloco)
+            if bloco is None:
+                return
+            yield bloco
+
+    def _ler_e_preparar(self, caminho_arquivo, tamanho_chunk=None, data_filtro=None):
+        """Lê o CSV bruto em blocos, valida as colunas e prepara cada bloco"""
+        for i, chunk in enumerate(self._blocos_medidos(self.ler_csv_em_chunks(caminho_arquivo, tamanho_chunk))):
+            if i == 0:
+                print(f"   📊 Colunas encontradas: {list(chunk.columns)}")
+                self._validar_colunas(chunk)
+            yield self._preparar_chunk(chunk, data_filtro)
+
+    def iterar_csv(self, caminho_arquivo, tamanho_chunk=None, data_filtro=None):
+        """
+        Processa um arquivo CSV bloco a bloco, sem manter o arquivo inteiro em memória
+
+        Se o conteúdo do arquivo já foi processado antes, os blocos vêm do cache
+        colunar (sem decodificar, converter números nem classificar de novo).
+        Com data_filtro, só as linhas dessa data são entregues; sem cache elas são
+        descartadas antes da classificação. Na primeira leitura com cache o arquivo
+        inteiro é preparado para gravar a entrada, e as leituras seguintes só filtram.
+
+        Yields:
+            DataFrame: bloco já validado, com valor numérico e tipo_valor classificado
+        """
+        if self.cache is None:
+            yield from self._ler_e_preparar(caminho_arquivo, tamanho_chunk, data_filtro)
+            return
+
+        blocos_cache = self.cache.iterar(caminho_arquivo)
+        if blocos_cache is not None:
+            print(f"   ⚡ Usando cache do arquivo processado")
+            for bloco in self._blocos_medidos(self._restaurar_categoricos(b) for b in blocos_cache):
+                yield self._filtrar_bloco(bloco, data_filtro) if data_filtro else bloco
+            return
+
+        with self.cache.gravador(caminho_arquivo) as gravador:
+            for chunk in self._ler_e_preparar(caminho_arquivo, tamanho_chunk):
+                with self.instrumentacao.etapa('persistencia', len(chunk)):
+                    gravador.escrever(chunk)
+                yield self._filtrar_bloco(chunk, data_filtro) if data_filtro else chunk
+
+    def _filtrar_bloco(self, df, data_filtro):
+        """_filtrar_por_data medido na etapa 'filtro'"""
+        with self.instrumentacao.etapa('filtro', len(df)) as medida:
+            df = self._filtrar_por_data(df, data_filtro)
+            medida.linhas_saida = len(df)
+        return df
+
+    @_instrumentado('processar_csv')
+    def processar_csv(self, caminho_arquivo, data_filtro=None):
+        """Processa um arquivo CSV individual (opcionalmente só as linhas de data_filtro)"""
+        try:
+            print(f"📂 Processando arquivo: {os.path.basename(caminho_arquivo)}")
+
+            blocos = list(self.iterar_csv(caminho_arquivo, data_filtro=data_filtro))
+            with self.instrumentacao.etapa('concatenacao', sum(len(b) for b in blocos)):
+                df = self._concatenar_blocos(blocos)
+
+            print(f"   📈 Linhas: {len(df)}")
             print(f"   ✅ Arquivo processado com sucesso")
             return df
             
@@ -84,6 +570,31 @@ class ProcessadorCSVService:
             print(f"   ❌ Erro no processamento: {str(e)}")
             raise Exception(f"Erro ao processar arquivo {os.path.basename(caminho_arquivo)}: {str(e)}")
     
+    def _coluna_data(self, df):
+        """Retorna o nome da coluna de data do período de referência presente no DataFrame"""
+        for col in COLUNAS_DATA:
+            if col in df.columns:
+                return col
+        return None
+
+    def _mascara_data(self, datas, data_filtro):
+        """Linhas de uma coluna datetime que caem no dia data_filtro (date ou 'YYYY-MM-DD')"""
+        inicio = pd.Timestamp(data_filtro).normalize()
+        return (datas >= inicio) & (datas < inicio + pd.Timedelta(days=1))
+
+    def _filtrar_por_data(self, df, data_filtro):
+        """Filtra as linhas cuja data do período de referência é data_filtro"""
+        coluna_data = self._coluna_data(df)
+        if not coluna_data:
+            return df
+        try:
+            # Blocos vindos de iterar_csv já têm a data convertida; só texto é convertido aqui
+            datas = self._converter_datas(df[coluna_data])
+            return df[self._mascara_data(datas, data_filtro)]
+        except Exception as e:
+            print(f"   ⚠️  Erro ao filtrar por data: {str(e)}")
+            return df
+
     def consolidar_entregadores(self, df, data_filtro=None):
         """
         Consolida dados de pagamento por entregador
@@ -99,102 +610,96 @@ class ProcessadorCSVService:
             
             # Filtrar por data do período de referência se especificado
             if data_filtro:
-                colunas_data = ['data_do_periodo_de_referencia', 'data_periodo', 'data_referencia', 'periodo_data']
-                coluna_data_encontrada = None
-                
-                for col in colunas_data:
-                    if col in df.columns:
-                        coluna_data_encontrada = col
-                        break
-                
-                if coluna_data_encontrada:
-                    try:
-                        # Converter coluna para data e filtrar
-                        df[coluna_data_encontrada] = pd.to_datetime(df[coluna_data_encontrada], errors='coerce').dt.date
-                        df_antes = len(df)
-                        df = df[df[coluna_data_encontrada] == data_filtro]
-                        df_depois = len(df)
-                        print(f"   📅 Filtrado por data {data_filtro}: {df_antes} → {df_depois} linhas")
-                    except Exception as e:
-                        print(f"   ⚠️  Erro ao filtrar por data na consolidação: {str(e)}")
+                df_antes = len(df)
+                df = self._filtrar_por_data(df, data_filtro)
+                print(f"   📅 Filtrado por data {data_filtro}: {df_antes} → {len(df)} linhas")
             
-            # Pivot table para tipos de valores
-            pivot = (
-                df.pivot_table(
-                    index=["id_da_pessoa_entregadora", "recebedor"],
-                    values="valor",
-                    columns="tipo_valor",
-                    aggfunc="sum",
-                    fill_value=0
-                )
-                .reset_index()
-            )
+            agregado = AgregadoEntregadores()
+            agregado.adicionar(df)
+            return self.consolidar_agregado(agregado)
+            
+        except Exception as e:
+            print(f"Erro na consolidação: {str(e)}")
+            return pd.DataFrame()
+
+    def _resumir_pares(self, pares, coluna, nome, nome_qtd):
+        """
+        Junta os valores distintos de `coluna` por entregador (ex.: subpracas / qtd_subpracas)
+
+        Equivale a " / ".join(sorted(set(...))) e len(set(...)) por grupo, mas feito com
+        drop_duplicates + ordenação + groupby nativo, sem lambdas por entregador.
+        Aceita tanto pares (id, coluna) quanto as linhas brutas.
+        """
+        ids = pd.Index(pares[CHAVE_ENTREGADOR].dropna().unique(), name=CHAVE_ENTREGADOR).sort_values()
+
+        validos = pares[[CHAVE_ENTREGADOR, coluna]].dropna().drop_duplicates()
+        qtd = validos.groupby(CHAVE_ENTREGADOR).size()
+
+        textos = (
+            pd.DataFrame({
+                CHAVE_ENTREGADOR: validos[CHAVE_ENTREGADOR],
+                coluna: validos[coluna].astype(str),
+            })
+            .drop_duplicates()
+            .sort_values([CHAVE_ENTREGADOR, coluna])
+        )
+        juntos = textos.groupby(CHAVE_ENTREGADOR, sort=False)[coluna].agg(" / ".join)
+
+        return pd.DataFrame({
+            CHAVE_ENTREGADOR: ids,
+            nome: juntos.reindex(ids, fill_value="").to_numpy(dtype=object),
+            nome_qtd: qtd.reindex(ids, fill_value=0).to_numpy(dtype="int64"),
+        })
+
+    def consolidar_agregado(self, agregado):
+        """
+        Finaliza a consolidação a partir de um agregado parcial
+
+        Args:
+            agregado: AgregadoEntregadores com as somas por tipo e os pares de praças
+        """
+        try:
+            if agregado.vazio:
+                return pd.DataFrame()
+
+            # Somas por tipo de valor (equivalente ao pivot table)
+            with self.instrumentacao.etapa('pivot') as medida:
+                pivot = agregado.somas_por_tipo()
+                medida.linhas_saida = len(pivot)
             
             # Informações de praças
-            sub_data = (
-                df.groupby("id_da_pessoa_entregadora", as_index=False)
-                .agg(
-                    subpracas=("subpraca", lambda x: " / ".join(sorted(set(x.dropna().astype(str)))) if len(x.dropna()) > 0 else ""),
-                    qtd_subpracas=("subpraca", lambda x: len(set(x.dropna()))),
-                    pracas=("praca", lambda x: " / ".join(sorted(set(x.dropna().astype(str)))) if len(x.dropna()) > 0 else ""),
-                    qtd_pracas=("praca", lambda x: len(set(x.dropna())))
+            with self.instrumentacao.etapa('merge', len(pivot)) as medida:
+                sub_data = pd.merge(
+                    self._resumir_pares(agregado.pares("subpraca"), "subpraca", "subpracas", "qtd_subpracas"),
+                    self._resumir_pares(agregado.pares("praca"), "praca", "pracas", "qtd_pracas"),
+                    on=CHAVE_ENTREGADOR,
+                    how="outer"
                 )
-            )
-            
-            consolidado = pd.merge(pivot, sub_data, on="id_da_pessoa_entregadora", how="left")
+                
+                consolidado = pd.merge(pivot, sub_data, on="id_da_pessoa_entregadora", how="left")
+                medida.linhas_saida = len(consolidado)
             
             # Garantir que subpracas e pracas não sejam NaN
             consolidado['subpracas'] = consolidado['subpracas'].fillna("").astype(str)
             consolidado['pracas'] = consolidado['pracas'].fillna("").astype(str)
             
-            # Tipos de valor que entram no cálculo (seguindo EXATAMENTE a lógica do arquivo de referência)
-            # Nota: "tempo_espera" é classificado mas NÃO entra no valor_total (conforme arquivo de referência)
-            tipos_valor_calculo = ["corridas", "gorjeta", "promo", "online_time", "rotas_com_ocorrencia", "outros"]
-            tipos_valor_exibicao = tipos_valor_calculo + ["tempo_espera"]  # tempo_espera só para exibição, não entra no total
-            
-            # Garantir que todas as colunas existam
-            for tipo in tipos_valor_exibicao:
-                if tipo not in consolidado.columns:
-                    consolidado[tipo] = 0.0
-            
-            # Garantir que todos os valores sejam numéricos
-            for col in tipos_valor_exibicao:
-                consolidado[col] = pd.to_numeric(consolidado[col], errors='coerce').fillna(0.0)
+            # Somas por tipo chegam em centavos inteiros; tipos ausentes valem 0
+            centavos = self._centavos_por_tipo(consolidado)
             
             # Calcular valor total (seguindo exatamente a lógica do arquivo de referência)
             # Soma apenas os tipos que entram no cálculo (sem tempo_espera)
-            consolidado["valor_total"] = (
-                consolidado.get("corridas", 0)
-                + consolidado.get("gorjeta", 0)
-                + consolidado.get("promo", 0)
-                + consolidado.get("online_time", 0)
-                + consolidado.get("rotas_com_ocorrencia", 0)
-                + consolidado.get("outros", 0)
-            )
-            
-            # Arredondar valores individuais (seguindo arquivo de referência)
-            for c in tipos_valor_calculo + ["valor_total"]:
-                consolidado[c] = consolidado[c].round(2)
-            
-            # Cálculo do 60% (seguindo exatamente a lógica do arquivo de referência)
-            # Base: valor_total - gorjeta (gorjeta não entra no cálculo do adiantamento)
-            base_calculo = consolidado["valor_total"] - consolidado.get("gorjeta", 0)
-            consolidado["valor_60_percent"] = (base_calculo * self.PERCENTUAL_PAGAMENTO).round(2)
-            
-            # Valor final: 60% menos desconto fixo de R$ 0.35
-            consolidado["valor_final"] = (consolidado["valor_60_percent"] - self.DESCONTO_FIXO).round(2)
+            valor_total = sum(centavos[tipo] for tipo in TIPOS_VALOR_CALCULO)
             
-            # Garantir que valores não sejam negativos
-            consolidado["valor_60_percent"] = consolidado["valor_60_percent"].clip(lower=0.0)
-            consolidado["valor_final"] = consolidado["valor_final"].clip(lower=0.0)
+            # Cálculo do 60% sobre valor_total - gorjeta, menos desconto fixo de R$ 0.35
+            # (conta inteira em centavos, sem arredondamentos intermediários; nunca negativo)
+            valor_60, valor_final = self.calcular_pagamento_centavos(valor_total, centavos["gorjeta"])
             
-            # Debug: verificar cálculos
-            print("🔍 DEBUG - Cálculos:")
-            print(f"   Valor Total: {consolidado['valor_total'].iloc[0]}")
-            print(f"   Gorjetas: {consolidado['gorjeta'].iloc[0]}")
-            print(f"   Base cálculo: {base_calculo.iloc[0]}")
-            print(f"   60% da base: {consolidado['valor_60_percent'].iloc[0]}")
-            print(f"   Valor final: {consolidado['valor_final'].iloc[0]}")
+            # Valores exibidos em reais (exatos até o centavo)
+            for tipo in TIPOS_VALOR_EXIBICAO:
+                consolidado[tipo] = centavos_para_reais(centavos[tipo])
+            consolidado["valor_total"] = centavos_para_reais(valor_total)
+            consolidado["valor_60_percent"] = centavos_para_reais(valor_60)
+            consolidado["valor_final"] = centavos_para_reais(valor_final)
             
             return consolidado
             
@@ -202,6 +707,56 @@ class ProcessadorCSVService:
             print(f"Erro na consolidação: {str(e)}")
             return pd.DataFrame()
     
+    def _centavos_por_tipo(self, somas):
+        """Colunas de centavos de TIPOS_VALOR_EXIBICAO de um DataFrame de somas por tipo (ausentes = 0)"""
+        return {
+            tipo: (somas[tipo].fillna(0).astype("int64") if tipo in somas.columns
+                   else pd.Series(0, index=somas.index, dtype="int64"))
+            for tipo in TIPOS_VALOR_EXIBICAO
+        }
+
+    def consolidar_por_dia(self, agregado):
+        """
+        Ganhos de cada entregador em cada dia do período de referência (tabela ganhos_diarios)
+
+        Mesmas regras de consolidar_agregado, aplicadas por (id, dia) em vez de por entregador.
+
+        Args:
+            agregado: AgregadoEntregadores com por_dia=True
+
+        Returns:
+            DataFrame: id_da_pessoa_entregadora, dia, TIPOS_VALOR_EXIBICAO, valor_total,
+            valor_60_percent e valor_final, todos em centavos inteiros
+        """
+        somas = agregado.somas_por_dia()
+        if somas.empty:
+            return pd.DataFrame()
+
+        ganhos = somas[[CHAVE_ENTREGADOR, CHAVE_DIA]].copy()
+        centavos = self._centavos_por_tipo(somas)
+        for tipo in TIPOS_VALOR_EXIBICAO:
+            ganhos[tipo] = centavos[tipo]
+        ganhos["valor_total"] = sum(centavos[tipo] for tipo in TIPOS_VALOR_CALCULO)
+        ganhos["valor_60_percent"], ganhos["valor_final"] = self.calcular_pagamento_centavos(
+            ganhos["valor_total"], centavos["gorjeta"]
+        )
+        return ganhos
+
+    def calcular_pagamento_centavos(self, valor_total, gorjeta):
+        """
+        Valor 60% e valor final em centavos (regra usada pela consolidação e pelas exportações)
+
+        Args:
+            valor_total: Centavos do valor total (Series ou int)
+            gorjeta: Centavos de gorjeta
+
+        Returns:
+            tuple: (valor_60_percent, valor_final) em centavos
+        """
+        return calcular_pagamento(
+            valor_total, gorjeta, self.PERCENTUAL_PAGAMENTO, reais_para_centavos(self.DESCONTO_FIXO)
+        )
+
     def obter_detalhes_entregador(self, id_entregador):
         """Obtém detalhes de um entregador específico do banco de dados"""
         conn = get_db_connection()
@@ -239,7 +794,283 @@ class ProcessadorCSVService:
             conn.close()
     
     
-    def processar_multiplos_csv(self, lista_arquivos, data_filtro=None, ids_entregadores=None, filtrar_por_cadastrados=True):
+    def agregar_csv(self, caminho_arquivo, data_filtro=None, ids_filtro=None, por_dia=False):
+        """
+        Lê um CSV em blocos e reduz cada bloco direto no agregado por entregador
+
+        Com o motor arrow configurado, a leitura e as somas são feitas por ele
+        (arquivos que ele não consegue ler voltam para o caminho pandas).
+
+        Args:
+            caminho_arquivo: Caminho do arquivo CSV
+            data_filtro: Data (date) do período de referência a manter (opcional)
+            ids_filtro: Conjunto de IDs de entregadores a manter (opcional)
+            por_dia: Se True, separa as somas por dia do período de referência
+
+        Returns:
+            tuple: (AgregadoEntregadores, linhas do arquivo após o filtro de data)
+        """
+        try:
+            print(f"📂 Processando arquivo: {os.path.basename(caminho_arquivo)}")
+            if self.motor is not None:
+                resultado = self.motor.agregar_csv(caminho_arquivo, data_filtro, ids_filtro, por_dia)
+                if resultado is not None:
+                    print(f"   ✅ Arquivo agregado: {resultado[1]} linhas")
+                    return resultado
+
+            agregado = AgregadoEntregadores(por_dia=por_dia)
+            linhas_data = 0
+
+            for chunk in self.iterar_csv(caminho_arquivo, data_filtro=data_filtro):
+                linhas_data += len(chunk)
+                if ids_filtro is not None:
+                    with self.instrumentacao.etapa('filtro', len(chunk)) as medida:
+                        chunk = chunk[chunk[CHAVE_ENTREGADOR].isin(ids_filtro)]
+                        medida.linhas_saida = len(chunk)
+                # Etapa 'pivot': entram as linhas reduzidas, saem as linhas da tabela final (em consolidar_agregado)
+                with self.instrumentacao.etapa('pivot', len(chunk)) as medida:
+                    agregado.adicionar(chunk)
+                    medida.linhas_saida = 0
+
+            with self.instrumentacao.etapa('pivot'):
+                agregado.compactar()
+            print(f"   ✅ Arquivo agregado: {linhas_data} linhas")
+            return agregado, linhas_data
+
+        except Exception as e:
+            print(f"   ❌ Erro no processamento: {str(e)}")
+            raise Exception(f"Erro ao processar arquivo {os.path.basename(caminho_arquivo)}: {str(e)}")
+
+    def _resultado_sem_dados(self, lista_arquivos, erros):
+        """Resultado vazio para quando nenhum arquivo tem dados para a data filtrada"""
+        df_vazio = pd.DataFrame(columns=['id_da_pessoa_entregadora', 'recebedor', 'valor_total', 'valor_60_percent', 'valor_final'])
+        return {
+            'df_completo': pd.DataFrame(),
+            'detalhes_por_entregador': {},
+            'consolidado_geral': df_vazio,
+            'total_entregadores': 0,
+            'valor_total_geral': 0.0,
+            'data_processamento': datetime.now().strftime('%d/%m/%Y %H:%M'),
+            'erros': erros,
+            'total_arquivos': len(lista_arquivos),
+            'arquivos_sucesso': 0,
+            'arquivos_com_erro': len(erros),
+            'total_entregadores_cadastrados': 0,
+            'entregadores_com_dados': 0
+        }
+
+    def _agregar_arquivos(self, lista_arquivos, data_filtro, ids_filtro, por_dia=False):
+        """
+        Agrega cada arquivo, em paralelo num ProcessPoolExecutor quando MAX_WORKERS > 1
+
+        Returns:
+            list: um Future por arquivo, na mesma ordem de lista_arquivos
+        """
+        # O motor arrow já usa todos os núcleos num processo: sem pool (nem pickling dos agregados)
+        workers = 1 if self.motor is not None else min(self.MAX_WORKERS, len(lista_arquivos))
+        if workers <= 1:
+            futuros = []
+            for i, arquivo in enumerate(lista_arquivos, 1):
+                futuro = Future()
+                try:
+                    futuro.set_result(self.agregar_csv(arquivo, data_filtro, ids_filtro, por_dia))
+                except Exception as e:
+                    futuro.set_exception(e)
+                futuros.append(futuro)
+                self._informar_progresso('agregacao', i, len(lista_arquivos))
+            return futuros
+
+        print(f"⚙️  Agregando {len(lista_arquivos)} arquivos em {workers} processos")
+        # forkserver: o processamento roda numa thread do servidor (fila de jobs, scheduler, fila de
+        # solicitações); um fork copiaria locks presos por essas threads e poderia travar os filhos
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) as executor:
+            futuros = [
+                executor.submit(_agregar_arquivo_em_processo, arquivo, data_filtro, ids_filtro, self.TAMANHO_CHUNK, por_dia)
+                for arquivo in lista_arquivos
+            ]
+            for i, _ in enumerate(as_completed(futuros), 1):
+                self._informar_progresso('agregacao', i, len(futuros))
+
+        # As medições de cada processo entram na execução atual (tempos somados entre processos)
+        resultados = []
+        for futuro in futuros:
+            resultado = Future()
+            if futuro.exception() is not None:
+                resultado.set_exception(futuro.exception())
+            else:
+                agregado, linhas_data, medicoes = futuro.result()
+                self.instrumentacao.incorporar(medicoes)
+                resultado.set_result((agregado, linhas_data))
+            resultados.append(resultado)
+        return resultados
+
+    def _processar_multiplos_csv_streaming(self, lista_arquivos, data_filtro, ids_entregadores, filtrar_por_cadastrados):
+        """
+        Variante em streaming de processar_multiplos_csv
+
+        Cada bloco de cada arquivo é reduzido direto nas somas por entregador,
+        sem montar df_completo. Com MAX_WORKERS > 1 os arquivos são agregados em
+        processos paralelos e os agregados parciais mesclados na ordem dos arquivos. O retorno tem o mesmo formato, com
+        'df_completo' = None e o agregado em 'agregado'.
+        """
+        erros = []
+        arquivos_sucesso = 0
+
+        # Os filtros por entregador são aplicados bloco a bloco, então a lista vem antes da leitura
+        entregadores_cadastrados = self._obter_entregadores_cadastrados()
+        if ids_entregadores:
+            ids_filtro = set(ids_entregadores)
+        elif filtrar_por_cadastrados:
+            ids_filtro = set(entregadores_cadastrados)
+        else:
+            ids_filtro = None
+
+        print(f"🔍 Processando {len(lista_arquivos)} arquivos em streaming...")  # DEBUG
+
+        agregado = AgregadoEntregadores()
+        for arquivo, parcial in zip(lista_arquivos, self._agregar_arquivos(lista_arquivos, data_filtro, ids_filtro)):
+            try:
+                agregado_arquivo, linhas_data = parcial.result()
+                if linhas_data > 0:
+                    arquivos_sucesso += 1
+                    with self.instrumentacao.etapa('concatenacao', agregado_arquivo.linhas):
+                        agregado.mesclar(agregado_arquivo)
+                else:
+                    print(f"⏭️  Arquivo {os.path.basename(arquivo)} não tem dados para a data {data_filtro}")
+            except Exception as e:
+                erro_msg = f"Erro no arquivo {os.path.basename(arquivo)}: {str(e)}"
+                erros.append(erro_msg)
+                print(f"❌ {erro_msg}")  # DEBUG
+
+        if arquivos_sucesso == 0:
+            if data_filtro:
+                print(f"⚠️  Nenhum arquivo contém dados para a data {data_filtro}")
+                return self._resultado_sem_dados(lista_arquivos, erros)
+            raise Exception("Nenhum arquivo pôde ser processado")
+
+        if not ids_entregadores and filtrar_por_cadastrados and not entregadores_cadastrados:
+            raise Exception("Nenhum entregador cadastrado no banco de dados")
+
+        if agregado.vazio:
+            raise Exception("Nenhum dado encontrado para os entregadores")
+
+        return self._resultado_agregado(
+            agregado, erros, len(lista_arquivos), arquivos_sucesso, entregadores_cadastrados
+        )
+
+    def _resultado_agregado(self, agregado, erros, total_arquivos, arquivos_sucesso, entregadores_cadastrados):
+        """Consolida um agregado e monta o dicionário de resultado (formato de processar_multiplos_csv)"""
+        self._informar_progresso('consolidacao', 0, 1)
+        consolidado_geral = self.consolidar_agregado(agregado)
+
+        total_entregadores = len(consolidado_geral) if not consolidado_geral.empty else 0
+        valor_total_geral = consolidado_geral['valor_total'].sum() if not consolidado_geral.empty else 0
+
+        print(f"🎯 Resultado final: {total_entregadores} entregadores, R$ {valor_total_geral:.2f}")  # DEBUG
+
+        with self.instrumentacao.etapa('indice_detalhes', total_entregadores):
+            detalhes_por_entregador = self.indexar_detalhes(consolidado_geral, agregado)
+
+        return {
+            'df_completo': None,
+            'agregado': agregado,
+            'detalhes_por_entregador': detalhes_por_entregador,
+            'consolidado_geral': consolidado_geral,
+            'total_entregadores': total_entregadores,
+            'valor_total_geral': valor_total_geral,
+            'data_processamento': datetime.now().strftime('%d/%m/%Y %H:%M'),
+            'erros': erros,
+            'total_arquivos': total_arquivos,
+            'arquivos_sucesso': arquivos_sucesso,
+            'arquivos_com_erro': len(erros),
+            'total_entregadores_cadastrados': len(entregadores_cadastrados),
+            'entregadores_com_dados': total_entregadores
+        }
+
+    @_instrumentado('atualizar_consolidacao_semanal')
+    def atualizar_consolidacao_semanal(self, lista_arquivos, consolidacao, nomes_originais=None):
+        """
+        Incorpora arquivos recém-enviados à consolidação incremental da semana
+
+        Só os arquivos novos (e contribuições gravadas com outra versão do
+        processamento) são lidos; o resultado sai das somas já reduzidas de
+        todos os arquivos da semana. Um arquivo reenviado com o mesmo nome
+        (por exemplo, uma exportação corrigida) substitui a contribuição
+        anterior; um conteúdo que já está na consolidação (mesmo hash, inclusive
+        enviado com outro nome ou repetido no lote) não é somado de novo.
+
+        Tudo roda sob consolidacao.bloqueio(): outro job (de outro processo)
+        não grava nem lê a consolidação da pasta no meio desta atualização.
+
+        Args:
+            lista_arquivos: Caminhos dos arquivos CSV recém-salvos
+            consolidacao: ConsolidacaoSemanalService da pasta da semana
+            nomes_originais: Nome com que cada arquivo foi enviado (padrão: nome do arquivo salvo)
+
+        Returns:
+            dict: mesmo formato de processar_multiplos_csv(streaming=True)
+        """
+        nomes_originais = nomes_originais or [os.path.basename(a) for a in lista_arquivos]
+        with consolidacao.bloqueio():
+            indice = consolidacao.contribuicoes()
+            pendentes = {}
+            hashes = {}
+            duplicatas = []
+            for caminho, nome in zip(lista_arquivos, nomes_originais):
+                arquivo_salvo = os.path.basename(caminho)
+                hash_conteudo = CacheCSVService.hash_arquivo(caminho)
+                if nome in pendentes:
+                    print(f"🔁 {nome} enviado mais de uma vez no lote: vale o último")
+                    del pendentes[nome], hashes[nome]
+
+                existente = next((n for n, h in hashes.items() if h == hash_conteudo), None)
+                if existente is None and indice.get(nome, {}).get('hash') == hash_conteudo:
+                    existente = nome
+                if existente is None and nome not in indice:
+                    existente = consolidacao.com_conteudo(hash_conteudo)
+                if existente is not None:
+                    print(f"⏭️  {arquivo_salvo} tem o mesmo conteúdo de {existente}, já na consolidação da semana")
+                    duplicatas.append((existente, arquivo_salvo))
+                    continue
+                pendentes[nome] = caminho
+                hashes[nome] = hash_conteudo
+            for nome, caminho in consolidacao.desatualizadas(VERSAO_PROCESSAMENTO).items():
+                pendentes.setdefault(nome, caminho)
+
+            print(f"🔍 Atualizando consolidação semanal com {len(pendentes)} arquivo(s)...")  # DEBUG
+
+            erros = []
+            caminhos = list(pendentes.values())
+            for (nome, caminho), parcial in zip(pendentes.items(), self._agregar_arquivos(caminhos, None, None, por_dia=True)):
+                try:
+                    agregado_arquivo, _ = parcial.result()
+                    with self.instrumentacao.etapa('persistencia', agregado_arquivo.linhas):
+                        consolidacao.registrar(nome, caminho, agregado_arquivo, VERSAO_PROCESSAMENTO, hashes.get(nome))
+                except Exception as e:
+                    erro_msg = f"Erro no arquivo {os.path.basename(caminho)}: {str(e)}"
+                    erros.append(erro_msg)
+                    print(f"❌ {erro_msg}")  # DEBUG
+            for existente, arquivo_salvo in duplicatas:
+                consolidacao.registrar_duplicata(existente, arquivo_salvo)
+
+            self._informar_progresso('consolidacao', 0, 1)
+            contribuicoes = consolidacao.contribuicoes()
+            with self.instrumentacao.etapa('concatenacao') as medida:
+                agregado = consolidacao.agregado(VERSAO_PROCESSAMENTO)
+                medida.linhas_saida = agregado.linhas
+        if agregado.vazio:
+            raise Exception("Nenhum arquivo pôde ser processado")
+
+        return self._resultado_agregado(
+            agregado,
+            erros,
+            len(contribuicoes),
+            sum(1 for c in contribuicoes.values() if c['linhas'] > 0),
+            self._obter_entregadores_cadastrados()
+        )
+
+    @_instrumentado('processar_multiplos_csv')
+    def processar_multiplos_csv(self, lista_arquivos, data_filtro=None, ids_entregadores=None, filtrar_por_cadastrados=True, streaming=False):
         """
         Processa múltiplos arquivos CSV e retorna dados consolidados
         
@@ -248,7 +1079,13 @@ class ProcessadorCSVService:
             data_filtro: Data no formato YYYY-MM-DD para filtrar apenas CSVs desse dia (opcional)
             ids_entregadores: Lista de IDs de entregadores para filtrar (opcional)
             filtrar_por_cadastrados: Se True, filtra apenas entregadores cadastrados no banco. Se False, processa todos do CSV.
+            streaming: Se True, agrega bloco a bloco sem montar df_completo (memória limitada)
         """
+        if streaming:
+            return self._processar_multiplos_csv_streaming(
+                lista_arquivos, data_filtro, ids_entregadores, filtrar_por_cadastrados
+            )
+
         dataframes = []
         erros = []
         
@@ -257,28 +1094,11 @@ class ProcessadorCSVService:
         for arquivo in lista_arquivos:
             try:
                 print(f"📂 Tentando processar: {os.path.basename(arquivo)}")  # DEBUG
-                df = self.processar_csv(arquivo)
-                
-                # Se há filtro de data, filtrar pelos dados dentro do CSV
+                # Se há filtro de data, as linhas são filtradas durante a leitura
                 # IMPORTANTE: Não filtrar pelo nome do arquivo, pois a data pode estar dentro dos dados
-                if data_filtro and not df.empty:
-                    # Verificar se há coluna de data do período de referência
-                    colunas_data = ['data_do_periodo_de_referencia', 'data_periodo', 'data_referencia', 'periodo_data']
-                    coluna_data_encontrada = None
-                    
-                    for col in colunas_data:
-                        if col in df.columns:
-                            coluna_data_encontrada = col
-                            break
-                    
-                    if coluna_data_encontrada:
-                        try:
-                            # Converter coluna para data e filtrar
-                            df[coluna_data_encontrada] = pd.to_datetime(df[coluna_data_encontrada], errors='coerce').dt.date
-                            df = df[df[coluna_data_encontrada] == data_filtro]
-                            print(f"   📅 Filtrado por data: {len(df)} linhas após filtro")
-                        except Exception as e:
-                            print(f"   ⚠️  Erro ao filtrar por data: {str(e)}")
+                df = self.processar_csv(arquivo, data_filtro=data_filtro)
+                if data_filtro:
+                    print(f"   📅 Filtrado por data: {len(df)} linhas após filtro")
                 
                 if not df.empty:
                     dataframes.append(df)
@@ -298,33 +1118,22 @@ class ProcessadorCSVService:
             # Retornar DataFrame vazio em vez de erro
             if data_filtro:
                 print(f"⚠️  Nenhum arquivo contém dados para a data {data_filtro}")
-                # Retornar DataFrame vazio com estrutura básica
-                df_vazio = pd.DataFrame(columns=['id_da_pessoa_entregadora', 'recebedor', 'valor_total', 'valor_60_percent', 'valor_final'])
-                return {
-                    'df_completo': pd.DataFrame(),
-                    'consolidado_geral': df_vazio,
-                    'total_entregadores': 0,
-                    'valor_total_geral': 0.0,
-                    'data_processamento': datetime.now().strftime('%d/%m/%Y %H:%M'),
-                    'erros': erros,
-                    'total_arquivos': len(lista_arquivos),
-                    'arquivos_sucesso': 0,
-                    'arquivos_com_erro': len(erros),
-                    'total_entregadores_cadastrados': 0,
-                    'entregadores_com_dados': 0
-                }
+                return self._resultado_sem_dados(lista_arquivos, erros)
             else:
                 raise Exception("Nenhum arquivo pôde ser processado")
         
         # Combinar todos os dataframes
-        df_completo = pd.concat(dataframes, ignore_index=True)
+        with self.instrumentacao.etapa('concatenacao', sum(len(df) for df in dataframes)):
+            df_completo = self._concatenar_blocos(dataframes)
         
         # Inicializar variável para contar entregadores cadastrados
         entregadores_cadastrados = []
         
         # Filtrar por entregadores se especificado
         if ids_entregadores:
-            df_completo = df_completo[df_completo['id_da_pessoa_entregadora'].isin(ids_entregadores)]
+            with self.instrumentacao.etapa('filtro', len(df_completo)) as medida:
+                df_completo = df_completo[df_completo['id_da_pessoa_entregadora'].isin(ids_entregadores)]
+                medida.linhas_saida = len(df_completo)
             print(f"📈 Dados após filtro por entregadores: {len(df_completo)} linhas")  # DEBUG
             # Buscar entregadores cadastrados para estatísticas
             entregadores_cadastrados = self._obter_entregadores_cadastrados()
@@ -338,7 +1147,9 @@ class ProcessadorCSVService:
                 raise Exception("Nenhum entregador cadastrado no banco de dados")
             
             # Filtrar apenas os entregadores que estão cadastrados
-            df_completo = df_completo[df_completo['id_da_pessoa_entregadora'].isin(entregadores_cadastrados)]
+            with self.instrumentacao.etapa('filtro', len(df_completo)) as medida:
+                df_completo = df_completo[df_completo['id_da_pessoa_entregadora'].isin(entregadores_cadastrados)]
+                medida.linhas_saida = len(df_completo)
             
             print(f"📈 Dados após filtro por entregadores cadastrados: {len(df_completo)} linhas")  # DEBUG
         else:
@@ -350,8 +1161,13 @@ class ProcessadorCSVService:
         if df_completo.empty:
             raise Exception("Nenhum dado encontrado para os entregadores")
         
-        # Consolidar entregadores (passar data_filtro se especificada)
-        consolidado_geral = self.consolidar_entregadores(df_completo, data_filtro=data_filtro)
+        # Consolidar entregadores (df_completo já contém só as linhas de data_filtro)
+        # O agregado fica no resultado para montar o índice de detalhes sem nova varredura
+        agregado = AgregadoEntregadores()
+        with self.instrumentacao.etapa('pivot', len(df_completo)) as medida:
+            agregado.adicionar(df_completo)
+            medida.linhas_saida = 0
+        consolidado_geral = self.consolidar_agregado(agregado)
         
         # Calcular estatísticas de forma segura
         total_entregadores = len(consolidado_geral) if consolidado_geral is not None and not consolidado_geral.empty else 0
@@ -359,8 +1175,13 @@ class ProcessadorCSVService:
         
         print(f"🎯 Resultado final: {total_entregadores} entregadores, R$ {valor_total_geral:.2f}")  # DEBUG
         
+        with self.instrumentacao.etapa('indice_detalhes', total_entregadores):
+            detalhes_por_entregador = self.indexar_detalhes(consolidado_geral, agregado)
+
         return {
             'df_completo': df_completo,
+            'agregado': agregado,
+            'detalhes_por_entregador': detalhes_por_entregador,
             'consolidado_geral': consolidado_geral,
             'total_entregadores': total_entregadores,
             'valor_total_geral': valor_total_geral,
@@ -373,51 +1194,73 @@ class ProcessadorCSVService:
             'entregadores_com_dados': total_entregadores
         }
 
-    def obter_detalhes_processamento_entregador(self, id_entregador, df_completo):
-        """Obtém detalhes completos do processamento de um entregador específico"""
+    def indexar_detalhes(self, consolidado, agregado):
+        """
+        Índice {id: detalhes} de todos os entregadores de uma consolidação
+
+        Reaproveita o consolidado já calculado e os pares (id, periodo) / (id, subpraca)
+        do agregado, então consultar um entregador depois é só um acesso ao dicionário.
+        """
+        if consolidado is None or consolidado.empty:
+            return {}
+
+        periodos = agregado.valores_por_entregador('periodo')
+        subpracas = agregado.valores_por_entregador('subpraca')
+        colunas_valor = [
+            'valor_total', 'corridas', 'gorjeta', 'promo', 'online_time', 'rotas_com_ocorrencia',
+            'tempo_espera', 'outros', 'valor_60_percent', 'valor_final'
+        ]
+
+        # Entregador com mais de um nome de recebedor: vale a primeira linha, como no consolidado
+        linhas = consolidado.drop_duplicates(CHAVE_ENTREGADOR, keep='first')
+        indice = {}
+        for registro in linhas[[CHAVE_ENTREGADOR] + colunas_valor].to_dict('records'):
+            id_entregador = registro.pop(CHAVE_ENTREGADOR)
+            detalhes = {coluna: float(valor) for coluna, valor in registro.items()}
+            detalhes['periodos_trabalhados'] = periodos.get(id_entregador, [])
+            detalhes['subpracas'] = subpracas.get(id_entregador, [])
+            indice[id_entregador] = detalhes
+        return indice
+
+    def obter_detalhes_processamento_entregador(self, id_entregador, df_completo=None, detalhes_por_entregador=None):
+        """
+        Obtém detalhes completos do processamento de um entregador específico
+
+        Args:
+            id_entregador: ID do entregador
+            df_completo: Linhas processadas (legado: consolida só as linhas do entregador)
+            detalhes_por_entregador: Índice de indexar_detalhes (consulta direta, sem varrer linhas)
+        """
         try:
+            if detalhes_por_entregador is not None:
+                return detalhes_por_entregador.get(id_entregador)
+
             # Filtrar dados do entregador
             df_entregador = df_completo[df_completo['id_da_pessoa_entregadora'] == id_entregador]
             
             if df_entregador.empty:
                 return None
             
-            # Consolidar dados específicos
-            consolidado = self.consolidar_entregadores(df_entregador)
-            
-            if consolidado.empty:
-                return None
-            
-            row = consolidado.iloc[0]
-            
-            # Calcular detalhes
-            detalhes = {
-                'valor_total': float(row.get('valor_total', 0)),
-                'corridas': float(row.get('corridas', 0)),
-                'gorjeta': float(row.get('gorjeta', 0)),
-                'promo': float(row.get('promo', 0)),
-                'online_time': float(row.get('online_time', 0)),
-                'rotas_com_ocorrencia': float(row.get('rotas_com_ocorrencia', 0)),
-                'tempo_espera': float(row.get('tempo_espera', 0)),
-                'outros': float(row.get('outros', 0)),
-                'valor_60_percent': float(row.get('valor_60_percent', 0)),
-                'valor_final': float(row.get('valor_final', 0)),
-                'periodos_trabalhados': list(df_entregador['periodo'].unique()),
-                'subpracas': list(df_entregador['subpraca'].unique())
-            }
-            
-            return detalhes
+            agregado = AgregadoEntregadores()
+            agregado.adicionar(df_entregador)
+            return self.indexar_detalhes(self.consolidar_agregado(agregado), agregado).get(id_entregador)
             
         except Exception as e:
             print(f"Erro ao obter detalhes do processamento: {str(e)}")
             return None
     
+    @_instrumentado('gerar_relatorio_excel')
     def gerar_relatorio_excel(self, consolidado_geral, caminho_saida):
-        """Gera relatório completo em Excel"""
+        """Gera relatório completo em Excel (formatado durante a escrita)"""
         try:
-            with pd.ExcelWriter(caminho_saida, engine="openpyxl") as writer:
+            # Colunas de valor do consolidado (tipos de valor e totais) recebem formato monetário
+            colunas_moeda = TIPOS_VALOR + ["valor_total", "valor_60_percent", "valor_final"]
+
+            with self.instrumentacao.etapa('excel', len(consolidado_geral)), RelatorioExcelService(caminho_saida) as relatorio:
                 # Worksheet consolidado
-                consolidado_geral.to_excel(writer, sheet_name='Consolidado', index=False)
+                relatorio.adicionar_planilha(
+                    consolidado_geral, 'Consolidado', colunas_moeda=colunas_moeda, zebra=True
+                )
                 
                 # Worksheet resumo por praça
                 resumo_praca = consolidado_geral.groupby('pracas').agg({
@@ -426,63 +1269,22 @@ class ProcessadorCSVService:
                     'corridas': 'sum',
                     'gorjeta': 'sum'
                 }).round(2)
-                resumo_praca.to_excel(writer, sheet_name='Resumo por Praça')
+                relatorio.adicionar_planilha(
+                    resumo_praca.reset_index(), 'Resumo por Praça', colunas_moeda=colunas_moeda, zebra=True
+                )
                 
                 # Worksheet para pagamento
                 pagamento_df = consolidado_geral[['recebedor', 'id_da_pessoa_entregadora', 'valor_final', 'subpracas']].copy()
                 pagamento_df.columns = ['Entregador', 'ID', 'Valor a Pagar', 'Sub-Praças']
-                pagamento_df.to_excel(writer, sheet_name='Para Pagamento', index=False)
-            
-            # Formatar Excel
-            self._formatar_excel(caminho_saida)
+                relatorio.adicionar_planilha(
+                    pagamento_df, 'Para Pagamento', colunas_moeda=['Valor a Pagar'], zebra=True
+                )
             
             return caminho_saida
             
         except Exception as e:
             raise Exception(f"Erro ao gerar relatório Excel: {str(e)}")
     
-    def _formatar_excel(self, caminho_arquivo):
-        """Aplica formatação ao arquivo Excel gerado"""
-        wb = load_workbook(caminho_arquivo)
-        azul_abjp = "0B5CFF"
-        cinza_claro = "F2F2F2"
-
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-
-            # Formatar cabeçalho
-            for cell in ws[1]:
-                cell.fill = PatternFill(start_color=azul_abjp, end_color=azul_abjp, fill_type="solid")
-                cell.font = Font(color="FFFFFF", bold=True)
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-
-            # Ajustar largura das colunas
-            for col in ws.columns:
-                max_length = 0
-                column = col[0].column_letter
-                for cell in col:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column].width = adjusted_width
-
-            # Formatar células de dados
-            for row in ws.iter_rows(min_row=2):
-                for cell in row:
-                    # Formato monetário para colunas de valor
-                    if cell.column_letter in ['G', 'H', 'I', 'J', 'K', 'L', 'M', 'N']:
-                        if isinstance(cell.value, (int, float)):
-                            cell.number_format = 'R$ #,##0.00'
-                    
-                    # Alternar cores das linhas
-                    if cell.row % 2 == 0:
-                        cell.fill = PatternFill(start_color=cinza_claro, end_color=cinza_claro, fill_type="solid")
-
-        wb.save(caminho_arquivo)
-    
     # Método de debug para verificar todos os métodos disponíveis
     def listar_metodos(self):
         """Lista todos os métodos disponíveis na classe"""
@@ -0,0 +1,140 @@
+"""
+Cache em disco dos relatórios XLSX gerados, chaveado pela impressão digital das entradas
+Relatórios repetidos com as mesmas entradas são servidos do disco, com ETag / Last-Modified
+"""
+import os
+import json
+import hashlib
+import threading
+import time
+from datetime import datetime
+from flask import send_file
+from config import Config
+
+
+class RelatorioCacheService:
+    """
+    Cache de relatórios por impressão digital das entradas
+
+    - Chave: sha256 do tipo de relatório + versão do formato + entradas (hash dos CSVs
+      de origem, lote, versão dos dados do banco usados...); entradas diferentes geram
+      outra chave, então um relatório desatualizado nunca é servido
+    - Entrada: um arquivo <tipo>_<chave>.xlsx; a chave também é o ETag da resposta
+    - Limite de tamanho: ao gravar, remove os relatórios usados há mais tempo
+    """
+
+    EXTENSAO = '.xlsx'
+    # Aumentar quando o layout de algum relatório mudar (invalida o cache inteiro)
+    VERSAO_FORMATO = 1
+
+    _lock = threading.Lock()
+
+    def __init__(self, pasta=None, limite_bytes=None):
+        self.pasta = pasta or Config.RELATORIOS_CACHE_FOLDER
+        self.limite_bytes = limite_bytes if limite_bytes is not None else Config.RELATORIOS_CACHE_MAX_MB * 1024 * 1024
+        os.makedirs(self.pasta, exist_ok=True)
+
+    @staticmethod
+    def chave(tipo, **entradas):
+        """Impressão digital (sha256) de um relatório a partir do tipo e das entradas"""
+        conteudo = json.dumps(
+            {'tipo': tipo, 'versao': RelatorioCacheService.VERSAO_FORMATO, **entradas},
+            sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def impressao_linhas(linhas):
+        """Versão de um conjunto de linhas do banco (sha256 dos valores, na ordem recebida)"""
+        sha = hashlib.sha256()
+        for linha in linhas:
+            valores = list(dict(linha).values()) if hasattr(linha, 'keys') else list(linha)
+            sha.update(json.dumps(valores, default=str, ensure_ascii=False).encode('utf-8'))
+            sha.update(b'\n')
+        return sha.hexdigest()
+
+    def _caminho_entrada(self, tipo, chave):
+        return os.path.join(self.pasta, f"{tipo}_{chave}{self.EXTENSAO}")
+
+    def obter(self, tipo, chave):
+        """
+        Caminho do relatório em cache (marcado como usado recentemente)
+
+        Returns:
+            str ou None (cache miss)
+        """
+        if not Config.RELATORIOS_CACHE_ENABLED:
+            return None
+        entrada = self._caminho_entrada(tipo, chave)
+        try:
+            # Uso recente fica no atime (critério de remoção); o mtime é o Last-Modified do relatório
+            os.utime(entrada, (time.time(), os.stat(entrada).st_mtime))
+        except OSError:
+            return None
+        return entrada
+
+    def obter_ou_gerar(self, tipo, chave, gerar):
+        """
+        Relatório em cache ou gerado agora por gerar(caminho_saida)
+
+        O arquivo é escrito num temporário e só publicado se gerar() terminar sem erro.
+
+        Returns:
+            tuple: (caminho do relatório, True se veio do cache)
+        """
+        entrada = self.obter(tipo, chave)
+        if entrada is not None:
+            print(f"📦 Relatório em cache: {os.path.basename(entrada)}")
+            return entrada, True
+
+        entrada = self._caminho_entrada(tipo, chave)
+        # Mantém a extensão .xlsx: o pandas escolhe o motor de escrita por ela
+        temporario = f"{entrada[:-len(self.EXTENSAO)]}.{os.getpid()}.{threading.get_ident()}.tmp{self.EXTENSAO}"
+        try:
+            gerar(temporario)
+            os.replace(temporario, entrada)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+        self.aplicar_limite()
+        return entrada, False
+
+    def aplicar_limite(self):
+        """Remove os relatórios menos usados até o cache caber em limite_bytes"""
+        with self._lock:
+            try:
+                entradas = []
+                for nome in os.listdir(self.pasta):
+                    if not nome.endswith(self.EXTENSAO) or '.tmp' in nome:
+                        continue
+                    caminho = os.path.join(self.pasta, nome)
+                    stat = os.stat(caminho)
+                    entradas.append((stat.st_atime, stat.st_size, caminho))
+
+                total = sum(tamanho for _, tamanho, _ in entradas)
+                for _, tamanho, caminho in sorted(entradas):
+                    if total <= self.limite_bytes:
+                        break
+                    os.remove(caminho)
+                    total -= tamanho
+                    print(f"   🧹 Relatório removido do cache: {os.path.basename(caminho)}")
+            except OSError as e:
+                print(f"   ⚠️  Erro ao aplicar limite do cache de relatórios: {e}")
+
+    @staticmethod
+    def resposta(caminho, chave, download_name):
+        """
+        Envia o relatório com ETag (a chave) e Last-Modified
+
+        Requisições com If-None-Match / If-Modified-Since correspondentes recebem 304.
+        """
+        return send_file(
+            caminho,
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=chave,
+            last_modified=datetime.fromtimestamp(os.path.getmtime(caminho)),
+            max_age=0
+        )
@@ -0,0 +1,141 @@
+"""
+Gerador de relatórios Excel formatados na escrita
+Usa o modo write-only do openpyxl: as linhas são gravadas em streaming, sem reabrir o arquivo para formatar
+"""
+from copy import copy
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
+from openpyxl.utils import get_column_letter
+
+
+class RelatorioExcelService:
+    """
+    Escreve DataFrames em planilhas já com o padrão visual dos relatórios
+
+    - Cabeçalho azul ABJP com fonte branca em negrito, centralizado
+    - Formato monetário nas colunas informadas
+    - Linhas zebradas (opcional)
+    - Largura de coluna calculada a partir do DataFrame (maior texto + 2, até 50)
+
+    Uso:
+        with RelatorioExcelService(caminho) as relatorio:
+            relatorio.adicionar_planilha(df, 'Consolidado', colunas_moeda=[...], zebra=True)
+    """
+
+    AZUL_ABJP = "0B5CFF"
+    CINZA_CLARO = "F2F2F2"
+    FORMATO_MOEDA = 'R$ #,##0.00'
+    LARGURA_MAXIMA = 50
+
+    def __init__(self, caminho_saida):
+        self.caminho_saida = caminho_saida
+        self.wb = Workbook(write_only=True)
+        self._estilos = {}
+        self._modelos = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.salvar()
+        return False
+
+    def salvar(self):
+        """Grava o arquivo (uma planilha vazia se nada foi adicionado)"""
+        if not self.wb.worksheets:
+            self.wb.create_sheet()
+        self.wb.save(self.caminho_saida)
+        return self.caminho_saida
+
+    def _estilo(self, cabecalho=False, moeda=False, zebra=False, italico=False, centralizar=False):
+        """Registra (uma vez) e retorna o nome do estilo para a combinação pedida"""
+        chave = (cabecalho, moeda, zebra, italico, centralizar)
+        if chave not in self._estilos:
+            nome = "relatorio_" + "_".join(str(int(v)) for v in chave)
+            estilo = NamedStyle(name=nome)
+            if cabecalho:
+                estilo.fill = PatternFill(start_color=self.AZUL_ABJP, end_color=self.AZUL_ABJP, fill_type="solid")
+                estilo.font = Font(color="FFFFFF", bold=True, italic=italico)
+                estilo.alignment = Alignment(horizontal="center", vertical="center")
+            else:
+                estilo.font = Font(italic=italico)
+                if zebra:
+                    estilo.fill = PatternFill(start_color=self.CINZA_CLARO, end_color=self.CINZA_CLARO, fill_type="solid")
+                if moeda:
+                    estilo.number_format = self.FORMATO_MOEDA
+                if centralizar:
+                    estilo.alignment = Alignment(horizontal="center", vertical="center")
+            self.wb.add_named_style(estilo)
+            self._estilos[chave] = nome
+        return self._estilos[chave]
+
+    def _celula(self, ws, valor, estilo):
+        """
+        Célula write-only com o estilo nomeado
+
+        O estilo é resolvido uma vez por nome; as demais células copiam o
+        StyleArray pronto em vez de buscar o NamedStyle a cada atribuição.
+        """
+        celula = WriteOnlyCell(ws, value=valor)
+        modelo = self._modelos.get(estilo)
+        if modelo is None:
+            celula.style = estilo
+            self._modelos[estilo] = copy(celula._style)
+        else:
+            celula._style = copy(modelo)
+        return celula
+
+    def _larguras(self, df):
+        """Largura de cada coluna: maior texto entre cabeçalho e valores (+2), limitada a LARGURA_MAXIMA"""
+        larguras = []
+        for coluna in df.columns:
+            textos = df[coluna].dropna().astype(str)
+            maior = max(len(str(coluna)), int(textos.str.len().max()) if len(textos) else 0)
+            larguras.append(min(maior + 2, self.LARGURA_MAXIMA))
+        return larguras
+
+    def adicionar_planilha(self, df, nome, colunas_moeda=(), zebra=False, italico=False, centralizar=False):
+        """
+        Escreve um DataFrame numa nova planilha
+
+        Args:
+            df: Dados (o índice não é escrito; use reset_index() se ele for uma coluna)
+            nome: Nome da planilha
+            colunas_moeda: Colunas com formato monetário (valores numéricos)
+            zebra: Se True, preenche as linhas pares com cinza claro
+            italico: Fonte itálica no cabeçalho e nos dados
+            centralizar: Centraliza os dados
+        """
+        ws = self.wb.create_sheet(title=nome)
+        for i, largura in enumerate(self._larguras(df), start=1):
+            ws.column_dimensions[get_column_letter(i)].width = largura
+
+        estilo_cabecalho = self._estilo(cabecalho=True, italico=italico)
+        ws.append([self._celula(ws, str(coluna), estilo_cabecalho) for coluna in df.columns])
+
+        # Estilo de cada coluna nas linhas ímpares/pares (None = célula sem formatação)
+        moedas = set(colunas_moeda)
+        estilos = {}
+        for par in (False, True):
+            estilos[par] = [
+                self._estilo(moeda=coluna in moedas and pd.api.types.is_numeric_dtype(df[coluna]),
+                             zebra=zebra and par, italico=italico, centralizar=centralizar)
+                if (coluna in moedas or (zebra and par) or italico or centralizar) else None
+                for coluna in df.columns
+            ]
+
+        # Valores como objetos Python, com NaN -> célula vazia
+        colunas = [
+            df[coluna].astype(object).where(df[coluna].notna(), None).tolist()
+            for coluna in df.columns
+        ]
+        for numero_linha, valores in enumerate(zip(*colunas), start=2):
+            estilos_linha = estilos[numero_linha % 2 == 0]
+            ws.append([
+                valor if estilo is None else self._celula(ws, valor, estilo)
+                for valor, estilo in zip(valores, estilos_linha)
+            ])
+        return ws
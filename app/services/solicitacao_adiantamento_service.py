@@ -0,0 +1,166 @@
+"""
+Gravação das solicitações de adiantamento do formulário público
+
+A regra de 1 solicitação por CPF por dia é garantida pelo banco: índice único parcial
+em (cpf_norm, data_solicitacao) e INSERT ... ON CONFLICT DO NOTHING, sem SELECT COUNT
+antes (que não usava índice e deixava duas solicitações simultâneas passarem).
+
+Opcionalmente (ADIANTAMENTO_FILA_ENABLED) as gravações passam por uma fila com uma
+thread gravadora, que grava todas as solicitações que chegaram enquanto a anterior
+era confirmada numa única transação. A requisição espera o commit do seu lote, então
+a resposta ao entregador continua refletindo o que foi gravado; se o lote não for
+confirmado em ADIANTAMENTO_FILA_TIMEOUT_SEGUNDOS, a solicitação continua na fila e a
+requisição responde como recebida (registrar retorna None) em vez de falhar.
+"""
+import os
+import json
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FuturoTimeoutError
+from datetime import datetime
+from app.models.database import get_db_connection, get_db_placeholder, is_postgresql_connection, normalizar_cpf
+from app.utils.constants import FORMATO_DATA_SQL, FORMATO_DATA_ISO
+from config import Config
+
+COLUNAS_INSERT = (
+    'email', 'nome', 'cpf', 'cpf_norm', 'praca', 'valor_informado', 'concorda',
+    'data_envio', 'data_solicitacao', 'dados_json'
+)
+
+# Alvo do ON CONFLICT: precisa repetir o predicado do índice único parcial
+CONFLITO_CPF_DIA = "(cpf_norm, data_solicitacao) WHERE cpf_norm IS NOT NULL AND data_solicitacao IS NOT NULL"
+
+
+class SolicitacaoAdiantamentoService:
+    """Grava solicitações de adiantamento (direto ou pela fila de gravação em lote)"""
+
+    _fila = None
+    _thread = None
+    _pid = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _linha(dados, agora=None):
+        """Tupla de COLUNAS_INSERT a partir dos campos do formulário"""
+        agora = agora or datetime.now()
+        data_envio = agora.strftime(FORMATO_DATA_SQL)
+        resposta_json = {
+            "email": dados.get('email'),
+            "nome": dados.get('nome'),
+            "cpf": dados.get('cpf'),
+            "praca": dados.get('praca'),
+            "valor": dados.get('valor'),
+            "concorda": dados.get('concorda'),
+            "data_envio": data_envio
+        }
+        return (
+            dados.get('email'), dados.get('nome'), dados.get('cpf'), normalizar_cpf(dados.get('cpf')),
+            dados.get('praca'), dados.get('valor'), dados.get('concorda'),
+            data_envio, agora.strftime(FORMATO_DATA_ISO),
+            json.dumps(resposta_json, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def gravar_lote(linhas):
+        """
+        Grava várias solicitações numa única transação
+
+        Returns:
+            list[bool]: por linha, True se gravada e False se o CPF já tinha solicitação no dia
+        """
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            p = get_db_placeholder(conn)
+            valores = [p] * len(COLUNAS_INSERT)
+            if is_postgresql_connection(conn):
+                valores[COLUNAS_INSERT.index('dados_json')] = f"{p}::jsonb"
+            sql = f"""
+                INSERT INTO solicitacoes_adiantamento ({', '.join(COLUNAS_INSERT)})
+                VALUES ({', '.join(valores)})
+                ON CONFLICT {CONFLITO_CPF_DIA} DO NOTHING
+            """
+            gravadas = []
+            for linha in linhas:
+                cursor.execute(sql, linha)
+                gravadas.append(cursor.rowcount == 1)
+            conn.commit()
+            return gravadas
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def registrar(dados, agora=None):
+        """
+        Grava uma solicitação do formulário público
+
+        Args:
+            dados: campos do formulário (email, nome, cpf, praca, valor, concorda)
+            agora: momento do envio (padrão: agora)
+
+        Returns:
+            bool | None: True se gravada, False se o CPF já fez uma solicitação no dia,
+            None se ficou na fila sem confirmação dentro do timeout (ainda será gravada)
+        """
+        linha = SolicitacaoAdiantamentoService._linha(dados, agora)
+        if not Config.ADIANTAMENTO_FILA_ENABLED:
+            return SolicitacaoAdiantamentoService.gravar_lote([linha])[0]
+
+        futuro = Future()
+        SolicitacaoAdiantamentoService._obter_fila().put((linha, futuro))
+        try:
+            return futuro.result(timeout=Config.ADIANTAMENTO_FILA_TIMEOUT_SEGUNDOS)
+        except FuturoTimeoutError:
+            # O INSERT continua na fila e pode ser confirmado depois: não é erro do envio
+            print(f"⚠️ Solicitação de {linha[COLUNAS_INSERT.index('cpf_norm')]} ainda na fila após "
+                  f"{Config.ADIANTAMENTO_FILA_TIMEOUT_SEGUNDOS}s; respondendo como recebida")
+            return None
+
+    # ================================
+    # 📥 FILA DE GRAVAÇÃO EM LOTE
+    # ================================
+    @staticmethod
+    def _obter_fila():
+        """Fila deste processo (a thread gravadora é iniciada no primeiro uso e após um fork)"""
+        with SolicitacaoAdiantamentoService._lock:
+            if SolicitacaoAdiantamentoService._pid != os.getpid():
+                SolicitacaoAdiantamentoService._fila = queue.Queue()
+                SolicitacaoAdiantamentoService._thread = threading.Thread(
+                    target=SolicitacaoAdiantamentoService._gravar_continuamente,
+                    args=(SolicitacaoAdiantamentoService._fila,),
+                    name='fila-solicitacoes',
+                    daemon=True
+                )
+                SolicitacaoAdiantamentoService._thread.start()
+                SolicitacaoAdiantamentoService._pid = os.getpid()
+                print(f"🟢 Fila de gravação de solicitações iniciada (lotes de até {Config.ADIANTAMENTO_FILA_LOTE}).")
+            return SolicitacaoAdiantamentoService._fila
+
+    @staticmethod
+    def _gravar_continuamente(fila):
+        """Thread gravadora: cada lote leva tudo o que chegou enquanto o anterior era gravado"""
+        while True:
+            lote = [fila.get()]
+            while len(lote) < Config.ADIANTAMENTO_FILA_LOTE:
+                try:
+                    lote.append(fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                resultados = SolicitacaoAdiantamentoService.gravar_lote([linha for linha, _ in lote])
+            except Exception as e:
+                # Uma solicitação com problema não derruba as outras: grava uma a uma
+                print(f"⚠️ Erro ao gravar lote de {len(lote)} solicitações, gravando individualmente: {e}")
+                for linha, futuro in lote:
+                    try:
+                        futuro.set_result(SolicitacaoAdiantamentoService.gravar_lote([linha])[0])
+                    except Exception as erro:
+                        futuro.set_exception(erro)
+                continue
+
+            for (_, futuro), gravada in zip(lote, resultados):
+                futuro.set_result(gravada)
@@ -261,6 +261,8 @@ class StorageService:
             # Deserializar JSON
             if 'dados_json' in result:
                 result['dados_json'] = StorageService._deserialize_json(result['dados_json'])
+            if result.get('instrumentacao_json'):
+                result['instrumentacao_json'] = StorageService._deserialize_json(result['instrumentacao_json'])
             if 'erros' in result and result['erros']:
                 try:
                     result['erros'] = json.loads(result['erros'])
@@ -274,6 +276,201 @@ class StorageService:
         finally:
             conn.close()
     
+    @staticmethod
+    def salvar_instrumentacao_processamento(pasta_uploads, instrumentacao):
+        """Grava as medições por etapa junto do resultado de processamento da pasta"""
+        from app.utils.db_helpers import db_connection
+        from app.models.database import get_db_cursor, get_db_placeholder
+        
+        try:
+            with db_connection() as conn:
+                cursor = get_db_cursor(conn)
+                placeholder = get_db_placeholder(conn)
+                tipo_json = "::jsonb" if is_postgresql_connection(conn) else ""
+                cursor.execute(f"""
+                    UPDATE processamento_resultados
+                    SET instrumentacao_json = {placeholder}{tipo_json}
+                    WHERE pasta_uploads = {placeholder}
+                """, (StorageService._serialize_json(instrumentacao), pasta_uploads))
+                return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Erro ao salvar instrumentação do processamento: {e}")
+            return False
+
+    # ==================== FILA DE PROCESSAMENTO (JOBS) ====================
+
+    # Colunas que atualizar_job_processamento aceita (as *_json são serializadas)
+    CAMPOS_JOB = ('status', 'etapa', 'percentual', 'resultado_json', 'erro', 'processo', 'finalizado_em')
+
+    @staticmethod
+    def _agora_db():
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    @staticmethod
+    def _job_para_dict(row):
+        if not row:
+            return None
+        job = dict(row)
+        for campo in ('arquivos_json', 'resultado_json'):
+            job[campo] = StorageService._deserialize_json(job.get(campo))
+        return job
+
+    @staticmethod
+    def criar_job_processamento(job_id, pasta_uploads, arquivos, usuario=None):
+        """Registra um job pendente; arquivos = [{'caminho': ..., 'nome': ...}]"""
+        from app.utils.db_helpers import db_connection
+        from app.models.database import get_db_cursor, get_db_placeholder
+
+        try:
+            with db_connection() as conn:
+                cursor = get_db_cursor(conn)
+                p = get_db_placeholder(conn)
+                tipo_json = "::jsonb" if is_postgresql_connection(conn) else ""
+                agora = StorageService._agora_db()
+                cursor.execute(f"""
+                    INSERT INTO processamento_jobs
+                    (id, pasta_uploads, status, etapa, percentual, arquivos_json, usuario, created_at, atualizado_em)
+                    VALUES ({p}, {p}, 'pendente', 'na_fila', 0, {p}{tipo_json}, {p}, {p}, {p})
+                """, (job_id, pasta_uploads, StorageService._serialize_json(arquivos), usuario, agora, agora))
+                return True
+        except Exception as e:
+            print(f"Erro ao criar job de processamento: {e}")
+            return False
+
+    @staticmethod
+    def assumir_job_processamento(job_id, processo):
+        """
+        Passa um job pendente para 'executando' em nome de `processo`
+
+        A troca só acontece se o job ainda estiver pendente e nenhum outro job da
+        mesma pasta estiver executando, então dois workers (ou processos) nunca
+        executam o mesmo job nem processam a mesma pasta ao mesmo tempo.
+        """
+        from app.utils.db_helpers import db_connection
+        from app.models.database import get_db_cursor, get_db_placeholder
+
+        try:
+            with db_connection() as conn:
+                cursor = get_db_cursor(conn)
+                p = get_db_placeholder(conn)
+                agora = StorageService._agora_db()
+                if is_postgresql_connection(conn):
+                    # Serializa a checagem por pasta: em READ COMMITTED dois UPDATEs
+                    # simultâneos não veriam o 'executando' um do outro
+                    cursor.execute(
+                        f"""
+                        SELECT pg_advisory_xact_lock(hashtext(pasta_uploads))
+                        FROM processamento_jobs WHERE id = {p}
+                        """,
+                        (job_id,)
+                    )
+                cursor.execute(f"""
+                    UPDATE processamento_jobs
+                    SET status = 'executando', etapa = 'iniciando', percentual = 0, erro = NULL,
+                        processo = {p}, tentativas = COALESCE(tentativas, 0) + 1,
+                        iniciado_em = {p}, atualizado_em = {p}
+                    WHERE id = {p} AND status = 'pendente'
+                    AND NOT EXISTS (
+                        SELECT 1 FROM processamento_jobs outro
+                        WHERE outro.pasta_uploads = processamento_jobs.pasta_uploads
+                        AND outro.status = 'executando'
+                    )
+                """, (processo, agora, agora, job_id))
+                return cursor.rowcount == 1
+        except Exception as e:
+            print(f"Erro ao assumir job de processamento: {e}")
+            return False
+
+    @staticmethod
+    def reenfileirar_job_processamento(job_id, processo):
+        """Devolve à fila um job interrompido (só se ainda estiver com o processo informado)"""
+        from app.utils.db_helpers import db_connection
+        from app.models.database import get_db_cursor, get_db_placeholder
+
+        try:
+            with db_connection() as conn:
+                cursor = get_db_cursor(conn)
+                p = get_db_placeholder(conn)
+                cursor.execute(f"""
+                    UPDATE processamento_jobs
+                    SET status = 'pendente', etapa = 'na_fila', percentual = 0, processo = NULL, atualizado_em = {p}
+                    WHERE id = {p} AND status = 'executando' AND processo = {p}
+                """, (StorageService._agora_db(), job_id, processo))
+                return cursor.rowcount == 1
+        except Exception as e:
+            print(f"Erro ao reenfileirar job de processamento: {e}")
+            return False
+
+    @staticmethod
+    def atualizar_job_processamento(job_id, **campos):
+        """Atualiza campos de CAMPOS_JOB (e atualizado_em, que serve de sinal de vida do job)"""
+        from app.utils.db_helpers import db_connection
+        from app.models.database import get_db_cursor, get_db_placeholder
+
+        desconhecidos = set(campos) - set(StorageService.CAMPOS_JOB)
+        if desconhecidos:
+            raise ValueError(f"Campos de job desconhecidos: {sorted(desconhecidos)}")
+
+        try:
+            with db_connection() as conn:
+                cursor = get_db_cursor(conn)
+                p = get_db_placeholder(conn)
+                tipo_json = "::jsonb" if is_postgresql_connection(conn) else ""
+                atribuicoes, valores = [], []
+                for campo, valor in campos.items():
+                    if campo.endswith('_json'):
+                        atribuicoes.append(f"{campo} = {p}{tipo_json}")
+                        valores.append(StorageService._serialize_json(valor))
+                    else:
+                        atribuicoes.append(f"{campo} = {p}")
+                        valores.append(valor)
+                atribuicoes.append(f"atualizado_em = {p}")
+                valores.extend([StorageService._agora_db(), job_id])
+                cursor.execute(
+                    f"UPDATE processamento_jobs SET {', '.join(atribuicoes)} WHERE id = {p}",
+                    tuple(valores)
+                )
+                return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Erro ao atualizar job de processamento: {e}")
+            return False
+
+    @staticmethod
+    def carregar_job_processamento(job_id):
+        """Carrega um job pelo id (None se não existir)"""
+        from app.utils.db_helpers import db_connection
+        from app.models.database import get_db_cursor, get_db_placeholder
+
+        try:
+            with db_connection() as conn:
+                cursor = get_db_cursor(conn)
+                p = get_db_placeholder(conn)
+                cursor.execute(f"SELECT * FROM processamento_jobs WHERE id = {p}", (job_id,))
+                return StorageService._job_para_dict(cursor.fetchone())
+        except Exception as e:
+            print(f"Erro ao carregar job de processamento: {e}")
+            return None
+
+    @staticmethod
+    def listar_jobs_processamento(status):
+        """Jobs com um dos status informados, do mais antigo para o mais novo"""
+        from app.utils.db_helpers import db_connection
+        from app.models.database import get_db_cursor, get_db_placeholder
+
+        try:
+            with db_connection() as conn:
+                cursor = get_db_cursor(conn)
+                p = get_db_placeholder(conn)
+                cursor.execute(f"""
+                    SELECT * FROM processamento_jobs
+                    WHERE status IN ({', '.join([p] * len(status))})
+                    ORDER BY created_at
+                """, tuple(status))
+                return [StorageService._job_para_dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Erro ao listar jobs de processamento: {e}")
+            return []
+
     # ==================== ARQUIVOS TEMPORÁRIOS ====================
     
     @staticmethod
@@ -346,6 +543,8 @@ class StorageService:
             # Deserializar JSON
             if 'dados_json' in result:
                 result['dados_json'] = StorageService._deserialize_json(result['dados_json'])
+            if result.get('instrumentacao_json'):
+                result['instrumentacao_json'] = StorageService._deserialize_json(result['instrumentacao_json'])
             
             return result
         except Exception as e:
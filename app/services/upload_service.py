@@ -2,8 +2,9 @@ import os
 import re
 import pandas as pd
 import sqlite3
-from app.models.database import get_db_connection
+from app.models.database import get_db_connection, normalizar_cpf
 from app.utils.path_manager import get_week_folder
+from app.services.cpf_cache_service import CpfCacheService
 from config import Config
 
 
@@ -124,16 +125,16 @@ class UploadService:
                     if is_postgresql:
                         cursor.execute(f"""
                             INSERT INTO entregadores
-                            (id_da_pessoa_entregadora, recebedor, email, cpf, cnpj, subpraca, emissor, status)
-                            VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, 'Proprio', 'Ativo')
+                            (id_da_pessoa_entregadora, recebedor, email, cpf, cpf_norm, cnpj, subpraca, emissor, status)
+                            VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, 'Proprio', 'Ativo')
                             ON CONFLICT (id_da_pessoa_entregadora) DO NOTHING
-                        """, (id_ent, recebedor, email, cpf, cnpj, subpraca))
+                        """, (id_ent, recebedor, email, cpf, normalizar_cpf(cpf), cnpj, subpraca))
                     else:
                         cursor.execute("""
                             INSERT OR IGNORE INTO entregadores
-                            (id_da_pessoa_entregadora, recebedor, email, cpf, cnpj, subpraca, emissor, status)
-                            VALUES (?, ?, ?, ?, ?, ?, 'Proprio', 'Ativo')
-                        """, (id_ent, recebedor, email, cpf, cnpj, subpraca))
+                            (id_da_pessoa_entregadora, recebedor, email, cpf, cpf_norm, cnpj, subpraca, emissor, status)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, 'Proprio', 'Ativo')
+                        """, (id_ent, recebedor, email, cpf, normalizar_cpf(cpf), cnpj, subpraca))
 
                     if chave_pix:
                         cursor.execute(f"""
@@ -149,6 +150,7 @@ class UploadService:
                     print(f"❌ Erro ao inserir entregador {id_ent}: {e}")
 
             conn.commit()
+            CpfCacheService.invalidar()
             print(f"✅ Inseridos: {inseridos} | ⚠️ Erros: {erros}")
             return inseridos
         except Exception as e:
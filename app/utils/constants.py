@@ -129,6 +129,7 @@ DEFAULT_TIPO_CHAVE = 'AUTO'
 
 # ===== ARQUIVOS =====
 ARQUIVO_ULTIMO_RESULTADO = 'ultimo_resultado.json'
+# Consolidados em CSV de versões anteriores (hoje em processamento_consolidado)
 ARQUIVO_ULTIMO_CONSOLIDADO = 'ultimo_consolidado.csv'
 ARQUIVO_CONSOLIDADO_DIARIO = 'consolidado_diario.csv'
 ARQUIVO_SOLICITACOES = 'solicitacoes.json'
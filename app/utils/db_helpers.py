@@ -129,3 +129,37 @@ def row_to_dict(row):
         return dict(row)
     return None
 
+
+# No SQLite o LOWER só converte ASCII ("JOSÉ" viraria "josÉ"); as buscas usam esta
+# função registrada na conexão, com o str.lower do Python (o mesmo dos filtros em memória)
+FUNCAO_LOWER_SQLITE = 'lower_unicode'
+
+
+def registrar_lower_unicode(conn):
+    """Registra FUNCAO_LOWER_SQLITE numa conexão SQLite (no PostgreSQL o LOWER já é Unicode)"""
+    if is_postgresql_connection(conn):
+        return
+    conn.create_function(
+        FUNCAO_LOWER_SQLITE, 1,
+        lambda valor: valor.lower() if isinstance(valor, str) else valor,
+        deterministic=True
+    )
+
+
+def condicao_contem(colunas, termo, placeholder, is_postgresql):
+    """
+    Condição "alguma das colunas contém o termo", sem diferenciar maiúsculas
+
+    Curingas digitados pelo usuário (% e _) são literais. No SQLite a conexão
+    precisa de registrar_lower_unicode.
+
+    Returns:
+        tuple: (condição SQL entre parênteses, lista de parâmetros)
+    """
+    termo = termo.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    funcao_lower = 'LOWER' if is_postgresql else FUNCAO_LOWER_SQLITE
+    condicao = "(" + " OR ".join(
+        f"{funcao_lower}(COALESCE({coluna}, '')) LIKE {placeholder} ESCAPE '\\'"
+        for coluna in colunas
+    ) + ")"
+    return condicao, [f"%{termo}%"] * len(colunas)
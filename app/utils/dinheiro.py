@@ -0,0 +1,72 @@
+"""
+Aritmética de dinheiro em centavos inteiros (int64)
+
+Os valores são convertidos para centavos uma única vez (na leitura) e toda a
+conta de pagamento é feita com inteiros, sem arredondamentos intermediários.
+Regra única de arredondamento: meio centavo vai para longe de zero (ROUND_HALF_UP).
+"""
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+
+CENTAVOS_POR_REAL = 100
+
+
+def _arredondar_meio_para_cima(valores):
+    """Arredonda um array float para o inteiro mais próximo (meio para longe de zero)"""
+    return (np.sign(valores) * np.floor(np.abs(valores) + 0.5)).astype('int64')
+
+
+def reais_para_centavos(valores):
+    """
+    Converte reais para centavos int64 (nulos viram 0)
+
+    Args:
+        valores: Series, array ou número em reais
+    """
+    if isinstance(valores, pd.Series):
+        reais = pd.to_numeric(valores, errors='coerce').fillna(0).to_numpy(dtype='float64')
+        return pd.Series(_arredondar_meio_para_cima(reais * CENTAVOS_POR_REAL), index=valores.index, name=valores.name)
+    reais = np.nan_to_num(np.asarray(valores, dtype='float64'))
+    centavos = _arredondar_meio_para_cima(reais * CENTAVOS_POR_REAL)
+    return int(centavos) if centavos.ndim == 0 else centavos
+
+
+def centavos_para_reais(centavos):
+    """Converte centavos para reais (float com no máximo 2 casas)"""
+    if isinstance(centavos, pd.Series):
+        return centavos.astype('int64') / CENTAVOS_POR_REAL
+    return centavos / CENTAVOS_POR_REAL
+
+
+def aplicar_percentual(centavos, percentual):
+    """
+    Aplica um percentual (ex.: 0.6) a centavos inteiros, com a regra única de arredondamento
+
+    O percentual vira uma fração exata (0.6 -> 3/5) e a divisão é inteira,
+    então o resultado não depende de representação binária de float.
+    """
+    fracao = Fraction(str(percentual))
+    numerador, denominador = fracao.numerator, fracao.denominator
+    sinal = np.sign(centavos) if isinstance(centavos, (pd.Series, np.ndarray)) else (centavos > 0) - (centavos < 0)
+    return sinal * ((abs(centavos) * 2 * numerador + denominador) // (2 * denominador))
+
+
+def calcular_pagamento(valor_total, gorjeta, percentual, desconto):
+    """
+    Valor do adiantamento em centavos: percentual de (total - gorjeta), menos o desconto fixo
+
+    Args:
+        valor_total: Centavos do valor total (Series ou int)
+        gorjeta: Centavos de gorjeta (gorjeta não entra no adiantamento)
+        percentual: Fração paga (ex.: 0.6)
+        desconto: Desconto fixo em centavos (ex.: 35)
+
+    Returns:
+        tuple: (valor_percentual, valor_final), ambos em centavos e nunca negativos
+    """
+    valor_percentual = aplicar_percentual(valor_total - gorjeta, percentual)
+    valor_final = valor_percentual - desconto
+    if isinstance(valor_percentual, pd.Series):
+        return valor_percentual.clip(lower=0), valor_final.clip(lower=0)
+    return max(valor_percentual, 0), max(valor_final, 0)
@@ -0,0 +1,258 @@
+"""
+Instrumentação do processamento de CSV por etapa
+
+Cada etapa (leitura, classificacao, filtro, concatenacao, pivot, merge, indice_detalhes,
+persistencia, excel) registra tempo, linhas de entrada/saída e pico de memória (tracemalloc,
+opcional, e RSS máximo do processo). Uma execução acumula as etapas e, ao
+terminar, publica o resumo nos destinos configurados (CSV_INSTRUMENTACAO).
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from config import Config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ETAPAS = ['leitura', 'classificacao', 'filtro', 'concatenacao', 'pivot', 'merge', 'indice_detalhes', 'persistencia', 'excel']
+
+BYTES_POR_MB = 1024 * 1024
+
+
+def _pico_rss_mb():
+    """RSS máximo do processo até agora, em MB (None se indisponível)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (BYTES_POR_MB if os.uname().sysname == 'Darwin' else 1024), 1)
+
+
+class MedicaoEtapa:
+    """Acumulado de uma etapa: pode ser medida várias vezes (ex.: uma vez por bloco)"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.chamadas = 0
+        self.segundos = 0.0
+        self.linhas_entrada = 0
+        self.linhas_saida = 0
+        self.pico_tracemalloc = 0
+        self.pico_rss_mb = None
+
+    def para_dict(self):
+        return {
+            'etapa': self.nome,
+            'chamadas': self.chamadas,
+            'segundos': round(self.segundos, 4),
+            'linhas_entrada': self.linhas_entrada,
+            'linhas_saida': self.linhas_saida,
+            'pico_tracemalloc_mb': round(self.pico_tracemalloc / BYTES_POR_MB, 1) if self.pico_tracemalloc else None,
+            'pico_rss_mb': self.pico_rss_mb,
+        }
+
+
+class _Medida:
+    """Objeto entregue ao bloco `with`: quem mede informa as linhas que saíram"""
+
+    def __init__(self, linhas_entrada):
+        self.linhas_entrada = linhas_entrada or 0
+        self.linhas_saida = None
+        self.pico = 0
+
+
+class Instrumentacao:
+    """
+    Coleta as medições de uma execução do pipeline
+
+    Uso:
+        with instrumentacao.execucao('upload'):
+            with instrumentacao.etapa('leitura') as medida:
+                df = ...
+                medida.linhas_saida = len(df)
+
+    Execuções aninhadas fazem parte da mais externa; só ela publica nos destinos.
+    """
+
+    def __init__(self, destinos=None, tracemalloc_ativo=None):
+        self.destinos = destinos if destinos is not None else destinos_configurados()
+        self.tracemalloc_ativo = Config.CSV_TRACEMALLOC if tracemalloc_ativo is None else tracemalloc_ativo
+        self.nome = None
+        self.medicoes = {}
+        self._profundidade = 0
+        self._pilha = []
+        self._inicio = None
+        self._fim = None
+        self._iniciado_em = None
+        self._parou_tracemalloc = False
+
+    @contextmanager
+    def execucao(self, nome):
+        """Delimita uma execução: a mais externa zera as medições e publica o resumo ao final"""
+        externa = self._profundidade == 0
+        if externa:
+            self.nome = nome
+            self.medicoes = {}
+            self._inicio = time.perf_counter()
+            self._fim = None
+            self._iniciado_em = datetime.now().isoformat(timespec='seconds')
+            if self.tracemalloc_ativo and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._parou_tracemalloc = True
+        self._profundidade += 1
+        try:
+            yield self
+        finally:
+            self._profundidade -= 1
+            if externa:
+                self._fim = time.perf_counter()
+                if self._parou_tracemalloc:
+                    tracemalloc.stop()
+                    self._parou_tracemalloc = False
+                self.publicar()
+
+    @contextmanager
+    def etapa(self, nome, linhas_entrada=None):
+        """Mede um trecho e acumula na etapa `nome`"""
+        medida = _Medida(linhas_entrada)
+        rastrear = tracemalloc.is_tracing()
+        if rastrear:
+            # O pico de quem está em volta é guardado antes de zerar o contador para esta etapa
+            if self._pilha:
+                self._pilha[-1].pico = max(self._pilha[-1].pico, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._pilha.append(medida)
+        inicio = time.perf_counter()
+        try:
+            yield medida
+        finally:
+            decorrido = time.perf_counter() - inicio
+            self._pilha.pop()
+            if rastrear and tracemalloc.is_tracing():
+                medida.pico = max(medida.pico, tracemalloc.get_traced_memory()[1])
+                if self._pilha:
+                    self._pilha[-1].pico = max(self._pilha[-1].pico, medida.pico)
+
+            medicao = self.medicoes.setdefault(nome, MedicaoEtapa(nome))
+            medicao.chamadas += 1
+            medicao.segundos += decorrido
+            medicao.linhas_entrada += medida.linhas_entrada
+            medicao.linhas_saida += medida.linhas_saida if medida.linhas_saida is not None else medida.linhas_entrada
+            medicao.pico_tracemalloc = max(medicao.pico_tracemalloc, medida.pico)
+            medicao.pico_rss_mb = _pico_rss_mb()
+
+    def incorporar(self, medicoes):
+        """Soma medições feitas em outro processo (ex.: workers do pool) às desta execução"""
+        for nome, outra in medicoes.items():
+            medicao = self.medicoes.setdefault(nome, MedicaoEtapa(nome))
+            medicao.chamadas += outra.chamadas
+            medicao.segundos += outra.segundos
+            medicao.linhas_entrada += outra.linhas_entrada
+            medicao.linhas_saida += outra.linhas_saida
+            medicao.pico_tracemalloc = max(medicao.pico_tracemalloc, outra.pico_tracemalloc)
+            medicao.pico_rss_mb = max(filter(None, [medicao.pico_rss_mb, outra.pico_rss_mb]), default=None)
+
+    def resumo(self):
+        """Medições da execução atual em formato serializável (JSON)"""
+        ordem = {nome: i for i, nome in enumerate(ETAPAS)}
+        etapas = sorted(self.medicoes.values(), key=lambda m: ordem.get(m.nome, len(ETAPAS)))
+        return {
+            'execucao': self.nome,
+            'iniciado_em': self._iniciado_em,
+            'segundos_total': round((self._fim or time.perf_counter()) - self._inicio, 4) if self._inicio else None,
+            'tracemalloc': self.tracemalloc_ativo,
+            'pico_rss_mb': _pico_rss_mb(),
+            'pid': os.getpid(),
+            'etapas': [m.para_dict() for m in etapas],
+        }
+
+    def publicar(self):
+        """Envia o resumo a cada destino (falha de um destino não interrompe o processamento)"""
+        if not self.destinos or not self.medicoes:
+            return
+        resumo = self.resumo()
+        for destino in self.destinos:
+            try:
+                destino.registrar(resumo)
+            except Exception as e:
+                print(f"⚠️ Erro ao publicar instrumentação em {type(destino).__name__}: {e}")
+
+
+# ==================== DESTINOS ====================
+
+class DestinoLog:
+    """Imprime uma linha por etapa no log da aplicação"""
+
+    def registrar(self, resumo):
+        print(f"⏱️  Instrumentação ({resumo['execucao']}): {resumo['segundos_total']}s no total")
+        for etapa in resumo['etapas']:
+            memoria = f", pico tracemalloc {etapa['pico_tracemalloc_mb']} MB" if etapa['pico_tracemalloc_mb'] else ""
+            print(f"   {etapa['etapa']:<15} {etapa['segundos']:>9.3f}s  "
+                  f"{etapa['linhas_entrada']:>10} → {etapa['linhas_saida']:<10} linhas{memoria}")
+
+
+class DestinoArquivoJSON:
+    """Acrescenta cada resumo como uma linha JSON (JSON Lines) num arquivo"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def registrar(self, resumo):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        with self._lock, open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(resumo, ensure_ascii=False) + "\n")
+
+
+class RegistroMetricas:
+    """
+    Métricas em memória do processo: totais por etapa e os últimos resumos
+
+    Consultável por outras partes da aplicação (ex.: uma rota de diagnóstico) via registro_metricas.
+    """
+
+    MAX_RESUMOS = 50
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ultimos = []
+        self.por_etapa = {}
+
+    def registrar(self, resumo):
+        with self._lock:
+            self.ultimos = (self.ultimos + [resumo])[-self.MAX_RESUMOS:]
+            for etapa in resumo['etapas']:
+                total = self.por_etapa.setdefault(etapa['etapa'], {'execucoes': 0, 'segundos': 0.0, 'linhas': 0, 'max_segundos': 0.0})
+                total['execucoes'] += 1
+                total['segundos'] += etapa['segundos']
+                total['linhas'] += etapa['linhas_entrada']
+                total['max_segundos'] = max(total['max_segundos'], etapa['segundos'])
+
+    def snapshot(self):
+        with self._lock:
+            return {'por_etapa': {k: dict(v) for k, v in self.por_etapa.items()}, 'ultimos': list(self.ultimos)}
+
+
+registro_metricas = RegistroMetricas()
+
+
+def destinos_configurados():
+    """Destinos de CSV_INSTRUMENTACAO ('log', 'json', 'metricas', separados por vírgula; vazio desativa)"""
+    destinos = []
+    for nome in filter(None, (n.strip().lower() for n in Config.CSV_INSTRUMENTACAO.split(','))):
+        if nome == 'log':
+            destinos.append(DestinoLog())
+        elif nome == 'json':
+            destinos.append(DestinoArquivoJSON(Config.CSV_INSTRUMENTACAO_ARQUIVO))
+        elif nome == 'metricas':
+            destinos.append(registro_metricas)
+        else:
+            print(f"⚠️ Destino de instrumentação desconhecido: {nome}")
+    return destinos
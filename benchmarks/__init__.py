@@ -0,0 +1,4 @@
+"""
+Benchmarks do pipeline de processamento de CSV
+Executar a partir da raiz do projeto, ex.: python -m benchmarks.bench_pracas
+"""
@@ -0,0 +1,118 @@
+"""
+Benchmark do cruzamento solicitações x entregadores por CPF
+
+Compara o join antigo (REPLACE aninhado sobre o cpf das duas tabelas, sem índice
+possível) com o join pela coluna indexada cpf_norm, num SQLite em memória, e
+confere que os pares encontrados são os mesmos. O join antigo é um nested loop
+completo (solicitações x entregadores avaliações do REPLACE): com --so-indexado
+mede só o join novo, para tamanhos de produção (ex.: 50000 20000).
+
+Uso:
+    python -m benchmarks.bench_cpf_join [solicitacoes entregadores] [--so-indexado]
+"""
+import sys
+import time
+import sqlite3
+import numpy as np
+from app.models.database import normalizar_cpf
+
+PADRAO = (5_000, 2_000)
+REPETICOES = 3
+
+JOIN_REPLACE = """
+    SELECT s.id, e.id_da_pessoa_entregadora
+    FROM solicitacoes_adiantamento s
+    LEFT JOIN entregadores e
+        ON REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
+            LTRIM(RTRIM(COALESCE(s.cpf, ''))),
+            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '') =
+        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
+            LTRIM(RTRIM(COALESCE(e.cpf, ''))),
+            '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', '')
+    ORDER BY s.id
+"""
+
+JOIN_CPF_NORM = """
+    SELECT s.id, e.id_da_pessoa_entregadora
+    FROM solicitacoes_adiantamento s
+    LEFT JOIN entregadores e ON s.cpf_norm = e.cpf_norm
+    ORDER BY s.id
+"""
+
+
+def _formatar(cpf, estilo):
+    """CPF em formatos variados, como chegam do formulário e das planilhas"""
+    if estilo == 0:
+        return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+    if estilo == 1:
+        return f" {cpf} "
+    return cpf
+
+
+def montar_banco(solicitacoes, entregadores, seed=42):
+    """SQLite em memória com as duas tabelas, cpf_norm preenchido e indexado"""
+    rng = np.random.default_rng(seed)
+    cpfs = [f"{n:011d}" for n in rng.choice(10**11, size=entregadores, replace=False)]
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE entregadores (id_da_pessoa_entregadora TEXT PRIMARY KEY, cpf TEXT, cpf_norm TEXT)")
+    conn.execute("CREATE TABLE solicitacoes_adiantamento (id INTEGER PRIMARY KEY, cpf TEXT, cpf_norm TEXT)")
+
+    linhas_entregadores = [
+        (f"id-{i}", _formatar(cpf, i % 3)) for i, cpf in enumerate(cpfs)
+    ]
+    conn.executemany(
+        "INSERT INTO entregadores VALUES (?, ?, ?)",
+        [(id_, cpf, normalizar_cpf(cpf)) for id_, cpf in linhas_entregadores]
+    )
+
+    # ~80% das solicitações são de entregadores cadastrados
+    linhas_solicitacoes = []
+    for i in range(solicitacoes):
+        if rng.random() < 0.8:
+            cpf = cpfs[rng.integers(0, entregadores)]
+        else:
+            cpf = f"{rng.integers(0, 10**11):011d}"
+        linhas_solicitacoes.append((i + 1, _formatar(cpf, rng.integers(0, 3))))
+    conn.executemany(
+        "INSERT INTO solicitacoes_adiantamento VALUES (?, ?, ?)",
+        [(id_, cpf, normalizar_cpf(cpf)) for id_, cpf in linhas_solicitacoes]
+    )
+
+    conn.execute("CREATE INDEX idx_entregadores_cpf_norm ON entregadores(cpf_norm)")
+    conn.execute("CREATE INDEX idx_solicitacoes_adiantamento_cpf_norm ON solicitacoes_adiantamento(cpf_norm)")
+    conn.commit()
+    return conn
+
+
+def medir(conn, sql):
+    """Menor tempo entre REPETICOES execuções"""
+    melhor = None
+    resultado = None
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        resultado = conn.execute(sql).fetchall()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+def main(solicitacoes, entregadores, so_indexado=False):
+    conn = montar_banco(solicitacoes, entregadores)
+    print(f"{solicitacoes} solicitações x {entregadores} entregadores")
+
+    t_novo, novo = medir(conn, JOIN_CPF_NORM)
+    print(f"  cpf_norm indexado: {t_novo:.3f}s")
+    if so_indexado:
+        return
+    t_antigo, antigo = medir(conn, JOIN_REPLACE)
+    print(f"  REPLACE aninhado:  {t_antigo:.3f}s ({t_antigo / t_novo:.0f}x mais lento)")
+
+    if antigo != novo:
+        raise SystemExit("Pares divergentes entre os dois joins")
+    print("  pares idênticos")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:] if not a.startswith('--')]
+    main(*(args if len(args) == 2 else PADRAO), so_indexado='--so-indexado' in sys.argv)
@@ -0,0 +1,189 @@
+"""
+Benchmark do pipeline de ProcessadorCSVService, etapa por etapa
+
+Gera exportações sintéticas (benchmarks.gerador_csv) e mede separadamente:
+    leitura       ler_csv_em_chunks (detecção de formato + parser com o esquema de leitura)
+    classificacao _preparar_chunk em cada bloco (datas, centavos e tipo_valor) + concatenação
+    filtro        _filtrar_por_data para um dia do período
+    pivot         AgregadoEntregadores.adicionar + somas_por_tipo
+    pracas        resumo de praças/subpraças por entregador (_resumir_pares)
+    excel         gerar_relatorio_excel do consolidado
+
+O resultado sai em JSON (stdout ou --saida). Com --comparar, as etapas são
+confrontadas com um JSON anterior e o comando falha se alguma ficar mais lenta
+que a tolerância.
+
+Uso:
+    python -m benchmarks.bench_pipeline [--tamanhos 10000 1000000 10000000] [--saida resultado.json]
+    python -m benchmarks.bench_pipeline --tamanhos 10000 --comparar resultado.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import pandas as pd
+from app.services.processador_csv_service import (
+    ProcessadorCSVService, AgregadoEntregadores, CHAVE_ENTREGADOR, VERSAO_PROCESSAMENTO
+)
+from benchmarks.gerador_csv import gerar_csv, ENCODINGS
+
+TAMANHOS_PADRAO = [10_000, 1_000_000, 10_000_000]
+DATA_INICIAL = date(2025, 1, 6)
+DIAS = 7
+# Etapas mais curtas que isto não entram na comparação (ruído de medição)
+MINIMO_COMPARACAO = 0.05
+
+
+def _log(mensagem):
+    print(mensagem, file=sys.stderr)
+
+
+class _Cronometro:
+    """Mede cada etapa (menor tempo entre as repetições) com a saída do serviço silenciada"""
+
+    def __init__(self, repeticoes):
+        self.repeticoes = repeticoes
+        self.tempos = {}
+
+    def medir(self, etapa, funcao):
+        resultado = None
+        for _ in range(self.repeticoes):
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                resultado = funcao()
+                decorrido = time.perf_counter() - inicio
+            self.tempos[etapa] = min(self.tempos.get(etapa, decorrido), decorrido)
+        return resultado
+
+
+def medir_pipeline(processador, caminho, linhas, pasta, repeticoes=1):
+    """Roda as etapas sobre um arquivo e devolve {etapa: segundos} e o número de entregadores"""
+    cronometro = _Cronometro(repeticoes)
+    dia = DATA_INICIAL + timedelta(days=DIAS // 2)
+
+    blocos = cronometro.medir("leitura", lambda: list(processador.ler_csv_em_chunks(caminho)))
+    # _preparar_chunk altera o bloco: cada repetição parte de cópias
+    df = cronometro.medir("classificacao", lambda: processador._concatenar_blocos(
+        [processador._preparar_chunk(bloco.copy()) for bloco in blocos]
+    ))
+    del blocos
+    cronometro.medir("filtro", lambda: processador._filtrar_por_data(df, dia))
+
+    def pivot():
+        agregado = AgregadoEntregadores()
+        agregado.adicionar(df)
+        agregado.somas_por_tipo()
+        return agregado
+    agregado = cronometro.medir("pivot", pivot)
+
+    cronometro.medir("pracas", lambda: pd.merge(
+        processador._resumir_pares(agregado.pares("subpraca"), "subpraca", "subpracas", "qtd_subpracas"),
+        processador._resumir_pares(agregado.pares("praca"), "praca", "pracas", "qtd_pracas"),
+        on=CHAVE_ENTREGADOR,
+        how="outer"
+    ))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        consolidado = processador.consolidar_agregado(agregado)
+    cronometro.medir("excel", lambda: processador.gerar_relatorio_excel(
+        consolidado, os.path.join(pasta, f"relatorio_{linhas}.xlsx")
+    ))
+
+    return {
+        "etapas": {
+            etapa: {"segundos": round(segundos, 4), "linhas_por_segundo": round(linhas / segundos) if segundos else None}
+            for etapa, segundos in cronometro.tempos.items()
+        },
+        "total_segundos": round(sum(cronometro.tempos.values()), 4),
+        "entregadores": len(consolidado),
+    }
+
+
+def comparar(resultado, referencia, tolerancia):
+    """Lista as etapas mais lentas que a referência além da tolerância (ex.: 0.2 = 20%)"""
+    anteriores = {(r["linhas"], r["arquivo"]["encoding"]): r for r in referencia.get("resultados", [])}
+    regressoes = []
+    for atual in resultado["resultados"]:
+        anterior = anteriores.get((atual["linhas"], atual["arquivo"]["encoding"]))
+        if anterior is None:
+            continue
+        for etapa, medida in atual["etapas"].items():
+            antes = anterior["etapas"].get(etapa, {}).get("segundos")
+            agora = medida["segundos"]
+            if not antes or max(antes, agora) < MINIMO_COMPARACAO:
+                continue
+            variacao = agora / antes - 1
+            _log(f"   {atual['linhas']:>10} {etapa:<14} {antes:>9.3f}s -> {agora:>9.3f}s ({variacao:+.0%})")
+            if variacao > tolerancia:
+                regressoes.append(f"{etapa} com {atual['linhas']} linhas: {antes:.3f}s -> {agora:.3f}s ({variacao:+.0%})")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do processamento de CSVs por etapa")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--encoding", choices=ENCODINGS, default='utf-8')
+    parser.add_argument("--repeticoes", type=int, default=1, help="Repetições por etapa (vale o menor tempo)")
+    parser.add_argument("--pasta", help="Pasta dos CSVs gerados (reaproveitados entre execuções); padrão: temporária")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.makedirs(pasta, exist_ok=True)
+    processador = ProcessadorCSVService(usar_cache=False, max_workers=1)
+    resultado = {
+        "versao_processamento": VERSAO_PROCESSAMENTO,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cpus": os.cpu_count(),
+        "executado_em": datetime.now().isoformat(timespec='seconds'),
+        "tamanho_chunk": processador.TAMANHO_CHUNK,
+        "resultados": [],
+    }
+
+    try:
+        for linhas in args.tamanhos:
+            caminho = os.path.join(pasta, f"pagamentos_{linhas}_{args.encoding}.csv")
+            parametros = {"linhas": linhas, "encoding": args.encoding, "dias": DIAS, "data_inicial": DATA_INICIAL}
+            _log(f"📄 Gerando {linhas} linhas ({args.encoding})...")
+            if args.pasta and os.path.exists(caminho):
+                arquivo = {"linhas": linhas, "encoding": args.encoding, "bytes": os.path.getsize(caminho)}
+            else:
+                arquivo = gerar_csv(caminho, **parametros)
+            _log(f"⏱️  Medindo {linhas} linhas...")
+            medidas = medir_pipeline(processador, caminho, linhas, pasta, args.repeticoes)
+            resultado["resultados"].append({"linhas": linhas, "arquivo": arquivo, **medidas})
+            _log("   " + ", ".join(f"{e}={m['segundos']:.3f}s" for e, m in medidas["etapas"].items()))
+    finally:
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + "\n")
+        _log(f"✅ Resultado salvo em {args.saida}")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            referencia = json.load(f)
+        _log(f"🔍 Comparando com {args.comparar} (tolerância {args.tolerancia:.0%})")
+        regressoes = comparar(resultado, referencia, args.tolerancia)
+        if regressoes:
+            raise SystemExit("❌ Regressões: " + "; ".join(regressoes))
+        _log("✅ Nenhuma regressão acima da tolerância")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark da agregação de praças/subpraças por entregador
+
+Compara a versão antiga (groupby com quatro lambdas por entregador) com
+ProcessadorCSVService._resumir_pares e confere que a saída é idêntica.
+
+Uso:
+    python -m benchmarks.bench_pracas [linhas ...]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from app.services.processador_csv_service import ProcessadorCSVService, CHAVE_ENTREGADOR
+
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+REPETICOES = 3
+
+
+def gerar_linhas(linhas, seed=42):
+    """Linhas sintéticas com ~1 entregador a cada 20 linhas e algumas praças/subpraças nulas"""
+    rng = np.random.default_rng(seed)
+    entregadores = max(linhas // 20, 1)
+    subpracas = np.array([f"SUBPRACA {i:02d}" for i in range(40)] + [None], dtype=object)
+    pracas = np.array(["Rio Barra", "Rio Zona Sul", "Rio Madureira", "Rio Campo Grande & Santa Cruz", None], dtype=object)
+    return pd.DataFrame({
+        CHAVE_ENTREGADOR: np.char.add("id-", rng.integers(0, entregadores, linhas).astype(str)),
+        "subpraca": subpracas[rng.integers(0, len(subpracas), linhas)],
+        "praca": pracas[rng.integers(0, len(pracas), linhas)],
+    })
+
+
+def sub_data_lambdas(df):
+    """Implementação anterior de consolidar_entregadores (referência)"""
+    return (
+        df.groupby(CHAVE_ENTREGADOR, as_index=False)
+        .agg(
+            subpracas=("subpraca", lambda x: " / ".join(sorted(set(x.dropna().astype(str)))) if len(x.dropna()) > 0 else ""),
+            qtd_subpracas=("subpraca", lambda x: len(set(x.dropna()))),
+            pracas=("praca", lambda x: " / ".join(sorted(set(x.dropna().astype(str)))) if len(x.dropna()) > 0 else ""),
+            qtd_pracas=("praca", lambda x: len(set(x.dropna())))
+        )
+    )
+
+
+def sub_data_vetorizado(processador, df):
+    return pd.merge(
+        processador._resumir_pares(df, "subpraca", "subpracas", "qtd_subpracas"),
+        processador._resumir_pares(df, "praca", "pracas", "qtd_pracas"),
+        on=CHAVE_ENTREGADOR,
+        how="outer"
+    )
+
+
+def medir(funcao, *args):
+    """Menor tempo entre REPETICOES execuções"""
+    melhor = None
+    resultado = None
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+def main(tamanhos):
+    processador = ProcessadorCSVService(usar_cache=False)
+    print(f"{'linhas':>10} {'lambdas (s)':>12} {'vetorizado (s)':>15} {'speedup':>8}  saída idêntica")
+    for linhas in tamanhos:
+        df = gerar_linhas(linhas)
+        t_antigo, antigo = medir(sub_data_lambdas, df)
+        t_novo, novo = medir(sub_data_vetorizado, processador, df)
+        identico = antigo.to_csv(index=False) == novo.to_csv(index=False)
+        print(f"{linhas:>10} {t_antigo:>12.3f} {t_novo:>15.3f} {t_antigo / t_novo:>7.1f}x  {'sim' if identico else 'NÃO'}")
+        if not identico:
+            raise SystemExit(f"Saída divergente com {linhas} linhas")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or TAMANHOS_PADRAO)
@@ -0,0 +1,151 @@
+"""
+Carga de envios do formulário de adiantamento (pico logo após a abertura do formulário)
+
+Várias threads gravam solicitações ao mesmo tempo, como as requisições simultâneas
+do formulário público, com uma fração de reenvios do mesmo CPF no dia. Mede
+solicitações por segundo em três modos e confere quantas ficaram gravadas por CPF:
+
+- antigo: SELECT COUNT(*) por cpf/DATE(data_envio) + INSERT, uma conexão por envio
+  (referência; reenvios simultâneos podem passar pela checagem)
+- direto: INSERT ... ON CONFLICT DO NOTHING no índice único parcial, 1 transação por envio
+- fila:   mesma gravação pela fila de gravação em lote (ADIANTAMENTO_FILA_ENABLED)
+
+Usa um banco SQLite temporário, sem tocar no banco do app; os números valem só
+para o SQLite (o PostgreSQL não foi medido).
+
+Uso:
+    python -m benchmarks.bench_solicitacoes [envios] [threads]
+"""
+import os
+import sys
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import app.models.database as database
+from app.models.database import get_db_connection, get_db_placeholder, init_db
+from app.services.solicitacao_adiantamento_service import SolicitacaoAdiantamentoService
+from config import Config
+
+PADRAO = (5_000, 16)
+# Fração dos envios que repete um CPF que já enviou no dia
+FRACAO_REENVIOS = 0.1
+# Dia fictício das solicitações da carga (removidas ao final)
+DATA_CARGA = datetime(2000, 1, 1, 12, 0, 0)
+
+
+def gerar_envios(envios):
+    """Campos do formulário: CPFs distintos e, em seguida, reenvios de parte deles"""
+    distintos = int(envios * (1 - FRACAO_REENVIOS))
+    formularios = [
+        {
+            'email': f"carga{i}@exemplo.com",
+            'nome': f"Entregador {i}",
+            'cpf': f"{i:011d}",
+            'praca': f"Praça {i % 12}",
+            'valor': '100.00',
+            'concorda': 'Sim',
+        }
+        for i in range(distintos)
+    ]
+    reenvios = [formularios[i % distintos] for i in range(envios - distintos)]
+    # Intercala os reenvios para que cheguem junto com o envio original
+    intercalados = []
+    for i, formulario in enumerate(formularios):
+        intercalados.append(formulario)
+        if i < len(reenvios):
+            intercalados.append(reenvios[i])
+    return intercalados, distintos
+
+
+def registrar_antigo(dados):
+    """Caminho anterior do /adiantamento/enviar: SELECT COUNT + INSERT, uma conexão por envio"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        p = get_db_placeholder(conn)
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM solicitacoes_adiantamento
+            WHERE cpf = {p} AND DATE(data_envio) = {p}
+        """, (dados['cpf'], DATA_CARGA.strftime('%Y-%m-%d')))
+        if cursor.fetchone()[0] > 0:
+            return False
+        cursor.execute(f"""
+            INSERT INTO solicitacoes_adiantamento
+            (email, nome, cpf, cpf_norm, praca, valor_informado, concorda, data_envio)
+            VALUES ({', '.join([p] * 8)})
+        """, (
+            dados['email'], dados['nome'], dados['cpf'], dados['cpf'], dados['praca'],
+            dados['valor'], dados['concorda'], DATA_CARGA.strftime('%Y-%m-%d %H:%M:%S')
+        ))
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+
+def registrar_novo(dados):
+    return SolicitacaoAdiantamentoService.registrar(dados, agora=DATA_CARGA)
+
+
+def limpar():
+    """Remove as solicitações da carga"""
+    conn = get_db_connection()
+    try:
+        p = get_db_placeholder(conn)
+        conn.cursor().execute(
+            f"DELETE FROM solicitacoes_adiantamento WHERE email LIKE {p} AND DATE(data_envio) = {p}",
+            ('carga%@exemplo.com', DATA_CARGA.strftime('%Y-%m-%d'))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def contar_gravadas():
+    """(solicitações gravadas, CPFs distintos) da carga"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        p = get_db_placeholder(conn)
+        cursor.execute(f"""
+            SELECT COUNT(*), COUNT(DISTINCT cpf_norm) FROM solicitacoes_adiantamento
+            WHERE email LIKE {p} AND DATE(data_envio) = {p}
+        """, ('carga%@exemplo.com', DATA_CARGA.strftime('%Y-%m-%d')))
+        return tuple(cursor.fetchone())
+    finally:
+        conn.close()
+
+
+def medir(registrar, envios, threads):
+    """Envia todos os formulários por `threads` threads; retorna (segundos, aceitos)"""
+    limpar()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # None (ainda na fila após o timeout) não conta como aceito
+        aceitos = sum(1 for gravada in executor.map(registrar, envios) if gravada)
+    return time.perf_counter() - inicio, aceitos
+
+
+def main(total, threads):
+    database.USE_POSTGRESQL = False
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix='bench_solicitacoes_'), 'carga.db')
+    init_db()
+
+    envios, distintos = gerar_envios(total)
+    print(f"SQLite ({database.DB_PATH}): {len(envios)} envios ({distintos} CPFs) em {threads} threads")
+    print(f"{'modo':>8} {'tempo (s)':>10} {'envios/s':>9} {'aceitos':>8} {'gravadas':>9}  1 por CPF")
+
+    modos = [('antigo', False, registrar_antigo), ('direto', False, registrar_novo), ('fila', True, registrar_novo)]
+    for nome, fila, registrar in modos:
+        Config.ADIANTAMENTO_FILA_ENABLED = fila
+        segundos, aceitos = medir(registrar, envios, threads)
+        gravadas, cpfs = contar_gravadas()
+        print(f"{nome:>8} {segundos:>10.2f} {len(envios) / segundos:>9.0f} {aceitos:>8} {gravadas:>9}  "
+              f"{'sim' if gravadas == cpfs == distintos else 'NÃO'}")
+        limpar()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args if len(args) == 2 else PADRAO))
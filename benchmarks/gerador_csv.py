@@ -0,0 +1,180 @@
+"""
+Gerador de CSVs sintéticos no formato das exportações da plataforma
+
+Produz arquivos separados por ';', com valores no formato brasileiro ("1.234,56"),
+nomes/praças acentuados (para exercitar utf-8 e latin-1), colunas extras que o
+processador não lê e uma mistura configurável de descrições.
+
+Uso:
+    python -m benchmarks.gerador_csv saida.csv --linhas 1000000 --encoding latin-1
+"""
+import argparse
+import os
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+ENCODINGS = ['utf-8', 'utf-8-sig', 'latin-1']
+
+# Descrição -> peso relativo (None = descrição vazia na exportação)
+MISTURA_DESCRICOES = {
+    "Corridas concluidas": 0.55,
+    "Gorjeta": 0.12,
+    "Valor por hora online": 0.10,
+    "Promocao Entregador - Meta diaria": 0.07,
+    "Tempo de espera na origem": 0.05,
+    "route_with_occurrence": 0.03,
+    "Ajuste manual": 0.06,
+    None: 0.02,
+}
+
+PRACAS_BASE = ["Rio Barra", "Rio Zona Sul", "São Gonçalo", "Niterói", "Rio Madureira",
+               "Rio Campo Grande & Santa Cruz", "Duque de Caxias", "Nova Iguaçu"]
+PERIODOS_BASE = ["ALMOCO", "JANTAR", "MADRUGADA", "MANHA", "TARDE", "CEIA"]
+NOMES = ["João", "Conceição", "André", "Lúcia", "Sebastião", "Márcia", "Luís", "Ângela", "Tânia", "Antônio"]
+SOBRENOMES = ["da Silva", "Araújo", "Gonçalves", "Simões", "Magalhães", "Conceição", "Assunção", "Peçanha"]
+
+# Linhas geradas e escritas por vez (o arquivo nunca fica inteiro em memória)
+LINHAS_POR_BLOCO = 500_000
+
+
+def _lista(base, quantidade, prefixo):
+    """Os primeiros itens de `base`, completados com nomes numerados se `quantidade` for maior"""
+    return (base + [f"{prefixo} {i:03d}" for i in range(len(base), quantidade)])[:quantidade]
+
+
+def _formatar_reais(centavos):
+    """Centavos int64 -> texto no formato brasileiro ("-1.234,56"); valores abaixo de R$ 1.000.000"""
+    sinal = np.where(centavos < 0, "-", "")
+    absoluto = np.abs(centavos)
+    inteiro = absoluto // 100
+    milhar = pd.Series(inteiro // 1000)
+    resto = pd.Series(inteiro % 1000).astype(str)
+    reais = np.where(milhar > 0, milhar.astype(str) + "." + resto.str.zfill(3), resto)
+    return sinal + reais + "," + pd.Series(absoluto % 100).astype(str).str.zfill(2)
+
+
+def _entregadores(quantidade, rng):
+    """ID, nome e CPF formatado de cada entregador"""
+    ids = np.array([f"{i:08x}-{h:04x}-4bd1-9c2e-{i * 7919 % 16 ** 12:012x}"
+                    for i, h in zip(range(quantidade), rng.integers(0, 16 ** 4, quantidade))], dtype=object)
+    nomes = np.array([f"{NOMES[i % len(NOMES)]} {SOBRENOMES[i // len(NOMES) % len(SOBRENOMES)]} {i}"
+                      for i in range(quantidade)], dtype=object)
+    digitos = rng.integers(0, 10 ** 11, quantidade)
+    cpfs = np.array([f"{d:011d}"[:3] + "." + f"{d:011d}"[3:6] + "." + f"{d:011d}"[6:9] + "-" + f"{d:011d}"[9:]
+                     for d in digitos], dtype=object)
+    return ids, nomes, cpfs
+
+
+def gerar_csv(caminho, linhas, entregadores=None, pracas=5, subpracas_por_praca=6, periodos=3, dias=7,
+              encoding='utf-8', descricoes=None, data_inicial=date(2025, 1, 6), seed=42):
+    """
+    Gera uma exportação sintética
+
+    Args:
+        caminho: Arquivo de saída
+        linhas: Quantidade de linhas de dados
+        entregadores: Quantidade de entregadores (padrão: 1 a cada 50 linhas)
+        pracas: Quantidade de praças
+        subpracas_por_praca: Subpraças de cada praça
+        periodos: Quantidade de períodos (ALMOCO, JANTAR, ...)
+        dias: Dias distintos do período de referência, a partir de data_inicial
+        encoding: Um de ENCODINGS
+        descricoes: Mistura {descrição: peso} (padrão: MISTURA_DESCRICOES)
+        seed: Semente (mesmos argumentos -> mesmo arquivo)
+
+    Returns:
+        dict: parâmetros usados e tamanho do arquivo em bytes
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Encoding não suportado: {encoding}")
+    rng = np.random.default_rng(seed)
+    entregadores = entregadores or max(linhas // 50, 1)
+    descricoes = descricoes or MISTURA_DESCRICOES
+
+    ids, nomes, cpfs = _entregadores(entregadores, rng)
+    nomes_pracas = np.array(_lista(PRACAS_BASE, pracas, "Praça"), dtype=object)
+    nomes_periodos = np.array(_lista(PERIODOS_BASE, periodos, "PERIODO"), dtype=object)
+    datas = np.array([(data_inicial + timedelta(days=d)).isoformat() for d in range(dias)], dtype=object)
+    textos = np.array(list(descricoes), dtype=object)
+    pesos = np.array(list(descricoes.values()), dtype=float)
+    pesos /= pesos.sum()
+    # Cada entregador trabalha numa praça fixa (às vezes com praça/subpraça em branco na exportação)
+    praca_entregador = rng.integers(0, pracas, entregadores)
+
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    escritas = 0
+    while escritas < linhas:
+        n = min(LINHAS_POR_BLOCO, linhas - escritas)
+        quem = rng.integers(0, entregadores, n)
+        praca = praca_entregador[quem]
+        subpraca = np.char.add(
+            np.char.add("Sub ", nomes_pracas[praca].astype(str)),
+            np.char.add(" ", rng.integers(1, subpracas_por_praca + 1, n).astype(str))
+        ).astype(object)
+        em_branco = rng.random(n) < 0.01
+        subpraca[em_branco] = None
+        descricao = textos[rng.choice(len(textos), n, p=pesos)]
+        # Ajustes podem ser negativos; demais valores entre R$ 0,50 e R$ 2.500,00
+        centavos = rng.integers(50, 250_000, n)
+        centavos = np.where((descricao == "Ajuste manual") & (rng.random(n) < 0.3), -centavos, centavos)
+
+        bloco = pd.DataFrame({
+            "id_da_transacao": np.arange(escritas, escritas + n),
+            "data_do_periodo_de_referencia": datas[rng.integers(0, dias, n)],
+            "periodo": nomes_periodos[rng.integers(0, periodos, n)],
+            "id_da_pessoa_entregadora": ids[quem],
+            "recebedor": nomes[quem],
+            "cpf": cpfs[quem],
+            "praca": np.where(em_branco, None, nomes_pracas[praca]),
+            "subpraca": subpraca,
+            "descricao": descricao,
+            "valor": _formatar_reais(centavos),
+            "observacao": "",
+        })
+        bloco.to_csv(caminho, sep=';', index=False, mode='a', header=escritas == 0,
+                     encoding=encoding if escritas == 0 else encoding.replace('-sig', ''))
+        escritas += n
+
+    return {
+        "linhas": linhas,
+        "entregadores": entregadores,
+        "pracas": pracas,
+        "periodos": periodos,
+        "dias": dias,
+        "encoding": encoding,
+        "bytes": os.path.getsize(caminho),
+    }
+
+
+def _mistura(texto):
+    """'Gorjeta=0.2,Corridas concluidas=0.8' -> {descrição: peso}"""
+    mistura = {}
+    for item in texto.split(','):
+        descricao, _, peso = item.rpartition('=')
+        mistura[descricao.strip() or None] = float(peso)
+    return mistura
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um CSV sintético de pagamentos de entregadores")
+    parser.add_argument("saida")
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--entregadores", type=int)
+    parser.add_argument("--pracas", type=int, default=5)
+    parser.add_argument("--periodos", type=int, default=3)
+    parser.add_argument("--dias", type=int, default=7)
+    parser.add_argument("--encoding", choices=ENCODINGS, default='utf-8')
+    parser.add_argument("--descricoes", type=_mistura, help="Mistura 'descrição=peso,...' (vazio antes do = é descrição nula)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    info = gerar_csv(args.saida, args.linhas, entregadores=args.entregadores, pracas=args.pracas,
+                     periodos=args.periodos, dias=args.dias, encoding=args.encoding,
+                     descricoes=args.descricoes, seed=args.seed)
+    print(f"✅ {args.saida}: {info['linhas']} linhas, {info['entregadores']} entregadores, {info['bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Paridade entre os motores de processamento (pandas x arrow)
+
+O motor pandas é a referência. Para cada cenário, os dois motores processam
+os mesmos arquivos e o consolidado_geral, o índice de detalhes e as somas por
+dia precisam sair idênticos. O comando falha na primeira divergência e imprime
+o tempo de cada motor.
+
+Cenários: exportações sintéticas (utf-8, utf-8-sig, latin-1, vários blocos do
+leitor Arrow), arquivo separado por vírgula, arquivo com linhas problemáticas
+(nulos, datas fora do formato, valores negativos, aspas), arquivo utf-8 com
+trecho latin-1 no fim, filtro de data e filtro de entregadores.
+
+Uso:
+    python -m benchmarks.paridade_motores [--linhas 200000]
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+import pandas as pd
+import app.services.motor_arrow_service as motor_arrow
+from app.services.processador_csv_service import ProcessadorCSVService
+from benchmarks.gerador_csv import gerar_csv
+
+MOTORES = ['pandas', 'arrow']
+
+CABECALHO = "id_da_pessoa_entregadora;recebedor;cpf;subpraca;praca;valor;descricao;periodo;data_do_periodo_de_referencia\n"
+LINHAS_PROBLEMATICAS = [
+    "id1;Ana;111.111.111-11;Sub A;Praça 1;1.234,56;Corridas concluidas;ALMOCO;2025-01-06",
+    "id1;Ana;111.111.111-11;;Praça 1;-10,05;Ajuste manual;ALMOCO;2025-01-06",
+    "id1;Ana Maria;111.111.111-11;Sub B;;0,005;GORJETA;JANTAR;06/01/2025",
+    ";Sem Id;;Sub A;Praça 1;50,00;Gorjeta;ALMOCO;2025-01-07",
+    "id2;;222.222.222-22;Sub A;Praça 2;NA;Valor por hora online;;2025-01-07",
+    "id2;Bruno;222.222.222-22;\"Sub; com separador\";Praça 2; 12,50 ;;MADRUGADA;",
+    "id3;Carla;333.333.333-33;Sub C;Praça 2;99,99;route_with_occurrence;ALMOCO;2025-01-08 00:00:00",
+    "id3;Carla;333.333.333-33;Sub C;Praça 2;1,00;Promocao entregador;null;data inválida",
+]
+
+
+def _escrever_arquivos(pasta, linhas):
+    """Arquivos de cada cenário: {nome: [caminhos]}"""
+    cenarios = {}
+    for encoding in ('utf-8', 'utf-8-sig', 'latin-1'):
+        caminho = os.path.join(pasta, f"sintetico_{encoding}.csv")
+        gerar_csv(caminho, linhas, encoding=encoding, seed=len(encoding))
+        cenarios[f"sintetico {encoding}"] = [caminho]
+
+    problematico = os.path.join(pasta, "problematico.csv")
+    with open(problematico, 'w', encoding='utf-8') as f:
+        f.write(CABECALHO + "\n".join(LINHAS_PROBLEMATICAS) + "\n")
+    cenarios["linhas problemáticas"] = [problematico]
+
+    virgula = os.path.join(pasta, "virgula.csv")
+    pd.read_csv(cenarios["sintetico utf-8"][0], sep=';', dtype=str, nrows=5000).to_csv(virgula, sep=',', index=False)
+    cenarios["separador vírgula"] = [virgula]
+
+    # Amostra inicial em UTF-8 e cauda em latin-1: o motor arrow devolve o arquivo ao pandas
+    misto = os.path.join(pasta, "misto.csv")
+    with open(misto, 'wb') as f:
+        f.write((CABECALHO + "\n".join(LINHAS_PROBLEMATICAS[:2] * 4000) + "\n").encode('utf-8'))
+        f.write("id9;José;999.999.999-99;Sub Ç;Praça 9;5,00;Gorjeta;ALMOCO;2025-01-06\n".encode('latin-1'))
+    cenarios["encoding misto"] = [misto]
+
+    cenarios["vários arquivos"] = [c for nome, arquivos in cenarios.items() if nome.startswith("sintetico") for c in arquivos]
+    return cenarios
+
+
+def _normalizar(detalhes):
+    """NaN != NaN: troca por um marcador para comparar os índices de detalhes"""
+    def valor(v):
+        if isinstance(v, list):
+            return [valor(x) for x in v]
+        return "<NaN>" if isinstance(v, float) and math.isnan(v) else v
+    return {k: {c: valor(v) for c, v in d.items()} for k, d in detalhes.items()}
+
+
+def _somas_por_dia(processador, arquivos):
+    """Somas por (id, recebedor, dia, tipo) de cada arquivo, em ordem canônica"""
+    partes = []
+    for arquivo in arquivos:
+        agregado, _ = processador.agregar_csv(arquivo, por_dia=True)
+        somas, pares = agregado.exportar()
+        partes.append((somas.sort_values(list(somas.columns[:-1])).reset_index(drop=True), pares))
+    return partes
+
+
+def comparar_cenario(nome, arquivos, **filtros):
+    resultados, tempos = {}, {}
+    for motor in MOTORES:
+        processador = ProcessadorCSVService(usar_cache=False, max_workers=1, motor=motor)
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultado = processador.processar_multiplos_csv(arquivos, streaming=True, filtrar_por_cadastrados=False, **filtros)
+            tempos[motor] = time.perf_counter() - inicio
+            resultado['somas_por_dia'] = _somas_por_dia(processador, arquivos) if not filtros else []
+        resultados[motor] = resultado
+
+    try:
+        _conferir(resultados['pandas'], resultados['arrow'])
+    except AssertionError as e:
+        raise AssertionError(f"{nome}: {e}")
+    print(f"✅ {nome:<28} {len(resultados['pandas']['consolidado_geral']):>7} entregadores   "
+          f"pandas {tempos['pandas']:7.3f}s   arrow {tempos['arrow']:7.3f}s")
+
+
+def _conferir(referencia, arrow):
+    pd.testing.assert_frame_equal(referencia['consolidado_geral'], arrow['consolidado_geral'])
+    if _normalizar(referencia['detalhes_por_entregador']) != _normalizar(arrow['detalhes_por_entregador']):
+        raise AssertionError("índice de detalhes divergente")
+    for (somas_ref, pares_ref), (somas, pares) in zip(referencia['somas_por_dia'], arrow['somas_por_dia']):
+        pd.testing.assert_frame_equal(somas_ref, somas)
+        pd.testing.assert_frame_equal(pares_ref, pares)
+    for chave in ('total_entregadores', 'valor_total_geral', 'erros', 'arquivos_sucesso'):
+        if referencia[chave] != arrow[chave]:
+            raise AssertionError(f"{chave}: {referencia[chave]!r} != {arrow[chave]!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara os motores pandas e arrow do processamento de CSV")
+    parser.add_argument("--linhas", type=int, default=200_000, help="Linhas de cada exportação sintética")
+    args = parser.parse_args(argv)
+
+    pasta = tempfile.mkdtemp(prefix="paridade_motores_")
+    try:
+        cenarios = _escrever_arquivos(pasta, args.linhas)
+        for nome, arquivos in cenarios.items():
+            comparar_cenario(nome, arquivos)
+
+        sinteticos = cenarios["vários arquivos"]
+        comparar_cenario("filtro de data", sinteticos, data_filtro=date(2025, 1, 9))
+        ids = pd.read_csv(sinteticos[0], sep=';', usecols=['id_da_pessoa_entregadora'], nrows=1000).iloc[::3, 0].tolist()
+        comparar_cenario("filtro de entregadores", sinteticos, ids_entregadores=ids)
+
+        # Blocos pequenos no leitor Arrow: exercita a junção de somas e pares entre blocos
+        tamanho_bloco = motor_arrow.TAMANHO_BLOCO
+        motor_arrow.TAMANHO_BLOCO = 256 * 1024
+        try:
+            comparar_cenario("vários blocos do leitor", sinteticos + cenarios["linhas problemáticas"])
+        finally:
+            motor_arrow.TAMANHO_BLOCO = tamanho_bloco
+    except AssertionError as e:
+        raise SystemExit(f"❌ Motores divergem: {e}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Reenvio de exportações na consolidação semanal e em ganhos_diarios
+
+Cada cenário envia arquivos para a pasta da semana como o upload faz (nome salvo
+com prefixo de data/hora, contribuição pelo nome enviado) e grava ganhos_diarios;
+depois de cada envio, a tabela precisa ser idêntica à de uma pasta nova que
+recebeu só a versão final dos arquivos. O comando falha na primeira divergência.
+
+Cenários:
+- exportação corrigida reenviada com o mesmo nome (substitui, não soma)
+- mesmo arquivo reenviado (nada muda)
+- mesmo conteúdo enviado com outro nome (nada muda)
+- lote com o mesmo nome duas vezes (vale o último)
+
+Usa um banco SQLite temporário, sem tocar no banco do app.
+
+Uso:
+    python -m benchmarks.paridade_reenvio [--linhas 20000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+import pandas as pd
+import app.models.database as database
+from app.models.database import get_db_connection, init_db
+from app.services.consolidacao_semanal_service import ConsolidacaoSemanalService
+from app.services.ganhos_diarios_service import GanhosDiariosService, COLUNAS_TABELA
+from app.services.processador_csv_service import ProcessadorCSVService
+from app.utils.constants import FORMATO_DATA_ARQUIVO
+from benchmarks.gerador_csv import gerar_csv
+
+DIA = date(2025, 1, 6)
+OUTRO_DIA = date(2025, 1, 7)
+
+
+def _escrever_arquivos(pasta, linhas):
+    """Exportação original e corrigida do mesmo dia, e uma exportação de outro dia"""
+    arquivos = {}
+    for nome, data_inicial, seed in (('original', DIA, 1), ('corrigido', DIA, 2), ('outro_dia', OUTRO_DIA, 3)):
+        arquivos[nome] = os.path.join(pasta, f"{nome}.csv")
+        gerar_csv(arquivos[nome], linhas, dias=1, data_inicial=data_inicial, seed=seed)
+    return arquivos
+
+
+def enviar(pasta_semana, envios):
+    """
+    Salva e processa um lote como o job de upload
+
+    Args:
+        envios: [(arquivo de origem, nome enviado)]
+
+    Returns:
+        DataFrame: ganhos_diarios depois do lote (sem a pasta)
+    """
+    os.makedirs(pasta_semana, exist_ok=True)
+    caminhos, nomes = [], []
+    for origem, nome in envios:
+        base = f"{datetime.now().strftime(FORMATO_DATA_ARQUIVO)}_{nome}"
+        caminho, sufixo = os.path.join(pasta_semana, base), 1
+        while os.path.exists(caminho):
+            caminho = os.path.join(pasta_semana, f"{os.path.splitext(base)[0]}_{sufixo}.csv")
+            sufixo += 1
+        shutil.copyfile(origem, caminho)
+        caminhos.append(caminho)
+        nomes.append(nome)
+
+    processador = ProcessadorCSVService(usar_cache=False, max_workers=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = processador.atualizar_consolidacao_semanal(
+            caminhos, ConsolidacaoSemanalService(pasta_semana), nomes
+        )
+        GanhosDiariosService.salvar(pasta_semana, processador.consolidar_por_dia(resultado['agregado']))
+    return ler_ganhos()
+
+
+def ler_ganhos():
+    """ganhos_diarios em ordem canônica, sem a pasta"""
+    conn = get_db_connection()
+    try:
+        colunas = ', '.join(c for c in COLUNAS_TABELA if c != 'pasta_uploads')
+        return pd.read_sql_query(
+            f"SELECT {colunas} FROM ganhos_diarios ORDER BY id_da_pessoa_entregadora, data_referencia", conn
+        )
+    finally:
+        conn.close()
+
+
+def conferir(nome, obtido, esperado):
+    try:
+        pd.testing.assert_frame_equal(obtido, esperado)
+    except AssertionError as e:
+        total_obtido = obtido['valor_final_centavos'].sum()
+        total_esperado = esperado['valor_final_centavos'].sum()
+        raise AssertionError(f"{nome}: valor_final {total_obtido} != {total_esperado}\n{e}")
+    print(f"✅ {nome:<44} {len(obtido):>6} linhas   valor_final {obtido['valor_final_centavos'].sum() / 100:>14.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere ganhos_diarios após reenvios de exportações")
+    parser.add_argument("--linhas", type=int, default=20_000, help="Linhas de cada exportação sintética")
+    args = parser.parse_args(argv)
+
+    pasta = tempfile.mkdtemp(prefix="paridade_reenvio_")
+    database.USE_POSTGRESQL = False
+    database.DB_PATH = os.path.join(pasta, 'paridade.db')
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            init_db()
+        arquivos = _escrever_arquivos(pasta, args.linhas)
+
+        # Referência: pasta nova só com a versão final dos arquivos
+        esperado = enviar(os.path.join(pasta, 'referencia'), [
+            (arquivos['corrigido'], 'dia.csv'), (arquivos['outro_dia'], 'outro_dia.csv')
+        ])
+
+        semana = os.path.join(pasta, 'semana')
+        enviar(semana, [(arquivos['original'], 'dia.csv'), (arquivos['outro_dia'], 'outro_dia.csv')])
+        conferir("exportação corrigida com o mesmo nome", enviar(semana, [(arquivos['corrigido'], 'dia.csv')]), esperado)
+        conferir("mesmo arquivo reenviado", enviar(semana, [(arquivos['corrigido'], 'dia.csv')]), esperado)
+        conferir("mesmo conteúdo com outro nome", enviar(semana, [(arquivos['corrigido'], 'copia.csv')]), esperado)
+
+        lote = os.path.join(pasta, 'lote')
+        conferir("mesmo nome duas vezes no lote", enviar(lote, [
+            (arquivos['original'], 'dia.csv'), (arquivos['corrigido'], 'dia.csv'), (arquivos['outro_dia'], 'outro_dia.csv')
+        ]), esperado)
+    except AssertionError as e:
+        raise SystemExit(f"❌ ganhos_diarios divergem após reenvio: {e}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
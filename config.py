@@ -36,7 +36,50 @@ class Config:
 
     # ======== OUTRAS CONFIGURAÇÕES (se quiser expandir depois) ========
     ITEMS_PER_PAGE = 50
-    
+
+    # ======== PROCESSAMENTO DE CSV ========
+    # Linhas lidas por bloco no processamento em streaming
+    CSV_CHUNK_SIZE = int(os.getenv('CSV_CHUNK_SIZE', 100000))
+    # Bytes lidos do início do arquivo para detectar encoding e separador
+    CSV_SAMPLE_BYTES = int(os.getenv('CSV_SAMPLE_BYTES', 65536))
+    # Processos para agregar vários CSVs em paralelo (1 = sequencial)
+    CSV_MAX_WORKERS = int(os.getenv('CSV_MAX_WORKERS', min(os.cpu_count() or 1, 8)))
+    # Cache colunar (Arrow) dos CSVs já processados, chaveado pelo conteúdo do arquivo
+    CSV_CACHE_ENABLED = os.getenv('CSV_CACHE_ENABLED', 'True').lower() == 'true'
+    CSV_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'cache_csv')
+    CSV_CACHE_MAX_MB = int(os.getenv('CSV_CACHE_MAX_MB', 1024))
+    # Cache dos relatórios XLSX, chaveado pelas entradas de cada relatório (CSVs, lote, dados do banco)
+    RELATORIOS_CACHE_ENABLED = os.getenv('RELATORIOS_CACHE_ENABLED', 'True').lower() == 'true'
+    RELATORIOS_CACHE_FOLDER = os.path.join(RELATORIOS_FOLDER, 'cache')
+    RELATORIOS_CACHE_MAX_MB = int(os.getenv('RELATORIOS_CACHE_MAX_MB', 256))
+    # Cache em memória CPF -> entregador dos formulários públicos (esvaziado após o TTL; 0 = sem TTL)
+    CPF_CACHE_TTL_SEGUNDOS = int(os.getenv('CPF_CACHE_TTL_SEGUNDOS', 300))
+    # Intervalo entre conferências da geração do cache no banco (alterações feitas por outros processos)
+    CPF_CACHE_GERACAO_SEGUNDOS = int(os.getenv('CPF_CACHE_GERACAO_SEGUNDOS', 5))
+    # Fila de gravação das solicitações de adiantamento: várias solicitações por transação no pico de envios
+    ADIANTAMENTO_FILA_ENABLED = os.getenv('ADIANTAMENTO_FILA_ENABLED', 'False').lower() == 'true'
+    ADIANTAMENTO_FILA_LOTE = int(os.getenv('ADIANTAMENTO_FILA_LOTE', 200))
+    ADIANTAMENTO_FILA_TIMEOUT_SEGUNDOS = int(os.getenv('ADIANTAMENTO_FILA_TIMEOUT_SEGUNDOS', 30))
+    # Motor da agregação em streaming: 'pandas' (referência) ou 'arrow' (multi-thread, requer pyarrow)
+    CSV_MOTOR = os.getenv('CSV_MOTOR', 'pandas')
+    # Destinos da instrumentação por etapa: 'log', 'json' e/ou 'metricas' (vazio desativa)
+    CSV_INSTRUMENTACAO = os.getenv('CSV_INSTRUMENTACAO', 'log,metricas')
+    CSV_INSTRUMENTACAO_ARQUIVO = os.getenv(
+        'CSV_INSTRUMENTACAO_ARQUIVO', os.path.join(UPLOAD_FOLDER, 'instrumentacao', 'processamento.jsonl')
+    )
+    # Pico de memória por etapa via tracemalloc (deixa o processamento mais lento; RSS é sempre medido)
+    CSV_TRACEMALLOC = os.getenv('CSV_TRACEMALLOC', 'False').lower() == 'true'
+
+    # ======== FILA DE PROCESSAMENTO (jobs em segundo plano) ========
+    # Inicia a fila neste processo (False: os jobs ficam pendentes para um processo com a fila ativa)
+    PROCESSAMENTO_JOBS_ENABLED = os.getenv('PROCESSAMENTO_JOBS_ENABLED', 'True').lower() == 'true'
+    # Threads que processam os uploads (1 = um lote por vez; a consolidação semanal não é paralela)
+    PROCESSAMENTO_JOBS_WORKERS = int(os.getenv('PROCESSAMENTO_JOBS_WORKERS', 1))
+    # Execuções de um job interrompido por reinício antes de ele ser marcado como erro
+    PROCESSAMENTO_JOBS_MAX_TENTATIVAS = int(os.getenv('PROCESSAMENTO_JOBS_MAX_TENTATIVAS', 2))
+    # Minutos sem atualização para considerar abandonado um job de outro servidor
+    PROCESSAMENTO_JOBS_TIMEOUT_MIN = int(os.getenv('PROCESSAMENTO_JOBS_TIMEOUT_MIN', 60))
+
     # ======== CONFIGURAÇÕES DE E-MAIL (2FA) ========
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))